@@ -3,6 +3,7 @@ import streamlit as st
 from sqlalchemy import text
 from core.auth import login_user, logout_user
 from core.theme import apply_global_theme
+from core.db import obtener_conexion, consultar_cacheado, ejecutar_concurrente
 from core.sidebar import render_sidebar
 from utils import (
     breadcrumb_nav,
@@ -14,6 +15,9 @@ from utils import (
     status_indicator,
     obtener_notificaciones_pendientes,
     contar_notificaciones_pendientes,
+    obtener_roster_activo,
+    obtener_pacientes_permitidos,
+    obtener_metricas_panel,
 )
 import json
 import os
@@ -206,31 +210,32 @@ if st.session_state.rol == 'administrador':
         user_name=st.session_state.username,
     )
     
-    # Obtener métricas del sistema
-    try:
-        conn = st.connection("postgresql", type="sql")
-        with conn.session as s:
-            # Query para obtener todas las métricas
-            query_metrics = text("""
-                SELECT 
-                    (SELECT COUNT(*) FROM public.pacientes) as total_pacientes,
-                    (SELECT COUNT(*) FROM public.personal_medico) as total_medicos,
-                    (SELECT COUNT(*) FROM public.dispositivos WHERE activo = true) as dispositivos_activos,
-                    (SELECT COUNT(*) FROM public.monitoreos WHERE activo = true) as monitoreos_activos,
-                    (SELECT COUNT(*) FROM public.alertas WHERE leida = false) as alertas_pendientes,
-                    (SELECT COUNT(*) FROM public.mediciones WHERE timestamp > NOW() - INTERVAL '24 hours') as mediciones_hoy
-            """)
-            metrics = s.execute(query_metrics).fetchone()
-            
-            total_pacientes = metrics[0]
-            total_medicos = metrics[1]
-            dispositivos_activos = metrics[2]
-            monitoreos_activos = metrics[3]
-            alertas_pendientes = metrics[4]
-            mediciones_hoy = metrics[5]
-    
-    except Exception as e:
-        st.error(f"Error cargando métricas: {str(e)}")
+    # Las lecturas del panel son independientes: se ejecutan a la vez y la
+    # página espera solo a la más lenta
+    def cargar_ultimos_pacientes():
+        return consultar_cacheado("""
+            SELECT nombre, apellido_paterno, diagnostico, fecha_registro
+            FROM public.pacientes
+            ORDER BY fecha_registro DESC NULLS LAST
+            LIMIT 5
+        """, etiquetas=("pacientes",))
+    
+    datos_panel, errores_panel = ejecutar_concurrente({
+        "metricas": obtener_metricas_panel,
+        "ultimos_pacientes": cargar_ultimos_pacientes,
+        "monitoreos": obtener_roster_activo,
+    })
+    
+    if "metricas" in datos_panel:
+        metrics = datos_panel["metricas"]
+        total_pacientes = metrics['total_pacientes']
+        total_medicos = metrics['total_medicos']
+        dispositivos_activos = metrics['dispositivos_activos']
+        monitoreos_activos = metrics['monitoreos_activos']
+        alertas_pendientes = metrics['alertas_pendientes']
+        mediciones_hoy = metrics['mediciones_hoy']
+    else:
+        st.error(f"Error cargando métricas: {str(errores_panel['metricas'])}")
         total_pacientes = 0
         total_medicos = 0
         dispositivos_activos = 0
@@ -319,13 +324,7 @@ if st.session_state.rol == 'administrador':
     with col1:
         st.markdown("**Últimos Pacientes Registrados**")
         try:
-            conn2 = st.connection("postgresql", type="sql")
-            ultimos_pacientes = conn2.query("""
-                SELECT nombre, apellido_paterno, diagnostico, fecha_registro
-                FROM public.pacientes
-                ORDER BY fecha_registro DESC NULLS LAST
-                LIMIT 5
-            """, ttl="10s")
+            ultimos_pacientes = datos_panel["ultimos_pacientes"]
             if not ultimos_pacientes.empty:
                 for _, pac in ultimos_pacientes.iterrows():
                     nombre = f"{pac['nombre']} {pac['apellido_paterno']}"
@@ -341,15 +340,7 @@ if st.session_state.rol == 'administrador':
     with col2:
         st.markdown("**Monitoreos Activos**")
         try:
-            conn3 = st.connection("postgresql", type="sql")
-            monitoreos_recientes = conn3.query("""
-                SELECT p.nombre, p.apellido_paterno, m.motivo, m.fecha_inicio
-                FROM public.monitoreos m
-                JOIN public.pacientes p ON m.paciente_id = p.id
-                WHERE m.activo = true
-                ORDER BY m.fecha_inicio DESC
-                LIMIT 5
-            """, ttl="10s")
+            monitoreos_recientes = datos_panel["monitoreos"].sort_values('fecha_inicio', ascending=False).head(5)
             if not monitoreos_recientes.empty:
                 for _, mon in monitoreos_recientes.iterrows():
                     nombre = f"{mon['nombre']} {mon['apellido_paterno']}"
@@ -372,27 +363,23 @@ elif st.session_state.rol == 'medico':
         user_name=st.session_state.username,
     )
     
-    # Métricas del médico
+    # Métricas del médico (pacientes resueltos con el mapa de acceso cacheado)
+    pacientes_asignados = obtener_pacientes_permitidos(st.session_state.user_id, st.session_state.rol)
     try:
-        conn = st.connection("postgresql", type="sql")
+        conn = obtener_conexion()
         with conn.session as s:
             query = text("""
                 SELECT 
-                    (SELECT COUNT(*) FROM public.pacientes_medicos WHERE medico_id = :medico_id) as mis_pacientes,
-                    (SELECT COUNT(*) FROM public.monitoreos m
-                     JOIN public.pacientes_medicos pm ON m.paciente_id = pm.paciente_id
-                     WHERE pm.medico_id = :medico_id AND m.activo = true) as monitoreos_activos,
-                    (SELECT COUNT(*) FROM public.alertas a
-                     JOIN public.mediciones med ON a.medicion_id = med.id
-                     JOIN public.dispositivos d ON med.dispositivo_id = d.id
-                     JOIN public.pacientes_medicos pm ON d.paciente_id = pm.paciente_id
-                     WHERE pm.medico_id = :medico_id AND a.leida = false) as alertas_pendientes
+                    (SELECT COUNT(*) FROM public.monitoreos
+                     WHERE paciente_id = ANY(:pacientes) AND activo = true) as monitoreos_activos,
+                    (SELECT COALESCE(SUM(alertas_no_leidas), 0) FROM public.contadores_paciente
+                     WHERE paciente_id = ANY(:pacientes)) as alertas_pendientes
             """)
-            resultado = s.execute(query, {"medico_id": st.session_state.medico_id}).fetchone()
+            resultado = s.execute(query, {"pacientes": pacientes_asignados}).fetchone()
             
-            mis_pacientes = resultado[0]
-            monitoreos_activos = resultado[1]
-            alertas_pendientes = resultado[2]
+            mis_pacientes = len(pacientes_asignados)
+            monitoreos_activos = resultado[0]
+            alertas_pendientes = resultado[1]
     
     except:
         mis_pacientes = 0
@@ -465,25 +452,25 @@ elif st.session_state.rol == 'paciente':
     
     # Información del paciente
     try:
-        conn = st.connection("postgresql", type="sql")
+        conn = obtener_conexion()
         with conn.session as s:
             query = text("""
                 SELECT 
                     p.nombre, p.apellido_paterno, p.diagnostico,
                     d.modelo, d.activo,
-                    (SELECT COUNT(*) FROM public.alertas a
-                     JOIN public.mediciones med ON a.medicion_id = med.id
-                     JOIN public.dispositivos disp ON med.dispositivo_id = disp.id
-                     WHERE disp.paciente_id = p.id AND a.leida = false) as alertas_pendientes,
-                    COUNT(DISTINCT pm.medico_id) as total_medicos,
-                    COUNT(DISTINCT med.id) as total_mediciones
+                    COALESCE(cp.alertas_no_leidas, 0) as alertas_pendientes,
+                    (SELECT COUNT(*) FROM public.pacientes_medicos pm
+                     WHERE pm.paciente_id = p.id) as total_medicos,
+                    COALESCE(cp.total_mediciones, 0) as total_mediciones
                 FROM public.pacientes p
-                LEFT JOIN public.dispositivos d ON d.paciente_id = p.id AND d.activo = true
-                LEFT JOIN public.pacientes_medicos pm ON p.id = pm.paciente_id
-                LEFT JOIN public.mediciones med ON d.id = med.dispositivo_id
+                LEFT JOIN public.contadores_paciente cp ON cp.paciente_id = p.id
+                LEFT JOIN LATERAL (
+                    SELECT modelo, activo FROM public.dispositivos
+                    WHERE paciente_id = p.id AND activo = true
+                    ORDER BY id
+                    LIMIT 1
+                ) d ON true
                 WHERE p.id = :paciente_id
-                GROUP BY p.id, d.id
-                LIMIT 1
             """)
             datos = s.execute(query, {"paciente_id": st.session_state.paciente_id}).fetchone()
     
@@ -1,9 +1,29 @@
 """
 Módulos centrales de la aplicación IHeartCare.
-Incluye autenticación, sidebar de navegación y tema visual.
+Incluye autenticación, sidebar de navegación, tema visual y acceso a datos.
+
+Los nombres se importan al usarse: utils depende de core.db, y auth/sidebar
+dependen de utils, así que importarlos aquí de inmediato sería circular.
 """
 
-from .auth import login_user, logout_user, require_auth, hash_password
-from .auth import verify_password, registrar_usuario_paciente, registrar_usuario_medico
-from .sidebar import render_sidebar
-from .theme import apply_global_theme
+import importlib
+
+_EXPORTACIONES = {
+    'login_user': '.auth',
+    'logout_user': '.auth',
+    'require_auth': '.auth',
+    'hash_password': '.auth',
+    'verify_password': '.auth',
+    'registrar_usuario_paciente': '.auth',
+    'registrar_usuario_medico': '.auth',
+    'render_sidebar': '.sidebar',
+    'apply_global_theme': '.theme',
+}
+
+__all__ = list(_EXPORTACIONES)
+
+
+def __getattr__(nombre):
+    if nombre in _EXPORTACIONES:
+        return getattr(importlib.import_module(_EXPORTACIONES[nombre], __name__), nombre)
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
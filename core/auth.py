@@ -1,6 +1,8 @@
 import streamlit as st
 import bcrypt
 from sqlalchemy import text
+from core.db import obtener_conexion
+from utils.acceso import invalidar_mapa_acceso
 
 def hash_password(password: str) -> str:
     """Encripta una contraseña usando bcrypt."""
@@ -13,7 +15,7 @@ def verify_password(password: str, password_hash: str) -> bool:
 def login_user(username: str, password: str):
     """Autentica un usuario y guarda su sesión."""
     try:
-        conn = st.connection("postgresql", type="sql")
+        conn = obtener_conexion()
         with conn.session as s:
             query = text("""
                 SELECT u.id, u.password_hash, u.username, u.rol, u.activo,
@@ -57,7 +59,7 @@ def require_auth(allowed_roles=None):
 def registrar_usuario_paciente(username, password, paciente_id):
     """Registra un nuevo usuario tipo paciente."""
     try:
-        conn = st.connection("postgresql", type="sql")
+        conn = obtener_conexion()
         with conn.session as s:
             query_user = text("""
                 INSERT INTO public.usuarios (username, password_hash, rol)
@@ -76,6 +78,7 @@ def registrar_usuario_paciente(username, password, paciente_id):
             """)
             s.execute(query_link, {"user_id": user_id, "paciente_id": paciente_id})
             s.commit()
+            invalidar_mapa_acceso()
             return True
     except Exception as e:
         st.error(f"Error al registrar usuario: {e}")
@@ -84,7 +87,7 @@ def registrar_usuario_paciente(username, password, paciente_id):
 def registrar_usuario_medico(username, password, medico_id):
     """Registra un nuevo usuario tipo médico."""
     try:
-        conn = st.connection("postgresql", type="sql")
+        conn = obtener_conexion()
         with conn.session as s:
             query_user = text("""
                 INSERT INTO public.usuarios (username, password_hash, rol)
@@ -103,6 +106,7 @@ def registrar_usuario_medico(username, password, medico_id):
             """)
             s.execute(query_link, {"user_id": user_id, "medico_id": medico_id})
             s.commit()
+            invalidar_mapa_acceso()
             return True
     except Exception as e:
         st.error(f"Error al registrar usuario: {e}")
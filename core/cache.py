@@ -0,0 +1,45 @@
+"""
+Caché de resultados invalidada por etiquetas.
+Cada resultado cacheado declara las etiquetas de las que depende: nombres de
+tabla ("pacientes") o entidades ("paciente:12"). Cada etiqueta tiene una
+versión por proceso que forma parte de la clave de caché; al escribir se
+incrementa y la siguiente lectura vuelve a consultar. Mientras nada cambie, el
+resultado se reutiliza hasta el TTL, que queda solo como red de seguridad.
+
+Las versiones de tabla se incrementan solas:
+  - al confirmar una transacción que escribió en la tabla (core/db.py): la
+    propia sesión ve su cambio en el siguiente rerun
+  - al llegar el NOTIFY de la tabla (utils/eventos.py): escrituras de otros
+    procesos, de la ingesta y de los triggers
+Las etiquetas de entidad se invalidan a mano con invalidar().
+"""
+
+import threading
+from typing import Dict, Iterable, Tuple
+
+# Red de seguridad por si se pierde una invalidación (p. ej. escucha caída)
+TTL_CACHE = 3600
+# Cada versión nueva deja huérfanas las entradas anteriores hasta el TTL
+MAX_ENTRADAS = 200
+
+_versiones: Dict[str, int] = {}
+_lock = threading.Lock()
+
+
+def invalidar(*etiquetas: str):
+    """
+    Invalida los resultados cacheados que dependen de alguna de las etiquetas.
+
+    Args:
+        etiquetas: Tablas o entidades (ej: "dispositivos", "paciente:12")
+    """
+    with _lock:
+        for etiqueta in etiquetas:
+            _versiones[etiqueta] = _versiones.get(etiqueta, 0) + 1
+
+
+def version_etiquetas(etiquetas: Iterable[str]) -> Tuple[int, ...]:
+    """Versión actual de cada etiqueta, en el mismo orden (parte de la clave de caché)."""
+    with _lock:
+        return tuple(_versiones.get(etiqueta, 0) for etiqueta in etiquetas)
+
@@ -0,0 +1,651 @@
+"""
+Capa de acceso a datos.
+Consultas con nombre compiladas una sola vez a nivel de módulo, sesiones con
+commit/rollback uniforme sobre el engine compartido del proceso y filas
+mapeadas por nombre de columna. Es el punto único donde agregar caché,
+métricas o agrupación de consultas.
+
+Los pools de conexiones se configuran en .streamlit/secrets.toml:
+    [db.aplicacion]   pool de las páginas y dashboards en vivo
+    [db.analitica]    pool aparte para consultas analíticas largas
+    [db.lectura]      pool de la réplica para listas que toleran retraso
+con las claves de CONFIG_POOLS (las que falten toman el valor por defecto).
+
+Con [connections.postgresql_replica] las lecturas analíticas y de listas van a
+la réplica mientras su retraso no supere [db.replica] retraso_maximo_s; la
+sesión que acaba de escribir lee de la primaria durante ese mismo margen.
+
+Cada commit con escrituras invalida las etiquetas de las tablas escritas
+(core/cache.py), de modo que consultar_cacheado ve los cambios al instante.
+"""
+
+import re
+import threading
+import time
+import weakref
+from collections import deque
+import pandas as pd
+import streamlit as st
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from core.cache import TTL_CACHE, MAX_ENTRADAS, invalidar, version_etiquetas
+from core.rendimiento import instalar_instrumentacion, render_actual, en_render, registrar_concurrencia
+
+# Mismo patrón de parámetros que sqlalchemy.text() (":nombre", sin confundir "::tipo")
+_PARAMETRO = re.compile(r"(?<![:\w\\]):(\w+)(?!:)")
+
+# Consultas registradas por nombre (los nombres son únicos)
+CONSULTAS: Dict[str, "Consulta"] = {}
+_lock_registro = threading.Lock()
+
+
+# Valores por defecto de cada pool
+CONFIG_POOLS = {
+    "aplicacion": {
+        "pool_size": 10,
+        "max_overflow": 10,
+        "pool_timeout": 30,             # segundos esperando una conexión libre
+        "pool_recycle": 1800,           # segundos antes de reemplazar una conexión
+        "pool_pre_ping": True,
+        "statement_timeout_ms": 15000,  # 0 = sin límite
+        "precalentar": 2,               # conexiones que se abren al arrancar
+    },
+    "analitica": {
+        "pool_size": 2,
+        "max_overflow": 1,
+        "pool_timeout": 60,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "statement_timeout_ms": 120000,
+        "precalentar": 0,
+    },
+    "lectura": {
+        "pool_size": 5,
+        "max_overflow": 5,
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "statement_timeout_ms": 15000,
+        "precalentar": 0,
+    },
+}
+
+# Réplica de solo lectura ([db.replica] en secrets.toml)
+CONFIG_REPLICA = {
+    "retraso_maximo_s": 5.0,    # retraso tolerado antes de volver a leer de la primaria
+}
+
+# Segundos que ejecutar_concurrente espera a sus tareas; las que no terminan
+# se devuelven como error para que una consulta lenta no detenga la página
+ESPERA_CONCURRENTE_S = 5.0
+
+# Esperas de checkout recientes que se conservan por pool para los percentiles
+_MUESTRAS_ESPERA = 1000
+
+# Latencia, filas y origen de cada sentencia (ver core/rendimiento.py)
+instalar_instrumentacion()
+
+
+class Consulta:
+    """
+    Sentencia SQL con nombre, compilada al importar el módulo que la define.
+
+    Con preparada=True se usa PREPARE/EXECUTE del servidor: la primera
+    ejecución en cada conexión del pool la prepara y las siguientes reutilizan
+    el plan. Conviene solo para las consultas más frecuentes y de forma fija.
+
+    Args:
+        nombre: Identificador único (se usa también como nombre del PREPARE)
+        sql: Texto SQL con parámetros ":nombre"
+        preparada: Si se ejecuta como sentencia preparada del servidor
+        fila: Función o clase que recibe las columnas como argumentos con
+              nombre y construye cada fila; por defecto dict
+        analitica: Si se ejecuta en el pool analítico (consultas largas que
+                   no deben ocupar conexiones de los dashboards)
+        lectura: Si puede leerse de la réplica (listas que toleran unos
+                 segundos de retraso; ver obtener_conexion_lectura)
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        sql: str,
+        preparada: bool = False,
+        fila: Optional[Callable[..., Any]] = None,
+        analitica: bool = False,
+        lectura: bool = False,
+    ):
+        self.nombre = nombre
+        self.sql = text(sql)
+        self.preparada = preparada
+        self.fila = fila
+        self.analitica = analitica
+        self.lectura = lectura
+        if preparada:
+            parametros = list(dict.fromkeys(_PARAMETRO.findall(sql)))
+            posiciones = {p: i + 1 for i, p in enumerate(parametros)}
+            cuerpo = _PARAMETRO.sub(lambda m: f"${posiciones[m.group(1)]}", sql)
+            self._prepare = f"PREPARE {nombre} AS {cuerpo}"
+            argumentos = f"({', '.join(':' + p for p in parametros)})" if parametros else ""
+            self._execute = text(f"EXECUTE {nombre}{argumentos}")
+        with _lock_registro:
+            if nombre in CONSULTAS:
+                raise ValueError(f"Consulta duplicada: {nombre}")
+            CONSULTAS[nombre] = self
+
+    def __repr__(self):
+        return f"Consulta({self.nombre!r})"
+
+
+# =============================================================================
+# POOLS DE CONEXIONES
+# =============================================================================
+
+# Métricas de checkout por pool (por proceso)
+_metricas_pool = {
+    nombre: {'checkouts': 0, 'agotados': 0, 'espera_max': 0.0, 'esperas': deque(maxlen=_MUESTRAS_ESPERA)}
+    for nombre in CONFIG_POOLS
+}
+_lock_metricas = threading.Lock()
+# Pools vivos por nombre (el pool analítico puede existir sobre la primaria y sobre la réplica)
+_pools_creados = {nombre: weakref.WeakSet() for nombre in CONFIG_POOLS}
+
+
+def _registrar_checkout(pool: str, espera: float, agotado: bool = False):
+    with _lock_metricas:
+        metricas = _metricas_pool[pool]
+        if agotado:
+            metricas['agotados'] += 1
+        else:
+            metricas['checkouts'] += 1
+        metricas['esperas'].append(espera)
+        metricas['espera_max'] = max(metricas['espera_max'], espera)
+
+
+class _PoolMedido(QueuePool):
+    """QueuePool que registra cuánto espera cada checkout (incluye pre-ping y conexiones nuevas)."""
+    nombre = "aplicacion"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        with _lock_metricas:
+            _pools_creados[self.nombre].add(self)
+
+    def connect(self):
+        inicio = time.perf_counter()
+        try:
+            conexion = super().connect()
+        except exc.TimeoutError:
+            _registrar_checkout(self.nombre, time.perf_counter() - inicio, agotado=True)
+            raise
+        _registrar_checkout(self.nombre, time.perf_counter() - inicio)
+        return conexion
+
+
+class _PoolAnalitico(_PoolMedido):
+    nombre = "analitica"
+
+
+class _PoolLectura(_PoolMedido):
+    nombre = "lectura"
+
+
+_CLASES_POOL = {"aplicacion": _PoolMedido, "analitica": _PoolAnalitico, "lectura": _PoolLectura}
+
+
+def _config_pool(nombre: str) -> Dict:
+    """Configuración del pool: valores por defecto sobrescritos por secrets.toml [db.<nombre>]."""
+    config = dict(CONFIG_POOLS[nombre] if nombre in CONFIG_POOLS else CONFIG_REPLICA)
+    try:
+        config.update(st.secrets.get("db", {}).get(nombre, {}))
+    except Exception:
+        # Sin secrets.toml se usan los valores por defecto
+        pass
+    return config
+
+
+def _argumentos_engine(nombre: str) -> Dict:
+    """Argumentos de create_engine para el pool indicado."""
+    config = _config_pool(nombre)
+    argumentos = {
+        "poolclass": _CLASES_POOL[nombre],
+        "pool_size": int(config["pool_size"]),
+        "max_overflow": int(config["max_overflow"]),
+        "pool_timeout": float(config["pool_timeout"]),
+        "pool_recycle": int(config["pool_recycle"]),
+        "pool_pre_ping": bool(config["pool_pre_ping"]),
+    }
+    if config["statement_timeout_ms"]:
+        argumentos["connect_args"] = {"options": f"-c statement_timeout={int(config['statement_timeout_ms'])}"}
+    return argumentos
+
+
+def obtener_conexion():
+    """
+    Conexión de la aplicación (st.connection con el pool configurado).
+
+    Todas las páginas y servicios deben usar esta función en lugar de llamar
+    a st.connection directamente: con otros argumentos se crearía otro pool.
+    """
+    return st.connection("postgresql", type="sql", **_argumentos_engine("aplicacion"))
+
+
+def obtener_conexion_analitica():
+    """
+    Conexión del pool analítico, con la misma API que obtener_conexion() pero
+    conexiones y statement_timeout propios, para que las consultas largas no
+    dejen sin conexiones a los dashboards. Apunta a la réplica cuando hay una
+    y la sesión puede leer de ella (ver leer_de_replica).
+    """
+    origen = _conexion_replica() if leer_de_replica() else obtener_conexion()
+    url = origen.engine.url.render_as_string(hide_password=False)
+    return st.connection("postgresql_analitica", type="sql", url=url, **_argumentos_engine("analitica"))
+
+
+def obtener_conexion_lectura():
+    """
+    Conexión para lecturas de listas que toleran unos segundos de retraso:
+    la réplica cuando está configurada y al día, la primaria en otro caso.
+
+    No debe usarse para resultados que se cachean hasta un NOTIFY (el aviso
+    llega desde la primaria y la réplica podría no tener aún el cambio).
+    """
+    return _conexion_replica() if leer_de_replica() else obtener_conexion()
+
+
+def obtener_engine(analitica: bool = False, lectura: bool = False):
+    """Engine compartido del proceso (el de la conexión, que ya es un recurso cacheado)."""
+    if analitica:
+        return obtener_conexion_analitica().engine
+    return (obtener_conexion_lectura() if lectura else obtener_conexion()).engine
+
+
+# =============================================================================
+# RÉPLICA DE LECTURA
+# =============================================================================
+
+# Segundos que la réplica va por detrás; 0 si ya aplicó todo lo recibido.
+# En una instancia que no es réplica las funciones devuelven NULL (sin retraso).
+_RETRASO_REPLICA = text("""
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+# Tabla destino de las sentencias que modifican datos (excluye SELECT ... FOR
+# UPDATE y el DO UPDATE de ON CONFLICT, que no nombran una tabla)
+_TABLA_ESCRITA = re.compile(
+    r"\b(?:INSERT\s+INTO|(?<!FOR\s)(?<!DO\s)UPDATE|DELETE\s+FROM|MERGE\s+INTO)\s+(?:ONLY\s+)?(?:\w+\.)?\"?(\w+)",
+    re.IGNORECASE,
+)
+
+
+def replica_configurada() -> bool:
+    """Si secrets.toml define [connections.postgresql_replica]."""
+    try:
+        return "postgresql_replica" in st.secrets.get("connections", {})
+    except Exception:
+        return False
+
+
+def _conexion_replica():
+    return st.connection("postgresql_replica", type="sql", **_argumentos_engine("lectura"))
+
+
+@st.cache_data(ttl=5, show_spinner=False)
+def retraso_replica() -> Optional[float]:
+    """
+    Retraso actual de la réplica (se mide como mucho cada 5 segundos).
+
+    Returns:
+        Segundos de retraso, o None si la réplica no responde
+    """
+    try:
+        with _conexion_replica().engine.connect() as conexion:
+            return float(conexion.execute(_RETRASO_REPLICA).scalar() or 0.0)
+    except Exception:
+        return None
+
+
+def registrar_escritura():
+    """
+    Marca que la sesión de Streamlit actual acaba de escribir, para que sus
+    lecturas vayan a la primaria hasta que la réplica pueda haberla alcanzado.
+    Se llama sola al confirmar una transacción con escrituras.
+    """
+    if get_script_run_ctx() is None:
+        # Hilos de fondo (escucha, escalamiento, trabajadores): no tienen sesión
+        return
+    st.session_state['_ultima_escritura'] = time.time()
+
+
+def leer_de_replica() -> bool:
+    """
+    Decide si las lecturas tolerantes a retraso de la sesión actual van a la réplica.
+
+    Returns:
+        True si hay réplica, responde, su retraso no supera retraso_maximo_s
+        y la sesión no escribió dentro de ese margen (read-your-writes)
+    """
+    if not replica_configurada():
+        return False
+    tolerancia = float(_config_pool("replica")["retraso_maximo_s"])
+    if get_script_run_ctx() is not None:
+        if time.time() - st.session_state.get('_ultima_escritura', 0.0) < tolerancia:
+            return False
+    retraso = retraso_replica()
+    return retraso is not None and retraso <= tolerancia
+
+
+def _marcar_escritura(conn, sql: str):
+    """Anota en la conexión las tablas que escribe la sentencia (se aplican al confirmar)."""
+    tablas = {tabla.lower() for tabla in _TABLA_ESCRITA.findall(sql)}
+    if tablas:
+        conn.info.setdefault('tablas_escritas', set()).update(tablas)
+
+
+def _detectar_escritura(conn, cursor, statement, parameters, context, executemany):
+    _marcar_escritura(conn, statement)
+
+
+def _al_confirmar(conn):
+    tablas = conn.info.pop('tablas_escritas', None)
+    if tablas:
+        invalidar(*tablas)
+        registrar_escritura()
+
+
+def _al_revertir(conn):
+    conn.info.pop('tablas_escritas', None)
+
+
+def instalar_enrutamiento():
+    """Registra los hooks que detectan escrituras confirmadas: read-your-writes e invalidación de caché (idempotente)."""
+    if not event.contains(Engine, "before_cursor_execute", _detectar_escritura):
+        event.listen(Engine, "before_cursor_execute", _detectar_escritura)
+        event.listen(Engine, "commit", _al_confirmar)
+        event.listen(Engine, "rollback", _al_revertir)
+
+
+instalar_enrutamiento()
+
+
+@st.cache_resource(show_spinner=False)
+def precalentar_pool(nombre: str = "aplicacion") -> int:
+    """
+    Abre (una sola vez por proceso) las conexiones indicadas en la clave
+    'precalentar' del pool, para que las primeras peticiones no paguen el
+    establecimiento de la conexión.
+
+    Args:
+        nombre: Pool de CONFIG_POOLS ('aplicacion', 'analitica' o 'lectura')
+
+    Returns:
+        Número de conexiones abiertas (0 para 'lectura' sin réplica configurada)
+    """
+    config = _config_pool(nombre)
+    cantidad = min(int(config["precalentar"]), int(config["pool_size"]))
+    if cantidad <= 0:
+        return 0
+    if nombre == "lectura":
+        # El pool de lectura es el de la réplica; sin ella no existe
+        if not replica_configurada():
+            return 0
+        engine = _conexion_replica().engine
+    elif nombre == "analitica":
+        engine = obtener_conexion_analitica().engine
+    else:
+        engine = obtener_conexion().engine
+    conexiones = []
+    try:
+        # Se mantienen abiertas a la vez para que el pool cree conexiones distintas
+        for _ in range(cantidad):
+            conexiones.append(engine.connect())
+    finally:
+        for conexion in conexiones:
+            conexion.close()
+    return len(conexiones)
+
+
+def obtener_metricas_pool() -> Dict[str, Dict]:
+    """
+    Estado y esperas de checkout de cada pool del proceso.
+
+    Returns:
+        Dict por pool ('aplicacion', 'analitica', 'lectura') con 'tamano',
+        'en_uso', 'disponibles', 'overflow', 'capacidad', 'checkouts',
+        'agotados' y las esperas 'espera_p50_ms', 'espera_p95_ms',
+        'espera_max_ms' (None sin muestras). Los pools analítico y de lectura
+        aparecen después de su primer uso; si hay varios con el mismo nombre
+        (primaria y réplica) se suman.
+    """
+    obtener_conexion()
+    resultado = {}
+    for nombre in CONFIG_POOLS:
+        with _lock_metricas:
+            pools = list(_pools_creados[nombre])
+            if not pools:
+                continue
+            metricas = _metricas_pool[nombre]
+            esperas = sorted(metricas['esperas'])
+            resultado[nombre] = {
+                'tamano': sum(pool.size() for pool in pools),
+                'en_uso': sum(pool.checkedout() for pool in pools),
+                'disponibles': sum(pool.checkedin() for pool in pools),
+                'overflow': sum(max(pool.overflow(), 0) for pool in pools),
+                'capacidad': sum(pool.size() + max(pool._max_overflow, 0) for pool in pools),
+                'checkouts': metricas['checkouts'],
+                'agotados': metricas['agotados'],
+                'espera_p50_ms': esperas[len(esperas) // 2] * 1000 if esperas else None,
+                'espera_p95_ms': esperas[int(len(esperas) * 0.95)] * 1000 if esperas else None,
+                'espera_max_ms': metricas['espera_max'] * 1000 if esperas else None,
+            }
+    return resultado
+
+
+# =============================================================================
+# SESIONES Y EJECUCIÓN
+# =============================================================================
+
+@contextmanager
+def sesion(session: Optional[Session] = None, analitica: bool = False, lectura: bool = False) -> Iterator[Session]:
+    """
+    Abre una sesión que hace commit al salir sin errores y rollback si hay excepción.
+
+    Args:
+        session: Sesión del llamador; si se pasa se reutiliza sin commit
+                 (el llamador controla la transacción)
+        analitica: Si la sesión usa el pool analítico
+        lectura: Si la sesión puede leer de la réplica (ver obtener_conexion_lectura)
+    """
+    if session is not None:
+        yield session
+        return
+    with Session(obtener_engine(analitica, lectura)) as s:
+        try:
+            yield s
+            s.commit()
+        except Exception:
+            s.rollback()
+            raise
+
+
+def _ejecutar(s: Session, consulta: Consulta, params: Optional[Dict]):
+    """Ejecuta la consulta, preparándola en la conexión actual si hace falta."""
+    if not consulta.preparada:
+        return s.execute(consulta.sql, params or {})
+    conexion = s.connection()
+    # info pertenece a la conexión DBAPI: se conserva entre préstamos del pool
+    preparadas = conexion.info.setdefault("consultas_preparadas", set())
+    if consulta.nombre not in preparadas:
+        conexion.exec_driver_sql(consulta._prepare)
+        preparadas.add(consulta.nombre)
+    return s.execute(consulta._execute, params or {})
+
+
+def _mapear(consulta: Consulta, fila) -> Any:
+    datos = dict(fila._mapping)
+    return consulta.fila(**datos) if consulta.fila else datos
+
+
+def consultar(consulta: Consulta, params: Optional[Dict] = None, session: Optional[Session] = None) -> List[Any]:
+    """
+    Ejecuta una consulta y devuelve todas sus filas mapeadas.
+
+    Args:
+        consulta: Consulta registrada
+        params: Parámetros
+        session: Sesión del llamador (opcional)
+
+    Returns:
+        Lista de filas (dicts, o el tipo indicado en Consulta.fila)
+    """
+    with sesion(session, consulta.analitica, consulta.lectura) as s:
+        return [_mapear(consulta, fila) for fila in _ejecutar(s, consulta, params)]
+
+
+def consultar_uno(consulta: Consulta, params: Optional[Dict] = None, session: Optional[Session] = None) -> Optional[Any]:
+    """Ejecuta una consulta y devuelve su primera fila mapeada, o None."""
+    with sesion(session, consulta.analitica, consulta.lectura) as s:
+        fila = _ejecutar(s, consulta, params).first()
+        return _mapear(consulta, fila) if fila is not None else None
+
+
+def consultar_valor(consulta: Consulta, params: Optional[Dict] = None, session: Optional[Session] = None) -> Any:
+    """Ejecuta una consulta y devuelve la primera columna de la primera fila."""
+    with sesion(session, consulta.analitica, consulta.lectura) as s:
+        return _ejecutar(s, consulta, params).scalar()
+
+
+def consultar_filas(consulta: Consulta, params: Optional[Dict] = None, session: Optional[Session] = None) -> List:
+    """Filas sin mapear (sqlalchemy Row, acceso por atributo); para cargas grandes a DataFrame."""
+    with sesion(session, consulta.analitica, consulta.lectura) as s:
+        return _ejecutar(s, consulta, params).fetchall()
+
+
+def ejecutar(consulta: Consulta, params: Optional[Dict] = None, session: Optional[Session] = None) -> int:
+    """
+    Ejecuta una sentencia de escritura.
+
+    Returns:
+        Filas afectadas
+    """
+    with sesion(session, consulta.analitica) as s:
+        # EXECUTE de una sentencia preparada no revela qué tabla escribe: se marca aquí
+        _marcar_escritura(s.connection(), consulta.sql.text)
+        return _ejecutar(s, consulta, params).rowcount
+
+
+# =============================================================================
+# RESULTADOS CACHEADOS POR ETIQUETA
+# =============================================================================
+
+@st.cache_data(ttl=TTL_CACHE, max_entries=MAX_ENTRADAS, show_spinner=False)
+def _consultar_tabla(sql: str, params: Dict, etiquetas: Tuple[str, ...], version: Tuple[int, ...]) -> pd.DataFrame:
+    with sesion() as s:
+        return pd.read_sql(text(sql), s.connection(), params=params)
+
+
+def consultar_cacheado(sql: str, etiquetas: Iterable[str], params: Optional[Dict] = None) -> pd.DataFrame:
+    """
+    Ejecuta una consulta en la primaria y cachea el DataFrame hasta que se
+    escriba en alguna de las tablas de las que depende (ver core/cache.py).
+
+    Sustituye a conn.query(..., ttl=...): sin escrituras no vuelve a la base
+    de datos, y tras una escritura confirmada la siguiente lectura ya la ve.
+    No usa la réplica: un resultado atrasado quedaría cacheado hasta la
+    siguiente escritura.
+
+    Args:
+        sql: Texto SQL con parámetros ":nombre"
+        etiquetas: Tablas (o entidades) que lee la consulta
+        params: Parámetros
+
+    Returns:
+        DataFrame con el resultado
+    """
+    etiquetas = tuple(etiquetas)
+    return _consultar_tabla(sql, params or {}, etiquetas, version_etiquetas(etiquetas))
+
+
+# =============================================================================
+# EJECUCIÓN CONCURRENTE
+# =============================================================================
+
+@st.cache_resource(show_spinner=False)
+def _hilos_consultas() -> ThreadPoolExecutor:
+    """
+    Hilos compartidos por todas las sesiones: tantos como conexiones fijas
+    tiene el pool de la aplicación, para que las sesiones simultáneas no se
+    formen detrás de unos pocos hilos.
+    """
+    hilos = int(_config_pool("aplicacion")["pool_size"])
+    return ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="consultas")
+
+
+def ejecutar_concurrente(
+    tareas: Dict[str, Callable[[], Any]], espera: float = ESPERA_CONCURRENTE_S
+) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+    """
+    Ejecuta lecturas independientes en paralelo y espera a que terminen todas,
+    como mucho 'espera' segundos.
+
+    Cada tarea corre en un hilo del pool compartido (del tamaño del pool de
+    conexiones de la aplicación) con su propia sesión y, por lo tanto, su
+    propia conexión, así que la página espera lo que tarda la consulta más
+    lenta y no la suma. Las que no terminan a tiempo se devuelven en errores
+    como TimeoutError (su resultado se descarta). Las consultas se atribuyen
+    al render de la página que llama y el tiempo ahorrado aparece como
+    'solapado' en la página de Rendimiento.
+
+    Las tareas solo deben leer datos: no deben compartir una sesión ni
+    llamar a ejecutar_concurrente (los hilos son limitados). Lo que dibujen
+    (p. ej. el st.error de su manejo de errores) aparece en la posición
+    actual de la página.
+
+    Args:
+        tareas: Dict {nombre: función sin argumentos}, p. ej.
+                {"metricas": lambda: consultar_uno(_METRICAS)}
+        espera: Segundos máximos de espera
+
+    Returns:
+        Tupla (resultados, errores): dicts por nombre de tarea con el valor
+        devuelto o la excepción lanzada
+    """
+    contexto = get_script_run_ctx()
+    render = render_actual()
+
+    def correr(tarea: Callable[[], Any]) -> Any:
+        # Contexto de la sesión para que st.cache_data / st.connection funcionen en el hilo
+        if contexto is not None:
+            add_script_run_ctx(ctx=contexto)
+        try:
+            with en_render(render):
+                return tarea()
+        finally:
+            # El hilo vuelve al pool: no debe retener la sesión ni prestarla a la siguiente tarea
+            setattr(threading.current_thread(), SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+
+    futuros = {nombre: _hilos_consultas().submit(correr, tarea) for nombre, tarea in tareas.items()}
+    _, pendientes = wait(futuros.values(), timeout=espera)
+    registrar_concurrencia(render)
+
+    resultados, errores = {}, {}
+    for nombre, futuro in futuros.items():
+        if futuro in pendientes:
+            # Si aún no empezó, no llega a ejecutarse
+            futuro.cancel()
+            errores[nombre] = TimeoutError(f"La consulta '{nombre}' superó {espera:g} s")
+        elif futuro.exception() is not None:
+            errores[nombre] = futuro.exception()
+        else:
+            resultados[nombre] = futuro.result()
+    return resultados, errores
@@ -0,0 +1,289 @@
+"""
+Instrumentación de consultas SQL.
+Hooks before/after_cursor_execute de SQLAlchemy que guardan en un buffer
+circular (en memoria, por proceso) la latencia, filas y origen de cada
+sentencia, y registro de cada render de página para comparar el tiempo en
+SQL con el tiempo en Python. Lo consume la página de Rendimiento.
+"""
+
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from typing import Dict, List, Optional
+
+# Capacidad de los buffers circulares
+MAX_CONSULTAS = 5000
+MAX_RENDERS = 500
+
+_RAIZ = str(Path(__file__).resolve().parent.parent)
+# Módulos que no cuentan como origen de una consulta (el llamador real está más arriba)
+_OMITIR_ORIGEN = (
+    str(Path(__file__).resolve()),
+    str(Path(__file__).resolve().with_name("db.py")),
+)
+
+_consultas = deque(maxlen=MAX_CONSULTAS)
+_renders = deque(maxlen=MAX_RENDERS)
+_lock = threading.Lock()
+_local = threading.local()
+
+# Normalización para agrupar sentencias que solo difieren en literales
+_LITERAL_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_LITERAL_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_ESPACIOS = re.compile(r"\s+")
+
+
+class _Render:
+    """Render de página en curso; se cierra al empezar el siguiente en el mismo hilo o al terminar el hilo."""
+
+    def __init__(self, pagina: str):
+        self.pagina = pagina
+        self.inicio = time.perf_counter()
+        self.fecha = time.time()
+        self.consultas = 0
+        self.sql = 0.0
+        # Tiempo de pared con al menos una consulta en curso: con ejecutar_concurrente
+        # varias consultas se solapan y la suma de duraciones (sql) lo supera
+        self.sql_pared = 0.0
+        self.en_curso = 0
+        self.desde = 0.0
+        self.lotes = 0
+        self.cerrado = False
+
+    def cerrar(self):
+        if self.cerrado:
+            return
+        self.cerrado = True
+        total = time.perf_counter() - self.inicio
+        with _lock:
+            _renders.append({
+                'pagina': self.pagina,
+                'fecha': self.fecha,
+                'consultas': self.consultas,
+                'sql': self.sql,
+                'solapado': max(self.sql - self.sql_pared, 0.0),
+                'lotes': self.lotes,
+                'total': total,
+                'python': max(total - self.sql_pared, 0.0),
+            })
+
+    def __del__(self):
+        # Streamlit ejecuta cada rerun en su propio hilo: al terminar, se libera el render
+        self.cerrar()
+
+
+def _en_proyecto(archivo: str) -> bool:
+    return archivo.startswith(_RAIZ) and "site-packages" not in archivo
+
+
+def _pagina_llamadora() -> str:
+    """Script de página (app.py o pages/*) más externo en la pila de llamadas."""
+    pagina = "(desconocida)"
+    marco = sys._getframe(1)
+    while marco is not None:
+        archivo = marco.f_code.co_filename
+        if _en_proyecto(archivo):
+            relativo = archivo[len(_RAIZ) + 1:]
+            if relativo == "app.py" or relativo.startswith("pages"):
+                pagina = relativo
+        marco = marco.f_back
+    return pagina
+
+
+def iniciar_render(pagina: Optional[str] = None):
+    """
+    Marca el inicio del render de una página en el hilo actual.
+
+    Args:
+        pagina: Ruta de la página (p. ej. 'pages/09_mis_pacientes.py');
+                por defecto el script de página que llama
+    """
+    if pagina is None:
+        pagina = _pagina_llamadora()
+    anterior = getattr(_local, 'render', None)
+    if anterior is not None:
+        anterior.cerrar()
+    _local.render = _Render(pagina)
+
+
+def render_actual() -> Optional[_Render]:
+    """Render en curso en el hilo actual (None fuera de una página)."""
+    return getattr(_local, 'render', None)
+
+
+@contextmanager
+def en_render(render: Optional[_Render]):
+    """Atribuye las consultas del hilo actual al render de otro hilo mientras dure el bloque."""
+    anterior = getattr(_local, 'render', None)
+    _local.render = render
+    try:
+        yield
+    finally:
+        _local.render = anterior
+
+
+def registrar_concurrencia(render: Optional[_Render]):
+    """Cuenta en el render un lote de tareas ejecutadas en paralelo."""
+    if render is None:
+        return
+    with _lock:
+        render.lotes += 1
+
+
+def _origen() -> str:
+    """Primer marco del proyecto (fuera de core.db y de este módulo) en la pila de llamadas."""
+    marco = sys._getframe(2)
+    while marco is not None:
+        archivo = marco.f_code.co_filename
+        if _en_proyecto(archivo) and archivo not in _OMITIR_ORIGEN:
+            return f"{archivo[len(_RAIZ) + 1:]}:{marco.f_code.co_name}"
+        marco = marco.f_back
+    return "(externo)"
+
+
+def _empezar_sql(render: _Render, ahora: float):
+    if render.en_curso == 0:
+        render.desde = ahora
+    render.en_curso += 1
+
+
+def _terminar_sql(render: _Render, ahora: float):
+    render.en_curso = max(render.en_curso - 1, 0)
+    if render.en_curso == 0:
+        render.sql_pared += ahora - render.desde
+
+
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    ahora = time.perf_counter()
+    conn.info.setdefault('inicio_consulta', []).append(ahora)
+    render = getattr(_local, 'render', None)
+    if render is not None:
+        with _lock:
+            _empezar_sql(render, ahora)
+
+
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    ahora = time.perf_counter()
+    duracion = ahora - conn.info['inicio_consulta'].pop()
+    render = getattr(_local, 'render', None)
+    with _lock:
+        # Bajo el lock: con ejecutar_concurrente varios hilos suman al mismo render
+        if render is not None:
+            render.consultas += 1
+            render.sql += duracion
+            _terminar_sql(render, ahora)
+        _consultas.append((
+            statement,
+            duracion,
+            cursor.rowcount,
+            _origen(),
+            render.pagina if render is not None else threading.current_thread().name,
+            time.time(),
+        ))
+
+
+def _error(contexto):
+    # Sin after_cursor_execute: descarta el inicio pendiente de la sentencia fallida
+    inicios = contexto.connection.info.get('inicio_consulta') if contexto.connection is not None else None
+    if inicios:
+        inicios.pop()
+        render = getattr(_local, 'render', None)
+        if render is not None:
+            with _lock:
+                _terminar_sql(render, time.perf_counter())
+
+
+def instalar_instrumentacion():
+    """Registra los hooks en todos los engines del proceso (idempotente)."""
+    if not event.contains(Engine, "before_cursor_execute", _antes):
+        event.listen(Engine, "before_cursor_execute", _antes)
+        event.listen(Engine, "after_cursor_execute", _despues)
+        event.listen(Engine, "handle_error", _error)
+
+
+def normalizar_sentencia(sql: str) -> str:
+    """Sentencia en una línea con los literales reemplazados por '?'."""
+    sql = _LITERAL_TEXTO.sub("?", sql)
+    sql = _LITERAL_NUMERO.sub("?", sql)
+    return _ESPACIOS.sub(" ", sql).strip()
+
+
+def obtener_consultas(segundos: Optional[float] = None) -> List[Dict]:
+    """
+    Sentencias registradas en el buffer.
+
+    Args:
+        segundos: Solo las de los últimos N segundos (None = todas)
+
+    Returns:
+        Lista de dicts con 'sql', 'duracion', 'filas', 'origen', 'pagina' y 'fecha'
+    """
+    desde = time.time() - segundos if segundos else 0
+    with _lock:
+        registros = list(_consultas)
+    return [
+        {'sql': sql, 'duracion': duracion, 'filas': filas, 'origen': origen, 'pagina': pagina, 'fecha': fecha}
+        for sql, duracion, filas, origen, pagina, fecha in registros
+        if fecha >= desde
+    ]
+
+
+def resumir_consultas(segundos: Optional[float] = None) -> List[Dict]:
+    """
+    Agrupa las sentencias normalizadas del buffer.
+
+    Returns:
+        Lista de dicts con 'sql', 'ejecuciones', 'total', 'promedio', 'p95',
+        'maximo' (segundos), 'filas' (promedio) y 'origenes' (conjunto)
+    """
+    grupos: Dict[str, Dict] = {}
+    for consulta in obtener_consultas(segundos):
+        grupo = grupos.setdefault(normalizar_sentencia(consulta['sql']), {
+            'duraciones': [], 'filas': 0, 'origenes': set(),
+        })
+        grupo['duraciones'].append(consulta['duracion'])
+        grupo['filas'] += max(consulta['filas'], 0)
+        grupo['origenes'].add(consulta['origen'])
+
+    resumen = []
+    for sql, grupo in grupos.items():
+        duraciones = sorted(grupo['duraciones'])
+        n = len(duraciones)
+        resumen.append({
+            'sql': sql,
+            'ejecuciones': n,
+            'total': sum(duraciones),
+            'promedio': sum(duraciones) / n,
+            'p95': duraciones[min(int(n * 0.95), n - 1)],
+            'maximo': duraciones[-1],
+            'filas': grupo['filas'] / n,
+            'origenes': grupo['origenes'],
+        })
+    return resumen
+
+
+def obtener_renders(segundos: Optional[float] = None) -> List[Dict]:
+    """
+    Renders de página terminados.
+
+    Returns:
+        Lista de dicts con 'pagina', 'fecha', 'consultas', 'lotes' (ejecuciones
+        concurrentes) y en segundos 'sql' (suma de duraciones), 'solapado'
+        (parte de esa suma que corrió en paralelo), 'python' y 'total'
+    """
+    desde = time.time() - segundos if segundos else 0
+    with _lock:
+        return [dict(r) for r in _renders if r['fecha'] >= desde]
+
+
+def reiniciar_metricas():
+    """Vacía los buffers de consultas y renders."""
+    with _lock:
+        _consultas.clear()
+        _renders.clear()
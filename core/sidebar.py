@@ -1,10 +1,18 @@
+import logging
 import streamlit as st
 from core.auth import logout_user
-from utils import mostrar_indicador_notificaciones, obtener_estadisticas_notificaciones
+from core.db import CONFIG_POOLS, precalentar_pool
+from core.rendimiento import iniciar_render
+from utils import obtener_resumen_notificaciones, iniciar_escalamiento, iniciar_escucha_cambios
+
+_logger = logging.getLogger(__name__)
 
 def render_sidebar():
     """Renders the custom sidebar based on the user's role."""
     
+    # Consultas y tiempo de este render (página de Rendimiento)
+    iniciar_render()
+    
     # Si no hay sesión, no mostrar nada (o mostrar login si se desea)
     if 'authenticated' not in st.session_state or not st.session_state.authenticated:
         return
@@ -12,9 +20,27 @@ def render_sidebar():
     with st.sidebar:
         st.logo("https://img.icons8.com/color/96/heart-with-pulse.png", icon_image="https://img.icons8.com/color/96/heart-with-pulse.png")
         
-        # Obtener notificaciones pendientes
-        notificaciones_pendientes = mostrar_indicador_notificaciones(st.session_state.user_id)
-        stats_notificaciones = obtener_estadisticas_notificaciones(st.session_state.user_id)
+        # Conexiones iniciales del pool, hilo de escalamiento de alertas críticas y
+        # escucha de cambios que invalida la caché por etiquetas (uno por proceso)
+        # Cada uno por separado: si falla uno, los demás arrancan igual
+        for pool in CONFIG_POOLS:
+            try:
+                precalentar_pool(pool)
+            except Exception as e:
+                _logger.warning("No se pudo precalentar el pool '%s': %s", pool, e)
+        try:
+            iniciar_escalamiento()
+        except Exception as e:
+            _logger.warning("No se pudo iniciar el escalamiento de alertas: %s", e)
+        try:
+            iniciar_escucha_cambios()
+        except Exception as e:
+            _logger.warning("No se pudo iniciar la escucha de cambios: %s", e)
+        
+        # Obtener notificaciones pendientes (cacheadas por usuario, ver obtener_resumen_notificaciones)
+        resumen_notificaciones = obtener_resumen_notificaciones(st.session_state.user_id, st.session_state.rol)
+        notificaciones_pendientes = resumen_notificaciones['pendientes']
+        stats_notificaciones = resumen_notificaciones['estadisticas']
         
         # Header con información del usuario
         st.markdown("""
@@ -168,7 +194,7 @@ def render_sidebar():
             if stats_notificaciones['no_leidas'] > 0:
                 from utils import marcar_todas_leidas
                 if st.button("Marcar todas como leídas", use_container_width=True, key="marcar_todas_sidebar"):
-                    marcar_todas_leidas(st.session_state.user_id)
+                    marcar_todas_leidas(st.session_state.user_id, st.session_state.rol)
                     st.success("Notificaciones actualizadas")
                     st.rerun()
         
@@ -188,7 +214,9 @@ def render_sidebar():
             
             st.markdown('<div class="sidebar-section">Análisis</div>', unsafe_allow_html=True)
             st.page_link("pages/05_monitoreo_dashboard.py", label="Visualización")
+            st.page_link("pages/11_monitoreo_sala.py", label="Vista de Sala")
             st.page_link("pages/06_monitoreo_analisis.py", label="Análisis Clínico")
+            st.page_link("pages/12_rendimiento.py", label="Rendimiento")
 
         # --- NAVEGACIÓN MÉDICO ---
         elif st.session_state.rol == 'medico':
@@ -199,6 +227,7 @@ def render_sidebar():
             
             st.markdown('<div class="sidebar-section">Análisis</div>', unsafe_allow_html=True)
             st.page_link("pages/05_monitoreo_dashboard.py", label="Visualización")
+            st.page_link("pages/11_monitoreo_sala.py", label="Vista de Sala")
             st.page_link("pages/06_monitoreo_analisis.py", label="Análisis Clínico")
 
         # --- NAVEGACIÓN PACIENTE ---
@@ -0,0 +1,24 @@
+-- ============================================
+-- Migración 001: notificación de cambios
+-- Publica en el canal iheartcare_cambios el nombre de la tabla modificada,
+-- para que la aplicación invalide sus cachés (ver utils/eventos.py)
+-- ============================================
+
+CREATE OR REPLACE FUNCTION public.notificar_cambio_tabla()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('iheartcare_cambios', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Un aviso por sentencia (no por fila) para no saturar el canal con cargas masivas
+DROP TRIGGER IF EXISTS trg_monitoreos_notificar ON public.monitoreos;
+CREATE TRIGGER trg_monitoreos_notificar
+    AFTER INSERT OR UPDATE OR DELETE ON public.monitoreos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.notificar_cambio_tabla();
+
+DROP TRIGGER IF EXISTS trg_dispositivos_notificar ON public.dispositivos;
+CREATE TRIGGER trg_dispositivos_notificar
+    AFTER INSERT OR UPDATE OR DELETE ON public.dispositivos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.notificar_cambio_tabla();
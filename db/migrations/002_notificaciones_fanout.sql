@@ -0,0 +1,24 @@
+-- ============================================
+-- Migración 002: fan-out de notificaciones
+-- - Una notificación por (usuario, alerta), para inserciones masivas idempotentes
+-- - Cursor de lectura para audiencias que leen todas las alertas (administradores),
+--   que no reciben una fila por alerta (fan-out en lectura)
+-- ============================================
+
+-- Eliminar duplicados previos antes de crear el índice único
+DELETE FROM public.notificaciones_alertas na
+USING public.notificaciones_alertas dup
+WHERE na.usuario_id = dup.usuario_id
+  AND na.alerta_id = dup.alerta_id
+  AND na.id > dup.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_notificaciones_usuario_alerta
+    ON public.notificaciones_alertas(usuario_id, alerta_id);
+
+CREATE TABLE IF NOT EXISTS public.notificaciones_lectura (
+    usuario_id INTEGER PRIMARY KEY REFERENCES public.usuarios(id) ON DELETE CASCADE,
+    ultima_alerta_id INTEGER NOT NULL DEFAULT 0,
+    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE public.notificaciones_lectura IS 'Cursor de lectura de alertas para roles con fan-out en lectura';
@@ -0,0 +1,269 @@
+-- ============================================
+-- Migración 003: tablas de contadores para los paneles de inicio
+-- Las tarjetas de app.py leen estos contadores por llave primaria en lugar de
+-- contar sobre todo el historial. Los triggers los mantienen exactos:
+-- - mediciones / alertas actualizan contadores_dispositivo (por sentencia,
+--   agregando las filas afectadas para no bloquear la fila en cada inserción)
+-- - contadores_dispositivo propaga sus cambios a contadores_paciente
+-- - notificaciones_alertas actualiza contadores_usuario
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS public.contadores_dispositivo (
+    dispositivo_id INTEGER PRIMARY KEY REFERENCES public.dispositivos(id) ON DELETE CASCADE,
+    paciente_id INTEGER NOT NULL,
+    total_mediciones BIGINT NOT NULL DEFAULT 0,
+    alertas_no_leidas BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS public.contadores_paciente (
+    paciente_id INTEGER PRIMARY KEY REFERENCES public.pacientes(id) ON DELETE CASCADE,
+    total_mediciones BIGINT NOT NULL DEFAULT 0,
+    alertas_no_leidas BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS public.contadores_usuario (
+    usuario_id INTEGER PRIMARY KEY REFERENCES public.usuarios(id) ON DELETE CASCADE,
+    notificaciones_no_leidas BIGINT NOT NULL DEFAULT 0
+);
+
+COMMENT ON TABLE public.contadores_dispositivo IS 'Mediciones y alertas no leídas por dispositivo (mantenido por triggers)';
+COMMENT ON TABLE public.contadores_paciente IS 'Suma de contadores_dispositivo por paciente (mantenido por triggers)';
+COMMENT ON TABLE public.contadores_usuario IS 'Notificaciones no leídas por usuario (mantenido por triggers)';
+
+-- --------------------------------------------
+-- Propagación dispositivo -> paciente
+-- --------------------------------------------
+CREATE OR REPLACE FUNCTION public.propagar_contadores_paciente()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE public.contadores_paciente
+        SET total_mediciones = total_mediciones - OLD.total_mediciones,
+            alertas_no_leidas = alertas_no_leidas - OLD.alertas_no_leidas
+        WHERE paciente_id = OLD.paciente_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        -- El paciente puede estar borrándose en la misma sentencia (cascada)
+        INSERT INTO public.contadores_paciente (paciente_id, total_mediciones, alertas_no_leidas)
+        SELECT NEW.paciente_id, NEW.total_mediciones, NEW.alertas_no_leidas
+        WHERE EXISTS (SELECT 1 FROM public.pacientes WHERE id = NEW.paciente_id)
+        ON CONFLICT (paciente_id) DO UPDATE
+        SET total_mediciones = contadores_paciente.total_mediciones + EXCLUDED.total_mediciones,
+            alertas_no_leidas = contadores_paciente.alertas_no_leidas + EXCLUDED.alertas_no_leidas;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_contadores_dispositivo_propagar ON public.contadores_dispositivo;
+CREATE TRIGGER trg_contadores_dispositivo_propagar
+    AFTER INSERT OR UPDATE OR DELETE ON public.contadores_dispositivo
+    FOR EACH ROW EXECUTE FUNCTION public.propagar_contadores_paciente();
+
+-- Reasignar un dispositivo mueve sus contadores al nuevo paciente
+CREATE OR REPLACE FUNCTION public.contadores_reasignar_dispositivo()
+RETURNS trigger AS $$
+BEGIN
+    UPDATE public.contadores_dispositivo
+    SET paciente_id = NEW.paciente_id
+    WHERE dispositivo_id = NEW.id AND paciente_id <> NEW.paciente_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_dispositivos_contadores ON public.dispositivos;
+CREATE TRIGGER trg_dispositivos_contadores
+    AFTER UPDATE OF paciente_id ON public.dispositivos
+    FOR EACH ROW EXECUTE FUNCTION public.contadores_reasignar_dispositivo();
+
+-- --------------------------------------------
+-- Mediciones
+-- --------------------------------------------
+CREATE OR REPLACE FUNCTION public.contadores_mediciones_insert()
+RETURNS trigger AS $$
+BEGIN
+    INSERT INTO public.contadores_dispositivo (dispositivo_id, paciente_id, total_mediciones)
+    SELECT n.dispositivo_id, d.paciente_id, COUNT(*)
+    FROM nuevas n
+    JOIN public.dispositivos d ON d.id = n.dispositivo_id
+    GROUP BY n.dispositivo_id, d.paciente_id
+    ON CONFLICT (dispositivo_id) DO UPDATE
+    SET total_mediciones = contadores_dispositivo.total_mediciones + EXCLUDED.total_mediciones;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.contadores_mediciones_delete()
+RETURNS trigger AS $$
+BEGIN
+    UPDATE public.contadores_dispositivo c
+    SET total_mediciones = c.total_mediciones - b.cantidad
+    FROM (SELECT dispositivo_id, COUNT(*) AS cantidad FROM borradas GROUP BY dispositivo_id) b
+    WHERE c.dispositivo_id = b.dispositivo_id;
+
+    -- Las alertas se borran en cascada sin poder ver ya su medición: se recalculan
+    UPDATE public.contadores_dispositivo c
+    SET alertas_no_leidas = (
+        SELECT COUNT(*)
+        FROM public.alertas a
+        JOIN public.mediciones m ON a.medicion_id = m.id
+        WHERE m.dispositivo_id = c.dispositivo_id AND a.leida = false
+    )
+    WHERE c.dispositivo_id IN (SELECT DISTINCT dispositivo_id FROM borradas);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_mediciones_contadores_insert ON public.mediciones;
+CREATE TRIGGER trg_mediciones_contadores_insert
+    AFTER INSERT ON public.mediciones
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION public.contadores_mediciones_insert();
+
+DROP TRIGGER IF EXISTS trg_mediciones_contadores_delete ON public.mediciones;
+CREATE TRIGGER trg_mediciones_contadores_delete
+    AFTER DELETE ON public.mediciones
+    REFERENCING OLD TABLE AS borradas
+    FOR EACH STATEMENT EXECUTE FUNCTION public.contadores_mediciones_delete();
+
+-- --------------------------------------------
+-- Alertas (no leídas = leida = false, igual que en las consultas de la app)
+-- --------------------------------------------
+CREATE OR REPLACE FUNCTION public.contadores_alertas_aplicar(medicion_ids INTEGER[], deltas INTEGER[])
+RETURNS void AS $$
+    INSERT INTO public.contadores_dispositivo (dispositivo_id, paciente_id, alertas_no_leidas)
+    SELECT m.dispositivo_id, d.paciente_id, SUM(c.delta)
+    FROM unnest(medicion_ids, deltas) AS c(medicion_id, delta)
+    JOIN public.mediciones m ON m.id = c.medicion_id
+    JOIN public.dispositivos d ON d.id = m.dispositivo_id
+    GROUP BY m.dispositivo_id, d.paciente_id
+    HAVING SUM(c.delta) <> 0
+    ON CONFLICT (dispositivo_id) DO UPDATE
+    SET alertas_no_leidas = contadores_dispositivo.alertas_no_leidas + EXCLUDED.alertas_no_leidas;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION public.contadores_alertas()
+RETURNS trigger AS $$
+BEGIN
+    -- En DELETE la medición puede no existir ya (borrado en cascada);
+    -- ese caso lo recalcula contadores_mediciones_delete
+    IF TG_OP = 'INSERT' THEN
+        PERFORM public.contadores_alertas_aplicar(array_agg(medicion_id), array_agg(1))
+        FROM nuevas WHERE leida = false;
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM public.contadores_alertas_aplicar(array_agg(medicion_id), array_agg(delta))
+        FROM (
+            SELECT medicion_id, -1 AS delta FROM viejas WHERE leida = false
+            UNION ALL
+            SELECT medicion_id, 1 FROM nuevas WHERE leida = false
+        ) cambio;
+    ELSE
+        PERFORM public.contadores_alertas_aplicar(array_agg(medicion_id), array_agg(-1))
+        FROM viejas WHERE leida = false;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_alertas_contadores_insert ON public.alertas;
+CREATE TRIGGER trg_alertas_contadores_insert
+    AFTER INSERT ON public.alertas
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION public.contadores_alertas();
+
+DROP TRIGGER IF EXISTS trg_alertas_contadores_update ON public.alertas;
+CREATE TRIGGER trg_alertas_contadores_update
+    AFTER UPDATE ON public.alertas
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION public.contadores_alertas();
+
+DROP TRIGGER IF EXISTS trg_alertas_contadores_delete ON public.alertas;
+CREATE TRIGGER trg_alertas_contadores_delete
+    AFTER DELETE ON public.alertas
+    REFERENCING OLD TABLE AS viejas
+    FOR EACH STATEMENT EXECUTE FUNCTION public.contadores_alertas();
+
+-- --------------------------------------------
+-- Notificaciones por usuario
+-- --------------------------------------------
+CREATE OR REPLACE FUNCTION public.contadores_notificaciones()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO public.contadores_usuario (usuario_id, notificaciones_no_leidas)
+        SELECT usuario_id, COUNT(*) FROM nuevas WHERE leida = false GROUP BY usuario_id
+        ON CONFLICT (usuario_id) DO UPDATE
+        SET notificaciones_no_leidas = contadores_usuario.notificaciones_no_leidas + EXCLUDED.notificaciones_no_leidas;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO public.contadores_usuario (usuario_id, notificaciones_no_leidas)
+        SELECT usuario_id, SUM(delta) FROM (
+            SELECT usuario_id, -1 AS delta FROM viejas WHERE leida = false
+            UNION ALL
+            SELECT usuario_id, 1 FROM nuevas WHERE leida = false
+        ) cambio
+        GROUP BY usuario_id
+        HAVING SUM(delta) <> 0
+        ON CONFLICT (usuario_id) DO UPDATE
+        SET notificaciones_no_leidas = contadores_usuario.notificaciones_no_leidas + EXCLUDED.notificaciones_no_leidas;
+    ELSE
+        UPDATE public.contadores_usuario c
+        SET notificaciones_no_leidas = c.notificaciones_no_leidas - b.cantidad
+        FROM (SELECT usuario_id, COUNT(*) AS cantidad FROM borradas WHERE leida = false GROUP BY usuario_id) b
+        WHERE c.usuario_id = b.usuario_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_notificaciones_contadores_insert ON public.notificaciones_alertas;
+CREATE TRIGGER trg_notificaciones_contadores_insert
+    AFTER INSERT ON public.notificaciones_alertas
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION public.contadores_notificaciones();
+
+DROP TRIGGER IF EXISTS trg_notificaciones_contadores_update ON public.notificaciones_alertas;
+CREATE TRIGGER trg_notificaciones_contadores_update
+    AFTER UPDATE ON public.notificaciones_alertas
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION public.contadores_notificaciones();
+
+DROP TRIGGER IF EXISTS trg_notificaciones_contadores_delete ON public.notificaciones_alertas;
+CREATE TRIGGER trg_notificaciones_contadores_delete
+    AFTER DELETE ON public.notificaciones_alertas
+    REFERENCING OLD TABLE AS borradas
+    FOR EACH STATEMENT EXECUTE FUNCTION public.contadores_notificaciones();
+
+-- --------------------------------------------
+-- Carga inicial con los valores exactos actuales
+-- --------------------------------------------
+INSERT INTO public.contadores_dispositivo (dispositivo_id, paciente_id, total_mediciones, alertas_no_leidas)
+SELECT d.id, d.paciente_id,
+       (SELECT COUNT(*) FROM public.mediciones m WHERE m.dispositivo_id = d.id),
+       (SELECT COUNT(*) FROM public.alertas a
+        JOIN public.mediciones m ON a.medicion_id = m.id
+        WHERE m.dispositivo_id = d.id AND a.leida = false)
+FROM public.dispositivos d
+ON CONFLICT (dispositivo_id) DO UPDATE
+SET paciente_id = EXCLUDED.paciente_id,
+    total_mediciones = EXCLUDED.total_mediciones,
+    alertas_no_leidas = EXCLUDED.alertas_no_leidas;
+
+-- La propagación anterior acumula sobre lo existente: se fija el valor exacto al final
+INSERT INTO public.contadores_paciente (paciente_id, total_mediciones, alertas_no_leidas)
+SELECT p.id,
+       COALESCE(SUM(c.total_mediciones), 0),
+       COALESCE(SUM(c.alertas_no_leidas), 0)
+FROM public.pacientes p
+LEFT JOIN public.contadores_dispositivo c ON c.paciente_id = p.id
+GROUP BY p.id
+ON CONFLICT (paciente_id) DO UPDATE
+SET total_mediciones = EXCLUDED.total_mediciones,
+    alertas_no_leidas = EXCLUDED.alertas_no_leidas;
+
+INSERT INTO public.contadores_usuario (usuario_id, notificaciones_no_leidas)
+SELECT u.id,
+       (SELECT COUNT(*) FROM public.notificaciones_alertas na
+        WHERE na.usuario_id = u.id AND na.leida = false)
+FROM public.usuarios u
+ON CONFLICT (usuario_id) DO UPDATE
+SET notificaciones_no_leidas = EXCLUDED.notificaciones_no_leidas;
@@ -0,0 +1,18 @@
+-- ============================================
+-- Migración 004: índices para paginación por llave (timestamp, id)
+-- Cubren el ORDER BY timestamp DESC, id DESC y el filtro
+-- (timestamp, id) < cursor de obtener_pagina_alertas y
+-- obtener_historial_notificaciones, de modo que cada página es un
+-- recorrido corto del índice sin importar su profundidad
+-- ============================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_alertas_timestamp_id
+    ON public.alertas(timestamp DESC, id DESC);
+
+-- Pestaña "Resueltas"
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_alertas_leidas_timestamp_id
+    ON public.alertas(timestamp DESC, id DESC)
+    WHERE leida = true;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_notificaciones_usuario_timestamp_id
+    ON public.notificaciones_alertas(usuario_id, timestamp DESC, id DESC);
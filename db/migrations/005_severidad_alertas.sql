@@ -0,0 +1,27 @@
+-- ============================================
+-- Migración 005: severidad de alertas como código
+-- 1 = informativa, 2 = advertencia, 3 = crítica (ver utils/alerta_generator.py).
+-- La aplicación la calcula al crear la alerta; aquí se rellenan las existentes
+-- con los mismos patrones que severidad_alerta()
+-- ============================================
+
+ALTER TABLE public.alertas
+    ADD COLUMN IF NOT EXISTS severidad SMALLINT NOT NULL DEFAULT 1;
+
+UPDATE public.alertas
+SET severidad = CASE
+    WHEN tipo_alerta ~* 'cr[ií]tica|paro|arritmia' THEN 3
+    WHEN tipo_alerta ~* 'advertencia|elevada|baja' THEN 2
+    ELSE 1
+END
+WHERE severidad IS DISTINCT FROM CASE
+    WHEN tipo_alerta ~* 'cr[ií]tica|paro|arritmia' THEN 3
+    WHEN tipo_alerta ~* 'advertencia|elevada|baja' THEN 2
+    ELSE 1
+END;
+
+COMMENT ON COLUMN public.alertas.severidad IS '1 = informativa, 2 = advertencia, 3 = crítica';
+
+-- Paginación por categoría (mismo orden que idx_alertas_timestamp_id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_alertas_severidad_timestamp_id
+    ON public.alertas(severidad, timestamp DESC, id DESC);
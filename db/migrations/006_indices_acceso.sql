@@ -0,0 +1,32 @@
+-- ============================================
+-- Migración 006: índices ajustados a las rutas de acceso reales
+-- Sustituye los índices sobre booleanos de baja cardinalidad por índices
+-- parciales y compuestos que cubren las consultas frecuentes.
+-- Todo con CONCURRENTLY para no bloquear escrituras (la migración corre en
+-- AUTOCOMMIT). Verificar con: python scripts/verificar_planes.py
+-- ============================================
+
+-- Notificaciones pendientes por usuario, las más recientes primero
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_notificaciones_usuario_no_leidas
+    ON public.notificaciones_alertas(usuario_id, timestamp DESC)
+    WHERE leida = false;
+
+-- Últimas mediciones de un dispositivo / paciente y ventanas por fecha
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_mediciones_dispositivo_timestamp
+    ON public.mediciones(dispositivo_id, timestamp DESC);
+
+-- Alertas pendientes de una medición (conteos y joins desde mediciones)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_alertas_medicion_no_leidas
+    ON public.alertas(medicion_id)
+    WHERE leida = false;
+
+-- Monitoreos activos (roster y sala)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_monitoreos_activos_paciente
+    ON public.monitoreos(paciente_id, fecha_inicio DESC)
+    WHERE activo = true;
+
+-- Índices reemplazados: booleanos solos y el prefijo de idx_mediciones_dispositivo_timestamp
+DROP INDEX CONCURRENTLY IF EXISTS public.idx_alertas_leida;
+DROP INDEX CONCURRENTLY IF EXISTS public.idx_notificaciones_leida;
+DROP INDEX CONCURRENTLY IF EXISTS public.idx_monitoreos_activo;
+DROP INDEX CONCURRENTLY IF EXISTS public.idx_mediciones_dispositivo_id;
@@ -0,0 +1,33 @@
+-- ============================================
+-- Migración 007: episodios de alerta
+-- Una alerta representa un episodio: se abre con la primera lectura fuera de
+-- rango y las lecturas anormales siguientes del mismo paciente y signo vital
+-- solo actualizan el episodio (conteo, pico, última lectura) hasta que pasa
+-- un periodo sin lecturas anormales (ver utils/alerta_generator.py)
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS public.alertas_episodios (
+    id SERIAL PRIMARY KEY,
+    alerta_id INTEGER NOT NULL UNIQUE REFERENCES public.alertas(id) ON DELETE CASCADE,
+    paciente_id INTEGER NOT NULL REFERENCES public.pacientes(id) ON DELETE CASCADE,
+    tipo_medicion VARCHAR(50) NOT NULL,
+    severidad SMALLINT NOT NULL,
+    inicio TIMESTAMP NOT NULL,
+    ultima_lectura TIMESTAMP NOT NULL,
+    lecturas INTEGER NOT NULL DEFAULT 1,
+    valor_pico NUMERIC(10, 2) NOT NULL,
+    abierto BOOLEAN NOT NULL DEFAULT true,
+    fecha_cierre TIMESTAMP
+);
+
+COMMENT ON TABLE public.alertas_episodios IS 'Estado de cada alerta como episodio (lecturas anormales agrupadas)';
+
+-- Un solo episodio abierto por paciente y signo vital
+CREATE UNIQUE INDEX IF NOT EXISTS uq_alertas_episodios_abiertos
+    ON public.alertas_episodios(paciente_id, tipo_medicion)
+    WHERE abierto = true;
+
+-- Cierre periódico de episodios inactivos
+CREATE INDEX IF NOT EXISTS idx_alertas_episodios_abiertos_ultima
+    ON public.alertas_episodios(ultima_lectura)
+    WHERE abierto = true;
@@ -0,0 +1,81 @@
+-- ============================================
+-- Migración 008: paciente de la alerta desnormalizado y avisos de asignaciones
+-- Las consultas de alertas filtran con alertas.paciente_id = ANY(:pacientes)
+-- usando el mapa de acceso cacheado (utils/acceso.py), en lugar de unir
+-- mediciones, dispositivos, pacientes_medicos y personal_medico en cada lectura
+-- ============================================
+
+ALTER TABLE public.alertas
+    ADD COLUMN IF NOT EXISTS paciente_id INTEGER;
+
+COMMENT ON COLUMN public.alertas.paciente_id IS
+    'Paciente del dispositivo de la medición (copia mantenida por triggers)';
+
+-- La aplicación lo envía al crear la alerta; el trigger cubre cualquier otro INSERT
+CREATE OR REPLACE FUNCTION public.alertas_asignar_paciente()
+RETURNS trigger AS $$
+BEGIN
+    IF NEW.paciente_id IS NULL THEN
+        SELECT d.paciente_id INTO NEW.paciente_id
+        FROM public.mediciones m
+        JOIN public.dispositivos d ON d.id = m.dispositivo_id
+        WHERE m.id = NEW.medicion_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_alertas_paciente ON public.alertas;
+CREATE TRIGGER trg_alertas_paciente
+    BEFORE INSERT ON public.alertas
+    FOR EACH ROW EXECUTE FUNCTION public.alertas_asignar_paciente();
+
+-- Igual que contadores_dispositivo: las alertas siguen al dispositivo si cambia de paciente
+CREATE OR REPLACE FUNCTION public.alertas_reasignar_dispositivo()
+RETURNS trigger AS $$
+BEGIN
+    UPDATE public.alertas a
+    SET paciente_id = NEW.paciente_id
+    FROM public.mediciones m
+    WHERE a.medicion_id = m.id
+      AND m.dispositivo_id = NEW.id
+      AND a.paciente_id IS DISTINCT FROM NEW.paciente_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_dispositivos_alertas_paciente ON public.dispositivos;
+CREATE TRIGGER trg_dispositivos_alertas_paciente
+    AFTER UPDATE OF paciente_id ON public.dispositivos
+    FOR EACH ROW EXECUTE FUNCTION public.alertas_reasignar_dispositivo();
+
+UPDATE public.alertas a
+SET paciente_id = d.paciente_id
+FROM public.mediciones m
+JOIN public.dispositivos d ON d.id = m.dispositivo_id
+WHERE a.medicion_id = m.id
+  AND a.paciente_id IS DISTINCT FROM d.paciente_id;
+
+-- Página de alertas por paciente y alertas no leídas por severidad
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_alertas_paciente_timestamp_id
+    ON public.alertas(paciente_id, timestamp DESC, id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_alertas_paciente_no_leidas
+    ON public.alertas(paciente_id, severidad DESC, timestamp DESC)
+    WHERE leida = false;
+
+-- Invalidación del mapa de acceso (ver 001_notificar_cambios.sql)
+DROP TRIGGER IF EXISTS trg_pacientes_medicos_notificar ON public.pacientes_medicos;
+CREATE TRIGGER trg_pacientes_medicos_notificar
+    AFTER INSERT OR UPDATE OR DELETE ON public.pacientes_medicos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.notificar_cambio_tabla();
+
+DROP TRIGGER IF EXISTS trg_personal_medico_notificar ON public.personal_medico;
+CREATE TRIGGER trg_personal_medico_notificar
+    AFTER INSERT OR UPDATE OR DELETE ON public.personal_medico
+    FOR EACH STATEMENT EXECUTE FUNCTION public.notificar_cambio_tabla();
+
+DROP TRIGGER IF EXISTS trg_pacientes_notificar ON public.pacientes;
+CREATE TRIGGER trg_pacientes_notificar
+    AFTER INSERT OR UPDATE OR DELETE ON public.pacientes
+    FOR EACH STATEMENT EXECUTE FUNCTION public.notificar_cambio_tabla();
@@ -0,0 +1,32 @@
+-- ============================================
+-- Migración 009: escalamiento de alertas críticas
+-- nivel_escalamiento cuenta los niveles de NIVELES_ESCALAMIENTO ya aplicados
+-- (ver utils/escalamiento.py). Con él el planificador reconstruye sus
+-- temporizadores en una sola consulta tras un reinicio y no repite niveles.
+-- ============================================
+
+ALTER TABLE public.alertas
+    ADD COLUMN IF NOT EXISTS nivel_escalamiento SMALLINT NOT NULL DEFAULT 0;
+
+COMMENT ON COLUMN public.alertas.nivel_escalamiento IS
+    'Niveles de escalamiento aplicados a la alerta (0 = solo notificación inicial)';
+
+-- Las críticas sin leer anteriores a la migración que ya pasaron el último
+-- nivel (15 min) se dan por escaladas: el planificador no debe avisar ni
+-- enviar correos por alertas antiguas. Las más recientes siguen su curso.
+UPDATE public.alertas
+SET nivel_escalamiento = 2
+WHERE leida = false
+  AND severidad = 3
+  AND nivel_escalamiento < 2
+  AND timestamp < LOCALTIMESTAMP - INTERVAL '15 minutes';
+
+-- Alertas críticas sin atender: la consulta de reconstrucción del planificador
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_alertas_criticas_pendientes
+    ON public.alertas(timestamp)
+    WHERE leida = false AND severidad = 3;
+
+-- Escalamientos pendientes de los roles con fan-out en lectura
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_notificaciones_escalamiento_no_leidas
+    ON public.notificaciones_alertas(usuario_id, alerta_id)
+    WHERE tipo = 'escalamiento' AND leida = false;
@@ -0,0 +1,124 @@
+-- ============================================
+-- Migración 010: cola de entrega de notificaciones (email, SMS, webhook)
+-- Los triggers encolan una entrega por canal activo del usuario al crear una
+-- notificación (o al escalarla); los trabajadores de utils/entregas.py la
+-- consumen con FOR UPDATE SKIP LOCKED, fuera de la petición y de la ingesta
+-- ============================================
+
+-- Canales de entrega de cada usuario
+CREATE TABLE IF NOT EXISTS public.canales_usuario (
+    usuario_id INTEGER NOT NULL REFERENCES public.usuarios(id) ON DELETE CASCADE,
+    canal VARCHAR(20) NOT NULL CHECK (canal IN ('email', 'sms', 'webhook')),
+    destino TEXT NOT NULL,
+    severidad_minima SMALLINT NOT NULL DEFAULT 3,
+    activo BOOLEAN NOT NULL DEFAULT true,
+    PRIMARY KEY (usuario_id, canal)
+);
+
+COMMENT ON TABLE public.canales_usuario IS 'Destinos de entrega externa por usuario y canal';
+COMMENT ON COLUMN public.canales_usuario.severidad_minima IS
+    'Severidad mínima de alerta que se entrega (los escalamientos se entregan siempre)';
+
+-- Cola de entregas. Para 'enviando', proximo_intento es el vencimiento del
+-- bloqueo: si el trabajador muere, la entrega se vuelve a reclamar
+CREATE TABLE IF NOT EXISTS public.entregas_notificaciones (
+    id BIGSERIAL PRIMARY KEY,
+    notificacion_id INTEGER REFERENCES public.notificaciones_alertas(id) ON DELETE SET NULL,
+    usuario_id INTEGER NOT NULL REFERENCES public.usuarios(id) ON DELETE CASCADE,
+    canal VARCHAR(20) NOT NULL,
+    destino TEXT NOT NULL,
+    cuerpo TEXT NOT NULL,
+    estado VARCHAR(20) NOT NULL DEFAULT 'pendiente'
+        CHECK (estado IN ('pendiente', 'enviando', 'entregada', 'fallida')),
+    intentos SMALLINT NOT NULL DEFAULT 0,
+    proximo_intento TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    fecha_creacion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    fecha_entrega TIMESTAMP,
+    ultimo_error TEXT
+);
+
+COMMENT ON TABLE public.entregas_notificaciones IS
+    'Cola de entrega externa de notificaciones; fallida = agotó sus reintentos (dead letter)';
+
+CREATE INDEX IF NOT EXISTS idx_entregas_por_enviar
+    ON public.entregas_notificaciones(canal, proximo_intento)
+    WHERE estado IN ('pendiente', 'enviando');
+
+CREATE INDEX IF NOT EXISTS idx_entregas_entregadas
+    ON public.entregas_notificaciones(fecha_entrega)
+    WHERE estado = 'entregada';
+
+CREATE INDEX IF NOT EXISTS idx_entregas_fallidas
+    ON public.entregas_notificaciones(fecha_creacion)
+    WHERE estado = 'fallida';
+
+-- --------------------------------------------
+-- Encolado
+-- --------------------------------------------
+CREATE OR REPLACE FUNCTION public.encolar_entregas()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO public.entregas_notificaciones (notificacion_id, usuario_id, canal, destino, cuerpo)
+        SELECT n.id, n.usuario_id, cu.canal, cu.destino,
+               json_build_object(
+                   'notificacion_id', n.id,
+                   'alerta_id', a.id,
+                   'tipo', n.tipo,
+                   'tipo_alerta', a.tipo_alerta,
+                   'severidad', a.severidad,
+                   'mensaje', a.mensaje,
+                   'paciente_id', a.paciente_id,
+                   'timestamp', a.timestamp
+               )::text
+        FROM nuevas n
+        JOIN public.alertas a ON a.id = n.alerta_id
+        JOIN public.canales_usuario cu ON cu.usuario_id = n.usuario_id AND cu.activo = true
+        WHERE n.leida = false
+          AND (a.severidad >= cu.severidad_minima OR n.tipo = 'escalamiento');
+    ELSE
+        -- Solo los escalamientos (la notificación se vuelve a levantar con nueva fecha)
+        INSERT INTO public.entregas_notificaciones (notificacion_id, usuario_id, canal, destino, cuerpo)
+        SELECT n.id, n.usuario_id, cu.canal, cu.destino,
+               json_build_object(
+                   'notificacion_id', n.id,
+                   'alerta_id', a.id,
+                   'tipo', n.tipo,
+                   'tipo_alerta', a.tipo_alerta,
+                   'severidad', a.severidad,
+                   'mensaje', a.mensaje,
+                   'paciente_id', a.paciente_id,
+                   'timestamp', a.timestamp
+               )::text
+        FROM nuevas n
+        JOIN viejas v ON v.id = n.id
+        JOIN public.alertas a ON a.id = n.alerta_id
+        JOIN public.canales_usuario cu ON cu.usuario_id = n.usuario_id AND cu.activo = true
+        WHERE n.tipo = 'escalamiento'
+          AND n.leida = false
+          AND n.timestamp IS DISTINCT FROM v.timestamp;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_notificaciones_entregas_insert ON public.notificaciones_alertas;
+CREATE TRIGGER trg_notificaciones_entregas_insert
+    AFTER INSERT ON public.notificaciones_alertas
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION public.encolar_entregas();
+
+DROP TRIGGER IF EXISTS trg_notificaciones_entregas_update ON public.notificaciones_alertas;
+CREATE TRIGGER trg_notificaciones_entregas_update
+    AFTER UPDATE ON public.notificaciones_alertas
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION public.encolar_entregas();
+
+-- Correo del personal médico como canal inicial
+INSERT INTO public.canales_usuario (usuario_id, canal, destino)
+SELECT pm.usuario_id, 'email', pm.email
+FROM public.personal_medico pm
+WHERE pm.usuario_id IS NOT NULL
+  AND pm.email IS NOT NULL
+  AND pm.email <> ''
+ON CONFLICT (usuario_id, canal) DO NOTHING;
@@ -0,0 +1,110 @@
+-- ============================================
+-- Migración 011: último valor de cada signo vital por paciente
+-- Tabla mantenida por triggers para que "Mis Pacientes" lea el último valor
+-- y las alertas no leídas de todos los pacientes del médico en una consulta,
+-- sin recorrer el historial de mediciones de cada uno
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS public.ultimas_mediciones (
+    paciente_id INTEGER NOT NULL REFERENCES public.pacientes(id) ON DELETE CASCADE,
+    tipo_medicion VARCHAR(50) NOT NULL,
+    medicion_id INTEGER NOT NULL,
+    valor NUMERIC(10, 2) NOT NULL,
+    unidad_medida VARCHAR(20),
+    timestamp TIMESTAMP NOT NULL,
+    PRIMARY KEY (paciente_id, tipo_medicion)
+);
+
+COMMENT ON TABLE public.ultimas_mediciones IS 'Última medición de cada tipo por paciente (mantenido por triggers)';
+
+-- --------------------------------------------
+-- Mediciones nuevas
+-- --------------------------------------------
+CREATE OR REPLACE FUNCTION public.ultimas_mediciones_insert()
+RETURNS trigger AS $$
+BEGIN
+    INSERT INTO public.ultimas_mediciones (paciente_id, tipo_medicion, medicion_id, valor, unidad_medida, timestamp)
+    SELECT DISTINCT ON (d.paciente_id, n.tipo_medicion)
+           d.paciente_id, n.tipo_medicion, n.id, n.valor, n.unidad_medida, COALESCE(n.timestamp, NOW())
+    FROM nuevas n
+    JOIN public.dispositivos d ON d.id = n.dispositivo_id
+    WHERE d.paciente_id IS NOT NULL
+    ORDER BY d.paciente_id, n.tipo_medicion, COALESCE(n.timestamp, NOW()) DESC, n.id DESC
+    ON CONFLICT (paciente_id, tipo_medicion) DO UPDATE
+    SET medicion_id = EXCLUDED.medicion_id,
+        valor = EXCLUDED.valor,
+        unidad_medida = EXCLUDED.unidad_medida,
+        timestamp = EXCLUDED.timestamp
+    -- Las lecturas atrasadas no reemplazan a una más reciente
+    WHERE ultimas_mediciones.timestamp <= EXCLUDED.timestamp;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_mediciones_ultimas_insert ON public.mediciones;
+CREATE TRIGGER trg_mediciones_ultimas_insert
+    AFTER INSERT ON public.mediciones
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION public.ultimas_mediciones_insert();
+
+-- --------------------------------------------
+-- Recalcular un conjunto de pacientes (borrados y reasignaciones, poco frecuentes)
+-- --------------------------------------------
+CREATE OR REPLACE FUNCTION public.ultimas_mediciones_recalcular(paciente_ids INTEGER[])
+RETURNS void AS $$
+    DELETE FROM public.ultimas_mediciones WHERE paciente_id = ANY(paciente_ids);
+
+    INSERT INTO public.ultimas_mediciones (paciente_id, tipo_medicion, medicion_id, valor, unidad_medida, timestamp)
+    SELECT DISTINCT ON (d.paciente_id, m.tipo_medicion)
+           d.paciente_id, m.tipo_medicion, m.id, m.valor, m.unidad_medida, m.timestamp
+    FROM public.mediciones m
+    JOIN public.dispositivos d ON d.id = m.dispositivo_id
+    WHERE d.paciente_id = ANY(paciente_ids)
+      AND m.timestamp IS NOT NULL
+    ORDER BY d.paciente_id, m.tipo_medicion, m.timestamp DESC, m.id DESC;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION public.ultimas_mediciones_delete()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM public.ultimas_mediciones_recalcular(array_agg(DISTINCT u.paciente_id))
+    FROM borradas b
+    JOIN public.ultimas_mediciones u ON u.medicion_id = b.id
+    HAVING COUNT(*) > 0;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_mediciones_ultimas_delete ON public.mediciones;
+CREATE TRIGGER trg_mediciones_ultimas_delete
+    AFTER DELETE ON public.mediciones
+    REFERENCING OLD TABLE AS borradas
+    FOR EACH STATEMENT EXECUTE FUNCTION public.ultimas_mediciones_delete();
+
+CREATE OR REPLACE FUNCTION public.ultimas_mediciones_reasignar_dispositivo()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM public.ultimas_mediciones_recalcular(
+        array_remove(ARRAY[OLD.paciente_id, NEW.paciente_id], NULL)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_dispositivos_ultimas_mediciones ON public.dispositivos;
+CREATE TRIGGER trg_dispositivos_ultimas_mediciones
+    AFTER UPDATE OF paciente_id ON public.dispositivos
+    FOR EACH ROW
+    WHEN (OLD.paciente_id IS DISTINCT FROM NEW.paciente_id)
+    EXECUTE FUNCTION public.ultimas_mediciones_reasignar_dispositivo();
+
+-- Backfill
+INSERT INTO public.ultimas_mediciones (paciente_id, tipo_medicion, medicion_id, valor, unidad_medida, timestamp)
+SELECT DISTINCT ON (d.paciente_id, m.tipo_medicion)
+       d.paciente_id, m.tipo_medicion, m.id, m.valor, m.unidad_medida, m.timestamp
+FROM public.mediciones m
+JOIN public.dispositivos d ON d.id = m.dispositivo_id
+WHERE d.paciente_id IS NOT NULL
+  AND m.timestamp IS NOT NULL
+ORDER BY d.paciente_id, m.tipo_medicion, m.timestamp DESC, m.id DESC
+ON CONFLICT (paciente_id, tipo_medicion) DO NOTHING;
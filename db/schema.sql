@@ -4,6 +4,15 @@
 -- ============================================
 
 -- Eliminar tablas existentes (solo para desarrollo)
+DROP TABLE IF EXISTS public.migraciones_aplicadas CASCADE;
+DROP TABLE IF EXISTS public.ultimas_mediciones CASCADE;
+DROP TABLE IF EXISTS public.entregas_notificaciones CASCADE;
+DROP TABLE IF EXISTS public.canales_usuario CASCADE;
+DROP TABLE IF EXISTS public.alertas_episodios CASCADE;
+DROP TABLE IF EXISTS public.contadores_usuario CASCADE;
+DROP TABLE IF EXISTS public.contadores_paciente CASCADE;
+DROP TABLE IF EXISTS public.contadores_dispositivo CASCADE;
+DROP TABLE IF EXISTS public.notificaciones_lectura CASCADE;
 DROP TABLE IF EXISTS public.alertas CASCADE;
 DROP TABLE IF EXISTS public.mediciones CASCADE;
 DROP TABLE IF EXISTS public.monitoreos CASCADE;
@@ -6,7 +6,8 @@ from sqlalchemy import text
 from core.auth import require_auth
 from core.sidebar import render_sidebar
 from core.theme import apply_global_theme
-from utils import breadcrumb_nav
+from core.db import obtener_conexion, consultar_cacheado
+from utils import breadcrumb_nav, obtener_detalle_paciente
 
 # --- PROTECCIÓN DE RUTA ---
 require_auth(allowed_roles=['administrador'])
@@ -21,7 +22,7 @@ breadcrumb_nav(["Home", "Administración", "Pacientes"])
 
 # --- CONEXIÓN A LA BASE DE DATOS ---
 try:
-    conn = st.connection("postgresql", type="sql")
+    conn = obtener_conexion()
 except Exception:
     st.error("No se pudo establecer conexión con la base de datos.")
     st.stop()
@@ -42,22 +43,15 @@ if st.session_state.get('ver_detalle_paciente_id'):
     
     st.markdown("---")
     
-    # Obtener datos completos del paciente
+    # Obtener datos completos del paciente (una sola consulta para todas las secciones)
     try:
-        with conn.session as s:
-            query = text("""
-                SELECT id, nombre, apellido_paterno, apellido_materno, fecha_nacimiento,
-                       curp, nss, sexo, estado_civil, domicilio, email, telefono, diagnostico
-                FROM public.pacientes
-                WHERE id = :pid
-            """)
-            resultado = s.execute(query, {'pid': paciente_id}).fetchone()
+        resultado = obtener_detalle_paciente(paciente_id)
         
         if resultado:
-            nombre_completo = f"{resultado[1]} {resultado[2]} {resultado[3] or ''}".strip()
+            nombre_completo = f"{resultado['nombre']} {resultado['apellido_paterno']} {resultado['apellido_materno'] or ''}".strip()
             
             st.markdown(f"## {nombre_completo}")
-            st.caption(f"NSS: {resultado[6] or 'No registrado'}  |  CURP: {resultado[5] or 'No registrado'}")
+            st.caption(f"NSS: {resultado['nss'] or 'No registrado'}  |  CURP: {resultado['curp'] or 'No registrado'}")
             
             st.markdown("---")
             
@@ -66,180 +60,113 @@ if st.session_state.get('ver_detalle_paciente_id'):
             col1, col2, col3 = st.columns(3)
             with col1:
                 st.markdown("**Fecha de Nacimiento**")
-                st.write(str(resultado[4]) if resultado[4] else "No registrada")
+                st.write(str(resultado['fecha_nacimiento']) if resultado['fecha_nacimiento'] else "No registrada")
                 st.markdown("**Sexo**")
-                st.write(resultado[7] or "No registrado")
+                st.write(resultado['sexo'] or "No registrado")
             with col2:
                 st.markdown("**Estado Civil**")
-                st.write(resultado[8] or "No registrado")
+                st.write(resultado['estado_civil'] or "No registrado")
                 st.markdown("**Teléfono**")
-                st.write(resultado[11] or "No registrado")
+                st.write(resultado['telefono'] or "No registrado")
             with col3:
                 st.markdown("**Correo Electrónico**")
-                st.write(resultado[10] or "No registrado")
+                st.write(resultado['email'] or "No registrado")
                 st.markdown("**Domicilio**")
-                st.write(resultado[9] or "No registrado")
+                st.write(resultado['domicilio'] or "No registrado")
             
             # --- DIAGNÓSTICO ---
             st.markdown("---")
             st.markdown("### Diagnóstico")
-            st.write(resultado[12] if resultado[12] else "Sin diagnóstico registrado")
+            st.write(resultado['diagnostico'] if resultado['diagnostico'] else "Sin diagnóstico registrado")
             
             # --- DISPOSITIVO ASIGNADO ---
             st.markdown("---")
             st.markdown("### Dispositivo Asignado")
-            try:
-                with conn.session as s:
-                    disp_query = text("""
-                        SELECT id, modelo, mac_address, activo, fecha_asignacion
-                        FROM public.dispositivos
-                        WHERE paciente_id = :pid
-                        ORDER BY activo DESC, fecha_asignacion DESC
-                        LIMIT 1
-                    """)
-                    dispositivo = s.execute(disp_query, {'pid': paciente_id}).fetchone()
-                
-                if dispositivo:
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.markdown("**Modelo**")
-                        st.write(dispositivo[1])
-                    with col2:
-                        st.markdown("**MAC Address**")
-                        st.write(dispositivo[2] or "N/A")
-                    with col3:
-                        st.markdown("**Estado**")
-                        st.write("Activo" if dispositivo[3] else "Inactivo")
-                else:
-                    st.info("No tiene dispositivo asignado")
-            except Exception as e:
-                st.warning(f"No se pudo cargar dispositivo: {e}")
+            dispositivo = resultado['dispositivo']
+            if dispositivo:
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.markdown("**Modelo**")
+                    st.write(dispositivo['modelo'])
+                with col2:
+                    st.markdown("**MAC Address**")
+                    st.write(dispositivo['mac_address'] or "N/A")
+                with col3:
+                    st.markdown("**Estado**")
+                    st.write("Activo" if dispositivo['activo'] else "Inactivo")
+            else:
+                st.info("No tiene dispositivo asignado")
             
             # --- MÉDICOS ASIGNADOS ---
             st.markdown("---")
             st.markdown("### Médicos Asignados")
-            try:
-                with conn.session as s:
-                    med_query = text("""
-                        SELECT pm_med.nombre, pm_med.apellido_paterno, pm_med.especialidad
-                        FROM public.personal_medico pm_med
-                        JOIN public.pacientes_medicos pm ON pm_med.id = pm.medico_id
-                        WHERE pm.paciente_id = :pid
-                        ORDER BY pm_med.nombre
-                    """)
-                    medicos = s.execute(med_query, {'pid': paciente_id}).fetchall()
-                
-                if medicos:
-                    for med in medicos:
-                        with st.container(border=True):
-                            st.markdown(f"**Dr(a). {med[0]} {med[1]}**")
-                            st.caption(f"Especialidad: {med[2]}")
-                else:
-                    st.info("No tiene médicos asignados")
-            except Exception as e:
-                st.warning(f"No se pudieron cargar médicos: {e}")
+            if resultado['medicos']:
+                for med in resultado['medicos']:
+                    with st.container(border=True):
+                        st.markdown(f"**Dr(a). {med['nombre']} {med['apellido_paterno']}**")
+                        st.caption(f"Especialidad: {med['especialidad']}")
+            else:
+                st.info("No tiene médicos asignados")
             
             # --- ALERTAS PENDIENTES ---
             st.markdown("---")
             st.markdown("### Alertas Pendientes")
-            try:
-                with conn.session as s:
-                    alertas_query = text("""
-                        SELECT a.tipo_alerta, a.mensaje, a.timestamp,
-                               m.tipo_medicion, m.valor, m.unidad_medida
-                        FROM public.alertas a
-                        JOIN public.mediciones m ON a.medicion_id = m.id
-                        JOIN public.dispositivos d ON m.dispositivo_id = d.id
-                        WHERE d.paciente_id = :pid AND a.leida = false
-                        ORDER BY a.timestamp DESC
-                        LIMIT 10
-                    """)
-                    alertas = s.execute(alertas_query, {'pid': paciente_id}).fetchall()
-                
-                if alertas:
-                    for alerta in alertas:
-                        with st.container(border=True):
-                            col1, col2 = st.columns([3, 1])
-                            with col1:
-                                st.markdown(f"**{alerta[3].replace('_', ' ').title()}:** {alerta[4]} {alerta[5]}")
-                                st.caption(alerta[1])
-                            with col2:
-                                st.caption(alerta[2].strftime('%d/%m/%Y %H:%M'))
-                else:
-                    st.info("No hay alertas pendientes")
-            except Exception as e:
-                st.warning(f"No se pudieron cargar alertas: {e}")
+            if resultado['alertas']:
+                for alerta in resultado['alertas']:
+                    with st.container(border=True):
+                        col1, col2 = st.columns([3, 1])
+                        with col1:
+                            st.markdown(f"**{alerta['tipo_medicion'].replace('_', ' ').title()}:** {alerta['valor']} {alerta['unidad_medida']}")
+                            st.caption(alerta['mensaje'])
+                        with col2:
+                            st.caption(alerta['timestamp'].strftime('%d/%m/%Y %H:%M'))
+            else:
+                st.info("No hay alertas pendientes")
             
             # --- HISTORIAL DE MEDICIONES ---
             st.markdown("---")
             st.markdown("### Historial de Mediciones")
-            try:
-                with conn.session as s:
-                    historial_query = text("""
-                        SELECT 
-                            m.tipo_medicion,
-                            m.valor,
-                            m.unidad_medida,
-                            m.timestamp
-                        FROM public.mediciones m
-                        JOIN public.dispositivos d ON m.dispositivo_id = d.id
-                        WHERE d.paciente_id = :pid
-                        ORDER BY m.timestamp DESC
-                        LIMIT 100
-                    """)
-                    historial = s.execute(historial_query, {'pid': paciente_id}).fetchall()
+            if resultado['historial']:
+                historial_df = pd.DataFrame(resultado['historial']).rename(columns={
+                    'tipo_medicion': 'Tipo de Medición',
+                    'valor': 'Valor',
+                    'unidad_medida': 'Unidad',
+                    'timestamp': 'Fecha/Hora',
+                })
                 
-                if historial:
-                    historial_df = pd.DataFrame(
-                        historial,
-                        columns=['Tipo de Medición', 'Valor', 'Unidad', 'Fecha/Hora']
-                    )
+                for tipo_med in historial_df['Tipo de Medición'].unique():
+                    st.markdown(f"#### {tipo_med.replace('_', ' ').title()}")
+                    tipo_df = historial_df[historial_df['Tipo de Medición'] == tipo_med]
                     
-                    for tipo_med in historial_df['Tipo de Medición'].unique():
-                        st.markdown(f"#### {tipo_med.replace('_', ' ').title()}")
-                        tipo_df = historial_df[historial_df['Tipo de Medición'] == tipo_med]
-                        
-                        col1, col2 = st.columns([2, 1])
-                        with col1:
-                            st.dataframe(
-                                tipo_df[['Valor', 'Unidad', 'Fecha/Hora']],
-                                use_container_width=True,
-                                hide_index=True
-                            )
-                        with col2:
-                            valores = pd.to_numeric(tipo_df['Valor'], errors='coerce')
-                            if not valores.empty:
-                                st.metric("Promedio", f"{valores.mean():.2f}")
-                                st.metric("Máximo", f"{valores.max():.2f}")
-                                st.metric("Mínimo", f"{valores.min():.2f}")
-                else:
-                    st.info("Sin historial de mediciones")
-            except Exception as e:
-                st.warning(f"No se pudo cargar historial: {e}")
+                    col1, col2 = st.columns([2, 1])
+                    with col1:
+                        st.dataframe(
+                            tipo_df[['Valor', 'Unidad', 'Fecha/Hora']],
+                            use_container_width=True,
+                            hide_index=True
+                        )
+                    with col2:
+                        valores = pd.to_numeric(tipo_df['Valor'], errors='coerce')
+                        if not valores.empty:
+                            st.metric("Promedio", f"{valores.mean():.2f}")
+                            st.metric("Máximo", f"{valores.max():.2f}")
+                            st.metric("Mínimo", f"{valores.min():.2f}")
+            else:
+                st.info("Sin historial de mediciones")
             
             # --- BOTÓN VER EN VIVO ---
             st.markdown("---")
             col1, col2, col3 = st.columns([1, 1, 2])
             with col1:
                 if st.button("Ver en Vivo", use_container_width=True, type="primary"):
-                    try:
-                        with conn.session as s:
-                            dispositivo_query = text("""
-                                SELECT id FROM public.dispositivos
-                                WHERE paciente_id = :pid AND activo = true
-                                LIMIT 1
-                            """)
-                            dispositivo_result = s.execute(dispositivo_query, {'pid': paciente_id}).fetchone()
-                        
-                        if dispositivo_result:
-                            st.session_state['selected_dispositivo_id'] = dispositivo_result[0]
-                            st.session_state['selected_paciente_id'] = paciente_id
-                            st.session_state['ir_a_visualizacion'] = True
-                            st.switch_page("pages/05_monitoreo_dashboard.py")
-                        else:
-                            st.warning("Este paciente no tiene un dispositivo activo asignado.")
-                    except Exception as e:
-                        st.error(f"Error al navegar: {e}")
+                    # El dispositivo del detalle es el activo más reciente, si existe alguno
+                    if dispositivo and dispositivo['activo']:
+                        st.session_state['selected_dispositivo_id'] = dispositivo['id']
+                        st.session_state['selected_paciente_id'] = paciente_id
+                        st.session_state['ir_a_visualizacion'] = True
+                        st.switch_page("pages/05_monitoreo_dashboard.py")
+                    else:
+                        st.warning("Este paciente no tiene un dispositivo activo asignado.")
         else:
             st.error("Paciente no encontrado")
             if st.button("Regresar"):
@@ -262,9 +189,9 @@ tab_listado, tab_registro, tab_editar = st.tabs(["Ver Pacientes", "Registrar Nue
 with tab_listado:
     
     try:
-        pacientes_df = conn.query(
+        pacientes_df = consultar_cacheado(
             'SELECT id, nombre, apellido_paterno, apellido_materno, diagnostico, nss FROM public.pacientes ORDER BY nombre;',
-            ttl="10s"
+            etiquetas=("pacientes",)
         )
     except Exception as e:
         st.error(f"Error al cargar pacientes: {e}")
@@ -399,9 +326,9 @@ with tab_editar:
     
     # Obtener lista de pacientes activos
     try:
-        pacientes_activos = conn.query(
+        pacientes_activos = consultar_cacheado(
             'SELECT id, nombre, apellido_paterno, apellido_materno FROM public.pacientes WHERE activo = true ORDER BY nombre;',
-            ttl="10s"
+            etiquetas=("pacientes",)
         )
     except Exception as e:
         st.error(f"Error al cargar pacientes: {e}")
@@ -5,7 +5,8 @@ from sqlalchemy import text
 from core.auth import require_auth, hash_password
 from core.sidebar import render_sidebar
 from core.theme import apply_global_theme
-from utils import breadcrumb_nav
+from core.db import obtener_conexion, consultar_cacheado
+from utils import breadcrumb_nav, invalidar_mapa_acceso, obtener_detalle_medico
 
 # --- PROTECCIÓN DE RUTA ---
 require_auth(allowed_roles=['administrador'])
@@ -20,7 +21,7 @@ breadcrumb_nav(["Home", "Administración", "Personal Médico"])
 
 # --- CONEXIÓN A LA BASE DE DATOS ---
 try:
-    conn = st.connection("postgresql", type="sql")
+    conn = obtener_conexion()
 except Exception:
     st.error("No se pudo establecer conexión con la base de datos.")
     st.stop()
@@ -40,21 +41,15 @@ if st.session_state.get('ver_detalle_medico_id'):
 
     st.markdown("---")
 
+    # Una sola consulta para todas las secciones del detalle
     try:
-        with conn.session as s:
-            query = text("""
-                SELECT id, nombre, apellido_paterno, apellido_materno, especialidad,
-                       cedula_profesional, cedula_especialidad, universidad, email
-                FROM public.personal_medico
-                WHERE id = :mid
-            """)
-            resultado = s.execute(query, {'mid': medico_id}).fetchone()
+        resultado = obtener_detalle_medico(medico_id)
 
         if resultado:
-            nombre_completo = f"Dr(a). {resultado[1]} {resultado[2]} {resultado[3] or ''}".strip()
+            nombre_completo = f"Dr(a). {resultado['nombre']} {resultado['apellido_paterno']} {resultado['apellido_materno'] or ''}".strip()
 
             st.markdown(f"## {nombre_completo}")
-            st.caption(f"Especialidad: {resultado[4]}  |  Cédula: {resultado[5]}")
+            st.caption(f"Especialidad: {resultado['especialidad']}  |  Cédula: {resultado['cedula_profesional']}")
 
             st.markdown("---")
 
@@ -63,112 +58,69 @@ if st.session_state.get('ver_detalle_medico_id'):
             col1, col2, col3 = st.columns(3)
             with col1:
                 st.markdown("**Especialidad**")
-                st.write(resultado[4])
+                st.write(resultado['especialidad'])
                 st.markdown("**Universidad**")
-                st.write(resultado[7] or "No registrada")
+                st.write(resultado['universidad'] or "No registrada")
             with col2:
                 st.markdown("**Cédula Profesional**")
-                st.write(resultado[5])
+                st.write(resultado['cedula_profesional'])
                 st.markdown("**Cédula de Especialidad**")
-                st.write(resultado[6] or "No registrada")
+                st.write(resultado['cedula_especialidad'] or "No registrada")
             with col3:
                 st.markdown("**Correo Electrónico**")
-                st.write(resultado[8])
+                st.write(resultado['email'])
 
             # --- CREDENCIALES DE ACCESO ---
             st.markdown("---")
             st.markdown("### Credenciales de Acceso")
-            try:
-                with conn.session as s:
-                    usuario_query = text("""
-                        SELECT u.id, u.username, u.activo
-                        FROM public.usuarios u
-                        WHERE u.id = (SELECT usuario_id FROM public.personal_medico WHERE id = :mid)
-                    """)
-                    usuario = s.execute(usuario_query, {'mid': medico_id}).fetchone()
-
-                if usuario:
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.markdown("**Nombre de usuario**")
-                        st.write(f"`{usuario[1]}`")
-                    with col2:
-                        st.markdown("**Estado de la cuenta**")
-                        if usuario[2]:
-                            st.success("Cuenta activa")
-                        else:
-                            st.warning("Cuenta inactiva")
-                else:
-                    st.info("Este médico no tiene credenciales de acceso configuradas")
-            except Exception as e:
-                st.warning(f"No se pudieron cargar credenciales: {e}")
+            usuario = resultado['usuario']
+            if usuario:
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.markdown("**Nombre de usuario**")
+                    st.write(f"`{usuario['username']}`")
+                with col2:
+                    st.markdown("**Estado de la cuenta**")
+                    if usuario['activo']:
+                        st.success("Cuenta activa")
+                    else:
+                        st.warning("Cuenta inactiva")
+            else:
+                st.info("Este médico no tiene credenciales de acceso configuradas")
 
             # --- PACIENTES ASIGNADOS ---
             st.markdown("---")
             st.markdown("### Pacientes Asignados")
-            try:
-                with conn.session as s:
-                    pacientes_query = text("""
-                        SELECT p.id, p.nombre, p.apellido_paterno, p.apellido_materno,
-                               p.diagnostico, p.nss
-                        FROM public.pacientes p
-                        JOIN public.pacientes_medicos pm ON p.id = pm.paciente_id
-                        WHERE pm.medico_id = :mid
-                        ORDER BY p.nombre
-                    """)
-                    pacientes_asignados = s.execute(pacientes_query, {'mid': medico_id}).fetchall()
-
-                if pacientes_asignados:
-                    for pac in pacientes_asignados:
-                        pac_nombre = f"{pac[1]} {pac[2]} {pac[3] or ''}".strip()
-                        with st.container(border=True):
-                            col1, col2, col3 = st.columns([3, 3, 2])
-                            with col1:
-                                st.markdown(f"**{pac_nombre}**")
-                            with col2:
-                                st.caption(pac[4] or "Sin diagnóstico")
-                            with col3:
-                                st.caption(f"NSS: {pac[5] or 'N/A'}")
-                else:
-                    st.info("No tiene pacientes asignados")
-            except Exception as e:
-                st.warning(f"No se pudieron cargar pacientes: {e}")
+            if resultado['pacientes']:
+                for pac in resultado['pacientes']:
+                    pac_nombre = f"{pac['nombre']} {pac['apellido_paterno']} {pac['apellido_materno'] or ''}".strip()
+                    with st.container(border=True):
+                        col1, col2, col3 = st.columns([3, 3, 2])
+                        with col1:
+                            st.markdown(f"**{pac_nombre}**")
+                        with col2:
+                            st.caption(pac['diagnostico'] or "Sin diagnóstico")
+                        with col3:
+                            st.caption(f"NSS: {pac['nss'] or 'N/A'}")
+            else:
+                st.info("No tiene pacientes asignados")
 
             # --- ALERTAS DE SUS PACIENTES ---
             st.markdown("---")
             st.markdown("### Alertas Pendientes de sus Pacientes")
-            try:
-                with conn.session as s:
-                    alertas_query = text("""
-                        SELECT a.tipo_alerta, a.mensaje, a.timestamp,
-                               p.nombre, p.apellido_paterno,
-                               m.tipo_medicion, m.valor, m.unidad_medida
-                        FROM public.alertas a
-                        JOIN public.mediciones m ON a.medicion_id = m.id
-                        JOIN public.dispositivos d ON m.dispositivo_id = d.id
-                        JOIN public.pacientes p ON d.paciente_id = p.id
-                        JOIN public.pacientes_medicos pm ON p.id = pm.paciente_id
-                        WHERE pm.medico_id = :mid AND a.leida = false
-                        ORDER BY a.timestamp DESC
-                        LIMIT 10
-                    """)
-                    alertas = s.execute(alertas_query, {'mid': medico_id}).fetchall()
-
-                if alertas:
-                    for alerta in alertas:
-                        with st.container(border=True):
-                            col1, col2, col3 = st.columns([2, 3, 1])
-                            with col1:
-                                st.markdown(f"**{alerta[3]} {alerta[4]}**")
-                            with col2:
-                                st.caption(f"{alerta[5].replace('_', ' ').title()}: {alerta[6]} {alerta[7]}")
-                                st.caption(alerta[1])
-                            with col3:
-                                st.caption(alerta[2].strftime('%d/%m/%Y %H:%M'))
-                else:
-                    st.info("No hay alertas pendientes")
-            except Exception as e:
-                st.warning(f"No se pudieron cargar alertas: {e}")
+            if resultado['alertas']:
+                for alerta in resultado['alertas']:
+                    with st.container(border=True):
+                        col1, col2, col3 = st.columns([2, 3, 1])
+                        with col1:
+                            st.markdown(f"**{alerta['nombre']} {alerta['apellido_paterno']}**")
+                        with col2:
+                            st.caption(f"{alerta['tipo_medicion'].replace('_', ' ').title()}: {alerta['valor']} {alerta['unidad_medida']}")
+                            st.caption(alerta['mensaje'])
+                        with col3:
+                            st.caption(alerta['timestamp'].strftime('%d/%m/%Y %H:%M'))
+            else:
+                st.info("No hay alertas pendientes")
 
         else:
             st.error("Médico no encontrado")
@@ -192,9 +144,9 @@ tab_listado, tab_registro, tab_editar = st.tabs(["Ver Médicos", "Registrar Nuev
 with tab_listado:
 
     try:
-        medicos_df = conn.query(
+        medicos_df = consultar_cacheado(
             'SELECT id, nombre, apellido_paterno, apellido_materno, especialidad, cedula_profesional, email FROM public.personal_medico ORDER BY nombre;',
-            ttl="10s"
+            etiquetas=("personal_medico",)
         )
     except Exception as e:
         st.error(f"Error al cargar médicos: {e}")
@@ -333,6 +285,7 @@ with tab_registro:
                         s.execute(link_sql, {"user_id": usuario_id, "medico_id": medico_id})
 
                         s.commit()
+                    invalidar_mapa_acceso()
 
                     st.success("Médico registrado exitosamente")
                     st.markdown(f"""
@@ -350,9 +303,9 @@ with tab_editar:
     st.subheader("Editar o Eliminar Médico")
 
     try:
-        medicos_activos = conn.query(
+        medicos_activos = consultar_cacheado(
             'SELECT id, nombre, apellido_paterno, apellido_materno FROM public.personal_medico WHERE activo = true ORDER BY nombre;',
-            ttl="10s"
+            etiquetas=("personal_medico",)
         )
     except Exception as e:
         st.error(f"Error al cargar médicos: {e}")
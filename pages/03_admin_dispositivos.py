@@ -6,7 +6,8 @@ from sqlalchemy import text
 from core.auth import require_auth
 from core.sidebar import render_sidebar
 from core.theme import apply_global_theme
-from utils import breadcrumb_nav
+from core.db import obtener_conexion, consultar_cacheado
+from utils import breadcrumb_nav, invalidar_roster, obtener_detalle_dispositivo
 
 # --- PROTECCIÓN DE RUTA ---
 require_auth(allowed_roles=['administrador'])
@@ -20,7 +21,7 @@ breadcrumb_nav(["Home", "Administración", "Dispositivos"])
 
 # --- CONEXIÓN A LA BASE DE DATOS ---
 try:
-    conn = st.connection("postgresql", type="sql")
+    conn = obtener_conexion()
 except Exception:
     st.error("No se pudo establecer conexión con la base de datos.")
     st.stop()
@@ -40,21 +41,13 @@ if st.session_state.get('ver_detalle_dispositivo_id'):
 
     st.markdown("---")
 
+    # Una sola consulta para todas las secciones del detalle
     try:
-        with conn.session as s:
-            query = text("""
-                SELECT d.id, d.modelo, d.mac_address, d.activo, d.fecha_asignacion,
-                       p.id as paciente_id, p.nombre, p.apellido_paterno, p.apellido_materno,
-                       p.diagnostico, p.email, p.telefono
-                FROM public.dispositivos d
-                LEFT JOIN public.pacientes p ON d.paciente_id = p.id
-                WHERE d.id = :did
-            """)
-            resultado = s.execute(query, {'did': device_id}).fetchone()
+        resultado = obtener_detalle_dispositivo(device_id)
 
         if resultado:
-            st.markdown(f"## {resultado[1]}")
-            st.caption(f"ID: {resultado[0]}  |  MAC: {resultado[2] or 'No especificada'}")
+            st.markdown(f"## {resultado['modelo']}")
+            st.caption(f"ID: {resultado['id']}  |  MAC: {resultado['mac_address'] or 'No especificada'}")
 
             st.markdown("---")
 
@@ -63,21 +56,21 @@ if st.session_state.get('ver_detalle_dispositivo_id'):
             col1, col2, col3 = st.columns(3)
             with col1:
                 st.markdown("**Modelo**")
-                st.write(resultado[1])
+                st.write(resultado['modelo'])
             with col2:
                 st.markdown("**Dirección MAC**")
-                st.write(resultado[2] or "No especificada")
+                st.write(resultado['mac_address'] or "No especificada")
             with col3:
                 st.markdown("**Estado**")
-                st.write("Activo" if resultado[3] else "Inactivo")
+                st.write("Activo" if resultado['activo'] else "Inactivo")
 
             st.markdown("---")
 
             # --- FECHA DE ASIGNACIÓN ---
             st.markdown("### Registro")
             st.markdown("**Fecha de asignación**")
-            if resultado[4]:
-                st.write(pd.to_datetime(resultado[4]).strftime('%d/%m/%Y %H:%M'))
+            if resultado['fecha_asignacion']:
+                st.write(pd.to_datetime(resultado['fecha_asignacion']).strftime('%d/%m/%Y %H:%M'))
             else:
                 st.write("No registrada")
 
@@ -85,46 +78,36 @@ if st.session_state.get('ver_detalle_dispositivo_id'):
 
             # --- PACIENTE ASIGNADO ---
             st.markdown("### Paciente Asignado")
-            if resultado[5]:
-                paciente_nombre = f"{resultado[6]} {resultado[7]} {resultado[8] or ''}".strip()
+            paciente = resultado['paciente']
+            if paciente:
+                paciente_nombre = f"{paciente['nombre']} {paciente['apellido_paterno']} {paciente['apellido_materno'] or ''}".strip()
                 col1, col2 = st.columns(2)
                 with col1:
                     st.markdown("**Nombre**")
                     st.write(paciente_nombre)
                     st.markdown("**Diagnóstico**")
-                    st.write(resultado[9] or "Sin diagnóstico")
+                    st.write(paciente['diagnostico'] or "Sin diagnóstico")
                 with col2:
                     st.markdown("**Correo**")
-                    st.write(resultado[10] or "No registrado")
+                    st.write(paciente['email'] or "No registrado")
                     st.markdown("**Teléfono**")
-                    st.write(resultado[11] or "No registrado")
+                    st.write(paciente['telefono'] or "No registrado")
             else:
                 st.info("Este dispositivo no está asignado a ningún paciente")
 
             # --- ÚLTIMAS MEDICIONES ---
             st.markdown("---")
             st.markdown("### Últimas Mediciones")
-            try:
-                with conn.session as s:
-                    med_query = text("""
-                        SELECT tipo_medicion, valor, unidad_medida, timestamp
-                        FROM public.mediciones
-                        WHERE dispositivo_id = :did
-                        ORDER BY timestamp DESC
-                        LIMIT 20
-                    """)
-                    mediciones = s.execute(med_query, {'did': device_id}).fetchall()
-
-                if mediciones:
-                    med_df = pd.DataFrame(
-                        mediciones,
-                        columns=['Tipo', 'Valor', 'Unidad', 'Fecha/Hora']
-                    )
-                    st.dataframe(med_df, use_container_width=True, hide_index=True)
-                else:
-                    st.info("Sin mediciones registradas para este dispositivo")
-            except Exception as e:
-                st.warning(f"No se pudieron cargar mediciones: {e}")
+            if resultado['mediciones']:
+                med_df = pd.DataFrame(resultado['mediciones']).rename(columns={
+                    'tipo_medicion': 'Tipo',
+                    'valor': 'Valor',
+                    'unidad_medida': 'Unidad',
+                    'timestamp': 'Fecha/Hora',
+                })
+                st.dataframe(med_df, use_container_width=True, hide_index=True)
+            else:
+                st.info("Sin mediciones registradas para este dispositivo")
 
         else:
             st.error("Dispositivo no encontrado")
@@ -148,7 +131,7 @@ tab_listado, tab_registro, tab_editar = st.tabs(["Ver Dispositivos", "Registrar
 with tab_listado:
 
     try:
-        dispositivos_df = conn.query("""
+        dispositivos_df = consultar_cacheado("""
             SELECT 
                 d.id,
                 d.modelo,
@@ -162,7 +145,7 @@ with tab_listado:
             FROM public.dispositivos d
             LEFT JOIN public.pacientes p ON d.paciente_id = p.id
             ORDER BY d.modelo
-        """, ttl="10s")
+        """, etiquetas=("dispositivos", "pacientes"))
     except Exception as e:
         st.error(f"Error al cargar dispositivos: {e}")
         dispositivos_df = pd.DataFrame()
@@ -247,11 +230,11 @@ with tab_registro:
     st.subheader("Registrar Nuevo Dispositivo")
 
     try:
-        pacientes_df = conn.query("""
+        pacientes_df = consultar_cacheado("""
             SELECT id, nombre, apellido_paterno, apellido_materno 
             FROM public.pacientes 
             ORDER BY nombre
-        """, ttl="10s")
+        """, etiquetas=("pacientes",))
 
         pacientes_opciones = {
             f"{p['nombre']} {p['apellido_paterno']} {p.get('apellido_materno', '') or ''}".strip(): p['id']
@@ -307,6 +290,7 @@ with tab_registro:
                         })
                         device_id = result.fetchone()[0]
                         s.commit()
+                    invalidar_roster()
 
                     st.success(f"Dispositivo registrado exitosamente (ID: {device_id})")
                     st.markdown(f"""
@@ -325,7 +309,7 @@ with tab_editar:
     st.subheader("Editar o Eliminar Dispositivo")
 
     try:
-        dispositivos_activos = conn.query("""
+        dispositivos_activos = consultar_cacheado("""
             SELECT 
                 d.id,
                 d.modelo,
@@ -336,7 +320,7 @@ with tab_editar:
             LEFT JOIN public.pacientes p ON d.paciente_id = p.id
             WHERE d.activo = true
             ORDER BY d.modelo;
-        """, ttl="10s")
+        """, etiquetas=("dispositivos", "pacientes"))
     except Exception as e:
         st.error(f"Error al cargar dispositivos: {e}")
         dispositivos_activos = pd.DataFrame()
@@ -388,9 +372,9 @@ with tab_editar:
                     if st.session_state.get('mostrar_form_editar_dispositivo', False):
                         st.markdown("### Editar Información del Dispositivo")
 
-                        pacientes = conn.query(
+                        pacientes = consultar_cacheado(
                             'SELECT id, nombre, apellido_paterno FROM public.pacientes WHERE activo = true ORDER BY nombre;',
-                            ttl="10s"
+                            etiquetas=("pacientes",)
                         )
 
                         with st.form("editar_dispositivo_form"):
@@ -437,6 +421,7 @@ with tab_editar:
                                             'did': dispositivo_seleccionado
                                         })
                                         s.commit()
+                                    invalidar_roster()
 
                                     st.success("Cambios guardados exitosamente")
                                     st.session_state['mostrar_form_editar_dispositivo'] = False
@@ -466,6 +451,7 @@ with tab_editar:
                                         """)
                                         s.execute(query, {'did': dispositivo_seleccionado})
                                         s.commit()
+                                    invalidar_roster()
 
                                     st.success("Dispositivo desactivado exitosamente")
                                     st.session_state['confirmar_eliminar_dispositivo'] = False
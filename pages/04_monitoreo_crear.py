@@ -5,7 +5,8 @@ from sqlalchemy import text
 from core.auth import require_auth
 from core.sidebar import render_sidebar
 from core.theme import apply_global_theme
-from utils import breadcrumb_nav
+from core.db import obtener_conexion, consultar_cacheado
+from utils import breadcrumb_nav, obtener_roster_activo, invalidar_roster
 
 # --- PROTECCIÓN DE RUTA ---
 require_auth(allowed_roles=['administrador'])
@@ -19,7 +20,7 @@ breadcrumb_nav(["Home", "Administración", "Monitoreos"])
 
 # --- CONEXIÓN A LA BASE DE DATOS ---
 try:
-    conn = st.connection("postgresql", type="sql")
+    conn = obtener_conexion()
 except Exception:
     st.error("No se pudo establecer conexión con la base de datos.")
     st.stop()
@@ -102,11 +103,11 @@ with tab_crear:
     
     # Obtener pacientes
     try:
-        pacientes_df = conn.query("""
+        pacientes_df = consultar_cacheado("""
             SELECT id, nombre, apellido_paterno, apellido_materno, diagnostico
             FROM public.pacientes
             ORDER BY nombre
-        """, ttl="10s")
+        """, etiquetas=("pacientes",))
     except Exception as e:
         st.error(f"Error al cargar pacientes: {e}")
         pacientes_df = pd.DataFrame()
@@ -139,12 +140,12 @@ with tab_crear:
                 
                 # Obtener dispositivos del paciente
                 try:
-                    dispositivos_df = conn.query(f"""
+                    dispositivos_df = consultar_cacheado("""
                         SELECT id, modelo, mac_address, activo
                         FROM public.dispositivos
-                        WHERE paciente_id = {paciente_id}
+                        WHERE paciente_id = :paciente_id
                         ORDER BY modelo
-                    """, ttl="5s")
+                    """, etiquetas=("dispositivos",), params={"paciente_id": int(paciente_id)})
                 except Exception:
                     dispositivos_df = pd.DataFrame()
                 
@@ -236,6 +237,7 @@ with tab_crear:
                                     })
                                     monitoreo_id = result.fetchone()[0]
                                     s.commit()
+                                invalidar_roster()
                                 
                                 st.success(f"✅ ¡Monitoreo creado exitosamente! (ID: {monitoreo_id})")
                                 st.markdown(f"""
@@ -265,6 +267,7 @@ with tab_crear:
                                 })
                                 monitoreo_id = result.fetchone()[0]
                                 s.commit()
+                            invalidar_roster()
                             
                             st.success(f"✅ ¡Monitoreo indefinido creado exitosamente! (ID: {monitoreo_id})")
                             st.markdown(f"""
@@ -281,31 +284,8 @@ with tab_crear:
 with tab_activos:
     st.subheader("🟢 Monitoreos Activos")
     
-    try:
-        monitoreos_activos = conn.query("""
-            SELECT 
-                m.id,
-                m.fecha_inicio,
-                m.fecha_fin,
-                m.motivo,
-                p.id as paciente_id,
-                p.nombre,
-                p.apellido_paterno,
-                p.apellido_materno,
-                p.diagnostico,
-                d.id as dispositivo_id,
-                d.modelo,
-                d.mac_address,
-                d.activo as dispositivo_activo
-            FROM public.monitoreos m
-            JOIN public.pacientes p ON m.paciente_id = p.id
-            LEFT JOIN public.dispositivos d ON p.id = d.paciente_id
-            WHERE m.activo = true
-            ORDER BY m.fecha_inicio DESC
-        """, ttl="5s")
-    except Exception as e:
-        st.error(f"Error al cargar monitoreos activos: {e}")
-        monitoreos_activos = pd.DataFrame()
+    # Roster compartido: una fila por monitoreo, ya sin duplicados por dispositivo
+    monitoreos_activos = obtener_roster_activo()
     
     if monitoreos_activos.empty:
         st.info("No hay monitoreos activos en el sistema.")
@@ -313,7 +293,7 @@ with tab_activos:
         # Estadísticas
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Monitoreos Activos", len(monitoreos_activos['id'].unique()))
+            st.metric("Monitoreos Activos", len(monitoreos_activos))
         with col2:
             dispositivos_activos = monitoreos_activos[monitoreos_activos['dispositivo_activo'] == True]['dispositivo_id'].nunique()
             st.metric("Dispositivos Activos", dispositivos_activos)
@@ -324,7 +304,7 @@ with tab_activos:
         st.write("")
         
         # Mostrar monitoreos
-        for _, mon in monitoreos_activos.groupby('id').first().reset_index().iterrows():
+        for _, mon in monitoreos_activos.sort_values('fecha_inicio', ascending=False).iterrows():
             paciente_nombre = f"{mon['nombre']} {mon['apellido_paterno']} {mon.get('apellido_materno', '')}".strip()
             
             with st.container(border=True):
@@ -335,8 +315,7 @@ with tab_activos:
                     st.caption(f"📋 {mon['diagnostico'] if mon.get('diagnostico') else 'Sin diagnóstico'}")
                 
                 with col2:
-                    dispositivo_sel = monitoreos_activos[monitoreos_activos['id'] == mon['id']].iloc[0]
-                    st.caption(f"⌚ {dispositivo_sel['modelo']}")
+                    st.caption(f"⌚ {mon['modelo'] if pd.notna(mon['modelo']) else 'Sin dispositivo'}")
                     if pd.isna(mon['fecha_fin']):
                         st.caption(f"⏱️ Indefinido (desde {pd.to_datetime(mon['fecha_inicio']).strftime('%d/%m/%Y')})")
                     else:
@@ -362,6 +341,7 @@ with tab_activos:
                                 "fecha_fin": datetime.now()
                             })
                             s.commit()
+                        invalidar_roster()
                         
                         st.success(f"✅ Monitoreo detenido para {paciente_nombre}")
                         st.rerun()
@@ -373,7 +353,7 @@ with tab_historico:
     st.subheader("📜 Histórico de Monitoreos")
     
     try:
-        monitoreos_historico = conn.query("""
+        monitoreos_historico = consultar_cacheado("""
             SELECT 
                 m.id,
                 m.fecha_inicio,
@@ -388,7 +368,7 @@ with tab_historico:
             JOIN public.pacientes p ON m.paciente_id = p.id
             LEFT JOIN public.dispositivos d ON p.id = d.paciente_id
             ORDER BY m.fecha_inicio DESC
-        """, ttl="5s")
+        """, etiquetas=("monitoreos", "pacientes", "dispositivos"))
     except Exception as e:
         st.error(f"Error al cargar histórico: {e}")
         monitoreos_historico = pd.DataFrame()
@@ -4,12 +4,14 @@ import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
-import time
 from sqlalchemy import text
 from core.auth import require_auth
 from core.sidebar import render_sidebar
 from core.theme import apply_global_theme
-from utils import breadcrumb_nav
+from core.db import obtener_conexion
+from utils import (breadcrumb_nav, crear_traza, usar_webgl, obtener_figura, actualizar_trazas,
+                   mostrar_flujo_vitales, obtener_roster_activo, pestana_visible,
+                   calcular_intervalo, contar_alertas_recientes, mostrar_diagnostico_refresco)
 
 # --- PROTECCIÓN DE RUTA ---
 require_auth(allowed_roles=['administrador', 'medico'])
@@ -21,7 +23,7 @@ breadcrumb_nav(["Home", "Análisis", "Visualización"])
 
 # --- CONEXIÓN ---
 try:
-    conn = st.connection("postgresql", type="sql")
+    conn = obtener_conexion()
 except Exception:
     st.error("No se pudo establecer conexión con la base de datos.")
     st.stop()
@@ -63,27 +65,20 @@ def gen_value(tipo, prev=None):
     return max(lo, min(hi, new_val))
 
 # --- OBTENER PACIENTES CON MONITOREO ACTIVO ---
-try:
-    pacientes_mon = conn.query("""
-        SELECT DISTINCT p.id, p.nombre, p.apellido_paterno, p.apellido_materno,
-               p.diagnostico, d.modelo, d.mac_address, m.motivo,
-               m.fecha_inicio
-        FROM public.monitoreos m
-        JOIN public.pacientes p ON m.paciente_id = p.id
-        LEFT JOIN public.dispositivos d ON p.id = d.paciente_id AND d.activo = true
-        WHERE m.activo = true
-        ORDER BY p.nombre
-    """, ttl="10s")
-except Exception as e:
-    st.error(f"Error al cargar monitoreos: {e}")
-    pacientes_mon = pd.DataFrame()
+# Roster compartido entre sesiones; un paciente aparece una vez aunque tenga varios monitoreos
+pacientes_mon = (
+    obtener_roster_activo()
+    .drop_duplicates('paciente_id')
+    .rename(columns={'id': 'monitoreo_id', 'paciente_id': 'id'})
+    .reset_index(drop=True)
+)
 
 if pacientes_mon.empty:
     st.info("No hay monitoreos activos en este momento.")
     st.stop()
 
 # --- CONTROLES ---
-col1, col2, col3 = st.columns([3, 1, 1])
+col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
 
 with col1:
     opciones_pac = {
@@ -93,13 +88,22 @@ with col1:
     pac_sel_name = st.selectbox("Paciente", options=list(opciones_pac.keys()))
     pac_row = pacientes_mon.iloc[opciones_pac[pac_sel_name]]
 
+with col4:
+    auto_refresh = st.toggle("Auto-refresh", value=True)
+    streaming = st.toggle("Streaming", value=False,
+                          help="Actualiza solo la gráfica enviando los puntos nuevos al navegador.")
+
 with col2:
-    intervalo = st.selectbox("Actualizar cada", options=[5, 10, 20],
-                             format_func=lambda x: f"{x} segundos")
+    if streaming:
+        intervalo = st.selectbox("Actualizar cada", options=[0.5, 1, 2],
+                                 format_func=lambda x: f"{x} segundos")
+    else:
+        intervalo = st.selectbox("Actualizar cada", options=[5, 10, 20],
+                                 format_func=lambda x: f"{x} segundos")
 
 with col3:
-    st.write("")
-    auto_refresh = st.toggle("Auto-refresh", value=True)
+    max_historial = st.selectbox("Historial", options=[120, 1000, 5000],
+                                 format_func=lambda x: f"{x} puntos")
 
 # --- INFO DEL PACIENTE ---
 st.markdown("---")
@@ -123,6 +127,7 @@ st.markdown("---")
 # --- INICIALIZAR HISTORIAL SIMULADO ---
 HISTORY_KEY = f"live_history_{pac_row['id']}"
 TICK_KEY = "live_tick_count"
+ESTABLE_KEY = f"live_ciclos_estables_{pac_row['id']}"
 
 if HISTORY_KEY not in st.session_state:
     # Generate initial 60 data points (last ~5 min of simulated data)
@@ -131,7 +136,7 @@ if HISTORY_KEY not in st.session_state:
     prev = {}
     for i in range(60):
         ts = now - timedelta(seconds=(60 - i) * 5)
-        point = {'timestamp': ts}
+        point = {'seq': i + 1, 'timestamp': ts}
         for tipo in RANGOS:
             val = gen_value(tipo, prev.get(tipo))
             point[tipo] = round(val, 2)
@@ -143,20 +148,31 @@ if TICK_KEY not in st.session_state:
     st.session_state[TICK_KEY] = 0
 
 # --- GENERAR NUEVO PUNTO ---
-st.session_state[TICK_KEY] += 1
-history = st.session_state[HISTORY_KEY]
-last = history[-1]
-new_point = {'timestamp': datetime.now()}
-for tipo in RANGOS:
-    new_point[tipo] = round(gen_value(tipo, last[tipo]), 2)
-history.append(new_point)
-
-# Keep last 120 points
-if len(history) > 120:
-    history = history[-120:]
-st.session_state[HISTORY_KEY] = history
-
-df = pd.DataFrame(history)
+def agregar_punto():
+    """Agrega un punto simulado al historial de la sesión y recorta a max_historial."""
+    st.session_state[TICK_KEY] += 1
+    history = st.session_state[HISTORY_KEY]
+    last = history[-1]
+    new_point = {'seq': last['seq'] + 1, 'timestamp': datetime.now()}
+    for tipo in RANGOS:
+        new_point[tipo] = round(gen_value(tipo, last[tipo]), 2)
+    history.append(new_point)
+
+    # Keep last max_historial points
+    if len(history) > max_historial:
+        del history[:-max_historial]
+
+    # Ciclos consecutivos con todos los signos en rango normal (usado por el refresco adaptativo)
+    if all(clasificar(new_point[tipo], tipo)[0] == 'Normal' for tipo in RANGOS):
+        st.session_state[ESTABLE_KEY] = st.session_state.get(ESTABLE_KEY, 0) + 1
+    else:
+        st.session_state[ESTABLE_KEY] = 0
+
+# En modo streaming los puntos nuevos se generan dentro del fragmento de la gráfica
+if not streaming:
+    agregar_punto()
+
+df = pd.DataFrame(st.session_state[HISTORY_KEY])
 
 # --- CURRENT VALUES HEADER ---
 current = df.iloc[-1]
@@ -188,87 +204,113 @@ for idx, (tipo, info) in enumerate(RANGOS.items()):
 st.write("")
 
 # --- GRÁFICAS EN TIEMPO REAL ---
-tab_fc, tab_pa, tab_o2, tab_temp, tab_all = st.tabs([
-    "Frecuencia Cardíaca", "Presión Arterial", "SpO2", "Temperatura", "Vista General"
-])
-
-with tab_fc:
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=df['timestamp'], y=df['frecuencia_cardiaca'],
-        mode='lines', name='FC', line=dict(color='#DC2626', width=2),
-        fill='tozeroy', fillcolor='rgba(220,38,38,0.05)'
-    ))
-    fig.add_hrect(y0=60, y1=100, fillcolor="#10B981", opacity=0.06, layer="below", line_width=0)
-    fig.update_layout(title="Frecuencia Cardíaca", yaxis_title="bpm",
-                      height=400, template='simple_white', hovermode='x unified',
-                      margin=dict(t=40, b=30))
-    st.plotly_chart(fig, use_container_width=True)
-
-with tab_pa:
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=df['timestamp'], y=df['presion_sistolica'],
-        mode='lines', name='Sistólica', line=dict(color='#1E40AF', width=2)
-    ))
-    fig.add_trace(go.Scatter(
-        x=df['timestamp'], y=df['presion_diastolica'],
-        mode='lines', name='Diastólica', line=dict(color='#7C3AED', width=2)
-    ))
-    fig.add_hrect(y0=90, y1=140, fillcolor="#10B981", opacity=0.05, layer="below", line_width=0)
-    fig.update_layout(title="Presión Arterial", yaxis_title="mmHg",
-                      height=400, template='simple_white', hovermode='x unified',
-                      margin=dict(t=40, b=30))
-    st.plotly_chart(fig, use_container_width=True)
-
-with tab_o2:
+# Definición de cada vista: series (columna, nombre, color, relleno), banda normal y ejes
+VISTAS = {
+    "Frecuencia Cardíaca": {
+        'titulo': "Frecuencia Cardíaca", 'eje': "bpm", 'banda': (60, 100, 0.06),
+        'series': [('frecuencia_cardiaca', 'FC', '#DC2626', 'rgba(220,38,38,0.05)')],
+    },
+    "Presión Arterial": {
+        'titulo': "Presión Arterial", 'eje': "mmHg", 'banda': (90, 140, 0.05),
+        'series': [('presion_sistolica', 'Sistólica', '#1E40AF', None),
+                   ('presion_diastolica', 'Diastólica', '#7C3AED', None)],
+    },
+    "SpO2": {
+        'titulo': "Saturación de Oxígeno", 'eje': "%", 'banda': (95, 100, 0.06), 'rango_y': [88, 102],
+        'series': [('saturacion_oxigeno', 'SpO2', '#0891B2', 'rgba(8,145,178,0.05)')],
+    },
+    "Temperatura": {
+        'titulo': "Temperatura Corporal", 'eje': "°C", 'banda': (36.1, 37.5, 0.06), 'marcadores': True,
+        'series': [('temperatura', 'Temp', '#D97706', None)],
+    },
+}
+# Vista general: (columna, nombre, color, fila, columna de la cuadrícula)
+VISTA_GENERAL = [
+    ('frecuencia_cardiaca', 'FC', '#DC2626', 1, 1),
+    ('presion_sistolica', 'Sist.', '#1E40AF', 1, 2),
+    ('presion_diastolica', 'Diast.', '#7C3AED', 1, 2),
+    ('saturacion_oxigeno', 'SpO2', '#0891B2', 2, 1),
+    ('temperatura', 'Temp', '#D97706', 2, 2),
+]
+
+
+def construir_vista(nombre, n_puntos):
+    """Crea la estructura vacía de una vista; los datos se asignan en cada refresco."""
+    if nombre == "Vista General":
+        fig = make_subplots(
+            rows=2, cols=2, subplot_titles=(
+                "Frecuencia Cardíaca", "Presión Arterial",
+                "SpO2", "Temperatura"
+            ), vertical_spacing=0.12, horizontal_spacing=0.08
+        )
+        for _, etiqueta, color, fila, columna in VISTA_GENERAL:
+            fig.add_trace(crear_traza(n_puntos, mode='lines', name=etiqueta,
+                                      line=dict(color=color, width=1.5)), row=fila, col=columna)
+        fig.update_layout(height=600, template='simple_white', showlegend=False,
+                          margin=dict(t=40, b=30), uirevision=nombre)
+        return fig
+
+    vista = VISTAS[nombre]
     fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=df['timestamp'], y=df['saturacion_oxigeno'],
-        mode='lines', name='SpO2', line=dict(color='#0891B2', width=2),
-        fill='tozeroy', fillcolor='rgba(8,145,178,0.05)'
-    ))
-    fig.add_hrect(y0=95, y1=100, fillcolor="#10B981", opacity=0.06, layer="below", line_width=0)
-    fig.update_layout(title="Saturación de Oxígeno", yaxis_title="%",
+    for _, etiqueta, color, relleno in vista['series']:
+        extra = dict(fill='tozeroy', fillcolor=relleno) if relleno else {}
+        if vista.get('marcadores'):
+            extra.update(mode='lines+markers', marker=dict(size=3))
+        fig.add_trace(crear_traza(n_puntos, **{'mode': 'lines', 'name': etiqueta,
+                                               'line': dict(color=color, width=2), **extra}))
+    y0, y1, opacidad = vista['banda']
+    fig.add_hrect(y0=y0, y1=y1, fillcolor="#10B981", opacity=opacidad, layer="below", line_width=0)
+    fig.update_layout(title=vista['titulo'], yaxis_title=vista['eje'],
                       height=400, template='simple_white', hovermode='x unified',
-                      yaxis=dict(range=[88, 102]),
-                      margin=dict(t=40, b=30))
-    st.plotly_chart(fig, use_container_width=True)
-
-with tab_temp:
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=df['timestamp'], y=df['temperatura'],
-        mode='lines+markers', name='Temp', line=dict(color='#D97706', width=2),
-        marker=dict(size=3)
-    ))
-    fig.add_hrect(y0=36.1, y1=37.5, fillcolor="#10B981", opacity=0.06, layer="below", line_width=0)
-    fig.update_layout(title="Temperatura Corporal", yaxis_title="°C",
-                      height=400, template='simple_white', hovermode='x unified',
-                      margin=dict(t=40, b=30))
-    st.plotly_chart(fig, use_container_width=True)
-
-with tab_all:
-    fig = make_subplots(
-        rows=2, cols=2, subplot_titles=(
-            "Frecuencia Cardíaca", "Presión Arterial",
-            "SpO2", "Temperatura"
-        ), vertical_spacing=0.12, horizontal_spacing=0.08
-    )
-    fig.add_trace(go.Scatter(x=df['timestamp'], y=df['frecuencia_cardiaca'],
-                             mode='lines', name='FC', line=dict(color='#DC2626', width=1.5)), row=1, col=1)
-    fig.add_trace(go.Scatter(x=df['timestamp'], y=df['presion_sistolica'],
-                             mode='lines', name='Sist.', line=dict(color='#1E40AF', width=1.5)), row=1, col=2)
-    fig.add_trace(go.Scatter(x=df['timestamp'], y=df['presion_diastolica'],
-                             mode='lines', name='Diast.', line=dict(color='#7C3AED', width=1.5)), row=1, col=2)
-    fig.add_trace(go.Scatter(x=df['timestamp'], y=df['saturacion_oxigeno'],
-                             mode='lines', name='SpO2', line=dict(color='#0891B2', width=1.5)), row=2, col=1)
-    fig.add_trace(go.Scatter(x=df['timestamp'], y=df['temperatura'],
-                             mode='lines', name='Temp', line=dict(color='#D97706', width=1.5)), row=2, col=2)
-
-    fig.update_layout(height=600, template='simple_white', showlegend=False,
-                      margin=dict(t=40, b=30))
-    st.plotly_chart(fig, use_container_width=True)
+                      margin=dict(t=40, b=30), uirevision=nombre)
+    if 'rango_y' in vista:
+        fig.update_yaxes(range=vista['rango_y'])
+    return fig
+
+
+# Solo se construye y serializa la vista seleccionada
+opciones_vista = list(VISTAS.keys()) if streaming else list(VISTAS.keys()) + ["Vista General"]
+vista_sel = st.radio(
+    "Vista", options=opciones_vista,
+    horizontal=True, label_visibility="collapsed", key="vista_live"
+)
+
+if streaming:
+    @st.fragment(run_every=intervalo if auto_refresh else None)
+    def grafica_streaming():
+        """Genera el punto nuevo y envía al navegador solo lo que aún no tiene."""
+        if auto_refresh:
+            agregar_punto()
+        vista = VISTAS[vista_sel]
+        mostrar_flujo_vitales(
+            flujo_id=f"{pac_row['id']}_{vista_sel}",
+            puntos=st.session_state[HISTORY_KEY],
+            series=[{'columna': c, 'nombre': n, 'color': color} for c, n, color, _ in vista['series']],
+            banda=vista['banda'][:2],
+            rango_y=vista.get('rango_y'),
+            titulo=vista['titulo'],
+            unidad=vista['eje'],
+            alto=400,
+            max_puntos=max_historial,
+            key="flujo_live",
+        )
+        st.caption(f"Punto #{st.session_state[TICK_KEY]} — {datetime.now().strftime('%H:%M:%S')}")
+
+    grafica_streaming()
+    st.caption("En modo streaming solo se actualiza la gráfica; las tarjetas y estadísticas se recalculan al interactuar con la página.")
+else:
+    n_puntos = len(df)
+    modo = 'gl' if usar_webgl(n_puntos) else 'svg'
+    fig = obtener_figura(f"live_{vista_sel}_{modo}", lambda: construir_vista(vista_sel, n_puntos))
+
+    if vista_sel == "Vista General":
+        columnas_vista = [c[0] for c in VISTA_GENERAL]
+    else:
+        columnas_vista = [c[0] for c in VISTAS[vista_sel]['series']]
+    actualizar_trazas(fig, [(df['timestamp'], df[c]) for c in columnas_vista])
+    fig.update_layout(uirevision=f"{vista_sel}_{pac_row['id']}")
+
+    st.plotly_chart(fig, use_container_width=True, key=f"grafica_live_{vista_sel}")
 
 # --- STATS ROW ---
 st.markdown("---")
@@ -298,6 +340,25 @@ with col2:
         st.rerun()
 
 # --- AUTO-REFRESH ---
-if auto_refresh:
-    time.sleep(intervalo)
-    st.rerun()
\ No newline at end of file
+# El intervalo elegido es la base; el planificador lo ajusta según carga, visibilidad y paciente
+if auto_refresh and not streaming:
+    decision = calcular_intervalo(
+        intervalo,
+        visible=pestana_visible(key="visibilidad_live"),
+        alertas_recientes=contar_alertas_recientes(pac_row['id']),
+        ciclos_estables=st.session_state.get(ESTABLE_KEY, 0),
+    )
+    mostrar_diagnostico_refresco(decision)
+
+    # El temporizador corre en el navegador (como en la sala): el script no queda
+    # bloqueado, así que volver a la pestaña o un clic se atienden al momento.
+    # La primera ejecución es la de este render; las siguientes recargan la página.
+    st.session_state["_refresco_live_programado"] = False
+
+    @st.fragment(run_every=decision['intervalo'])
+    def temporizador_refresco():
+        if st.session_state["_refresco_live_programado"]:
+            st.rerun(scope="app")
+        st.session_state["_refresco_live_programado"] = True
+
+    temporizador_refresco()
\ No newline at end of file
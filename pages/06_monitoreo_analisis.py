@@ -7,7 +7,9 @@ from sqlalchemy import text
 from core.auth import require_auth
 from core.sidebar import render_sidebar
 from core.theme import apply_global_theme
-from utils import breadcrumb_nav
+from core.db import obtener_conexion_lectura
+from utils import (breadcrumb_nav, crear_traza, usar_webgl, obtener_figura, actualizar_trazas,
+                   obtener_mediciones_paciente)
 
 # --- PROTECCIÓN DE RUTA ---
 require_auth(allowed_roles=['administrador', 'medico'])
@@ -19,7 +21,9 @@ breadcrumb_nav(["Home", "Análisis", "Análisis Clínico"])
 
 # --- CONEXIÓN ---
 try:
-    conn = st.connection("postgresql", type="sql")
+    # Lista de pacientes: réplica cuando está disponible (las mediciones van por el
+    # pool analítico, ver obtener_mediciones_paciente)
+    conn_lectura = obtener_conexion_lectura()
 except Exception:
     st.error("No se pudo establecer conexión con la base de datos.")
     st.stop()
@@ -51,7 +55,7 @@ def clasificar_valor(valor, tipo):
 
 # --- OBTENER PACIENTES ---
 try:
-    pacientes_df = conn.query("""
+    pacientes_df = conn_lectura.query("""
         SELECT DISTINCT p.id, p.nombre, p.apellido_paterno, p.apellido_materno,
                p.diagnostico, MAX(med.timestamp) as ultima_medicion
         FROM public.pacientes p
@@ -109,23 +113,7 @@ else:
 
 # --- CARGAR MEDICIONES ---
 try:
-    if fecha_inicio:
-        mediciones_df = conn.query(f"""
-            SELECT m.timestamp, m.tipo_medicion, m.valor, m.unidad_medida
-            FROM public.mediciones m
-            JOIN public.dispositivos d ON m.dispositivo_id = d.id
-            WHERE d.paciente_id = {paciente_id}
-                AND m.timestamp >= '{fecha_inicio}' AND m.timestamp <= '{fecha_fin}'
-            ORDER BY m.timestamp
-        """, ttl="5s")
-    else:
-        mediciones_df = conn.query(f"""
-            SELECT m.timestamp, m.tipo_medicion, m.valor, m.unidad_medida
-            FROM public.mediciones m
-            JOIN public.dispositivos d ON m.dispositivo_id = d.id
-            WHERE d.paciente_id = {paciente_id}
-            ORDER BY m.timestamp
-        """, ttl="5s")
+    mediciones_df = obtener_mediciones_paciente(paciente_id, fecha_inicio, fecha_fin)
 except Exception as e:
     st.error(f"Error al cargar mediciones: {e}")
     mediciones_df = pd.DataFrame()
@@ -159,13 +147,44 @@ mediciones_pivot = mediciones_df.pivot_table(
     index='timestamp', columns='tipo_medicion', values='valor', aggfunc='first'
 ).reset_index()
 
-# ==================== TABS ====================
-tab_resumen, tab_tendencias, tab_heatmap, tab_datos, tab_simulador = st.tabs([
-    "Resumen Clínico", "Tendencias", "Mapa de Calor", "Datos", "Simulador"
-])
+def construir_tendencia(tipo, n_puntos):
+    """Crea la figura vacía de tendencia de un signo vital; los datos se asignan después."""
+    rango = RANGOS_CLINICOS.get(tipo, {})
+    label = rango.get('label', tipo.replace('_', ' ').title())
+
+    fig = go.Figure()
+    fig.add_trace(crear_traza(
+        n_puntos, mode='lines+markers', name=label,
+        line=dict(color='#1E40AF', width=2), marker=dict(size=3)
+    ))
+
+    # Banda de rango normal
+    if 'min' in rango and 'max' in rango:
+        fig.add_hrect(
+            y0=rango['min'], y1=rango['max'],
+            fillcolor="#10B981", opacity=0.08, layer="below", line_width=0,
+            annotation_text="Rango normal", annotation_position="top left",
+            annotation=dict(font_size=10, font_color="#6B7280")
+        )
+
+    fig.update_layout(
+        title=label,
+        xaxis_title="Fecha",
+        yaxis_title=f"Valor ({rango.get('unidad', '')})",
+        height=350, hovermode='x unified', template='simple_white',
+        margin=dict(t=40, b=40)
+    )
+    return fig
+
+# ==================== VISTAS ====================
+# Solo se construye la sección seleccionada (st.tabs ejecuta y envía todas)
+vista = st.radio(
+    "Sección", options=["Resumen Clínico", "Tendencias", "Mapa de Calor", "Datos", "Simulador"],
+    horizontal=True, label_visibility="collapsed", key="vista_analisis"
+)
 
 # ==================== TAB 1: RESUMEN CLÍNICO ====================
-with tab_resumen:
+if vista == "Resumen Clínico":
     st.subheader("Estado Actual de Signos Vitales")
 
     metricas_lista = [col for col in mediciones_pivot.columns if col != 'timestamp']
@@ -261,7 +280,7 @@ with tab_resumen:
             st.error(f"**{label}:** Promedio {promedio:.1f} — valor crítico. Rango esperado: {rango.get('min', '?')}–{rango.get('max', '?')}. Requiere atención inmediata.")
 
 # ==================== TAB 2: TENDENCIAS ====================
-with tab_tendencias:
+elif vista == "Tendencias":
     st.subheader("Evolución Temporal")
 
     for tipo in [c for c in mediciones_pivot.columns if c != 'timestamp']:
@@ -269,36 +288,15 @@ with tab_tendencias:
         if len(valores_col) == 0:
             continue
 
-        rango = RANGOS_CLINICOS.get(tipo, {})
-        label = rango.get('label', tipo.replace('_', ' ').title())
-
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=valores_col['timestamp'], y=valores_col[tipo],
-            mode='lines+markers', name=label,
-            line=dict(color='#1E40AF', width=2), marker=dict(size=3)
-        ))
-
-        # Banda de rango normal
-        if 'min' in rango and 'max' in rango:
-            fig.add_hrect(
-                y0=rango['min'], y1=rango['max'],
-                fillcolor="#10B981", opacity=0.08, layer="below", line_width=0,
-                annotation_text="Rango normal", annotation_position="top left",
-                annotation=dict(font_size=10, font_color="#6B7280")
-            )
-
-        fig.update_layout(
-            title=label,
-            xaxis_title="Fecha",
-            yaxis_title=f"Valor ({rango.get('unidad', '')})",
-            height=350, hovermode='x unified', template='simple_white',
-            margin=dict(t=40, b=40)
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        n_puntos = len(valores_col)
+        modo = 'gl' if usar_webgl(n_puntos) else 'svg'
+        fig = obtener_figura(f"tendencia_{tipo}_{modo}", lambda: construir_tendencia(tipo, n_puntos))
+        actualizar_trazas(fig, [(valores_col['timestamp'], valores_col[tipo])])
+        fig.update_layout(uirevision=f"{paciente_id}_{rango_tipo}")
+        st.plotly_chart(fig, use_container_width=True, key=f"tendencia_{tipo}")
 
 # ==================== TAB 3: MAPA DE CALOR ====================
-with tab_heatmap:
+elif vista == "Mapa de Calor":
     st.subheader("Mapa de Calor — Patrones por Hora")
     st.caption("Visualiza cómo varían los valores a lo largo del día. Colores más intensos indican valores más altos.")
 
@@ -314,24 +312,16 @@ with tab_heatmap:
     if not mediciones_hm.empty:
         heatmap_data = mediciones_hm.pivot_table(index='hora', columns='fecha', values='valor', aggfunc='mean')
 
-        anotaciones = []
-        for i, hora in enumerate(heatmap_data.index):
-            for j, fecha in enumerate(heatmap_data.columns):
-                val = heatmap_data.iloc[i, j]
-                if not pd.isna(val):
-                    anotaciones.append(dict(x=fecha, y=hora, text=f"{val:.0f}", showarrow=False,
-                                            font=dict(color="black", size=10)))
-
+        # Los valores de cada celda se dibujan con texttemplate en lugar de una anotación por celda
         fig = go.Figure(data=go.Heatmap(
             z=heatmap_data.values, x=heatmap_data.columns, y=heatmap_data.index,
             colorscale='YlOrRd', colorbar=dict(title="Valor", thickness=15, len=0.7),
-            hoverongaps=False,
+            hoverongaps=False, texttemplate="%{z:.0f}", textfont=dict(color="black", size=10),
             hovertemplate='<b>Fecha:</b> %{x}<br><b>Hora:</b> %{y}:00<br><b>Valor:</b> %{z:.1f}<extra></extra>'
         ))
 
         label_hm = RANGOS_CLINICOS.get(metrica_heatmap, {}).get('label', metrica_heatmap.replace('_',' ').title())
         fig.update_layout(
-            annotations=anotaciones,
             title=f"{label_hm} — Patrón por hora y fecha",
             xaxis_title="Fecha", yaxis_title="Hora del día",
             height=550, template='simple_white',
@@ -345,7 +335,7 @@ with tab_heatmap:
         st.info(f"**Promedio general:** {promedio_general:.1f} — Los colores más intensos indican horas con valores más elevados.")
 
 # ==================== TAB 4: DATOS ====================
-with tab_datos:
+elif vista == "Datos":
     st.subheader("Registro Detallado")
 
     mediciones_tabla = mediciones_df.copy()
@@ -371,7 +361,7 @@ with tab_datos:
     )
 
 # ==================== TAB 5: SIMULADOR ====================
-with tab_simulador:
+elif vista == "Simulador":
     st.subheader("Simulador de Eventos")
     st.caption("Simula eventos médicos y observa cómo cambiarían las métricas.")
 
@@ -466,8 +456,8 @@ with tab_simulador:
             ], ignore_index=True)
 
             fig_sim = go.Figure()
-            fig_sim.add_trace(go.Scatter(
-                x=combinados['timestamp'], y=combinados['frecuencia_cardiaca'],
+            fig_sim.add_trace(crear_traza(
+                len(combinados), x=combinados['timestamp'], y=combinados['frecuencia_cardiaca'],
                 mode='lines+markers', name='FC',
                 line=dict(color='#DC2626', width=2), marker=dict(size=4)
             ))
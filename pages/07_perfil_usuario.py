@@ -3,6 +3,7 @@ from sqlalchemy import text
 from core.auth import require_auth
 from core.sidebar import render_sidebar
 from core.theme import apply_global_theme
+from core.db import obtener_conexion
 
 st.set_page_config(page_title="Mi Perfil", page_icon=None, layout="wide")
 
@@ -13,7 +14,7 @@ st.title("Mi Perfil Médico")
 st.markdown("---")
 
 try:
-    conn = st.connection("postgresql", type="sql")
+    conn = obtener_conexion()
     with conn.session as s:
         query = text("""
             SELECT p.*, d.modelo, d.mac_address, 
@@ -5,6 +5,7 @@ from sqlalchemy import text
 from core.auth import require_auth
 from core.sidebar import render_sidebar
 from core.theme import apply_global_theme
+from core.db import obtener_conexion
 
 st.set_page_config(page_title="Mis Mediciones", page_icon=None, layout="wide")
 
@@ -15,7 +16,7 @@ st.title("Mis Mediciones Biométricas")
 st.markdown("---")
 
 try:
-    conn = st.connection("postgresql", type="sql")
+    conn = obtener_conexion()
     
     with conn.session as s:
         query = text("""
@@ -5,7 +5,8 @@ from sqlalchemy import text
 from core.auth import require_auth
 from core.sidebar import render_sidebar
 from core.theme import apply_global_theme
-from utils import breadcrumb_nav
+from core.db import obtener_conexion
+from utils import breadcrumb_nav, obtener_pacientes_permitidos, obtener_resumen_pacientes
 
 require_auth(allowed_roles=['medico'])
 render_sidebar()
@@ -18,7 +19,7 @@ breadcrumb_nav(["Home", "Gestión Médica", "Mis Pacientes"])
 
 # --- CONEXIÓN A LA BASE DE DATOS ---
 try:
-    conn = st.connection("postgresql", type="sql")
+    conn = obtener_conexion()
 except Exception:
     st.error("No se pudo establecer conexión con la base de datos.")
     st.stop()
@@ -61,16 +62,16 @@ st.markdown("""
 st.title("👥 Mis Pacientes Asignados")
 st.markdown("---")
 
-# Obtener datos de pacientes asignados al médico actual
+# Obtener datos de pacientes asignados al médico actual (mapa de acceso cacheado)
+pacientes_asignados = obtener_pacientes_permitidos(st.session_state.user_id, st.session_state.rol)
 try:
-    pacientes_df = conn.query(f"""
+    pacientes_df = conn.query("""
         SELECT p.id, p.nombre, p.apellido_paterno, p.apellido_materno, 
                p.email, p.telefono, p.diagnostico
         FROM public.pacientes p
-        INNER JOIN public.pacientes_medicos pm ON p.id = pm.paciente_id
-        WHERE pm.medico_id = :medico_id
+        WHERE p.id = ANY(:pacientes)
         ORDER BY p.nombre
-    """, params={"medico_id": st.session_state.medico_id}, ttl="10s")
+    """, params={"pacientes": pacientes_asignados}, ttl="10s")
 except Exception as e:
     st.error(f"Error al cargar pacientes: {e}")
     pacientes_df = pd.DataFrame()
@@ -107,47 +108,17 @@ if not pacientes_df.empty:
         # --- LISTA DE PACIENTES ---
         st.subheader(f"Pacientes Bajo mi Cuidado ({len(filtered_df)})")
         
+        # Un solo viaje a la base de datos para todas las tarjetas
+        resumen = obtener_resumen_pacientes(filtered_df['id'].tolist())
+        
         for idx, paciente in filtered_df.iterrows():
             paciente_id = paciente['id']
             nombre_completo = f"{paciente['nombre']} {paciente['apellido_paterno']} {paciente.get('apellido_materno', '')}".strip()
             
-            # Obtener métricas recientes del paciente
-            try:
-                with conn.session as s:
-                    metrics_query = text("""
-                        SELECT 
-                            m.tipo_medicion,
-                            m.valor,
-                            m.unidad_medida,
-                            m.timestamp
-                        FROM public.mediciones m
-                        JOIN public.dispositivos d ON m.dispositivo_id = d.id
-                        WHERE d.paciente_id = :pid
-                        ORDER BY m.timestamp DESC
-                        LIMIT 10
-                    """)
-                    
-                    metrics = s.execute(metrics_query, {'pid': paciente_id}).fetchall()
-                
-                # Agrupar métricas por tipo
-                last_metrics = {}
-                for m in metrics:
-                    if m[0] not in last_metrics:
-                        last_metrics[m[0]] = (m[1], m[2], m[3])
-                
-                # Obtener alertas pendientes
-                alertas_query_result = conn.query(
-                    f"""SELECT COUNT(*) as alertas FROM public.alertas a 
-                       WHERE a.medicion_id IN (SELECT id FROM public.mediciones 
-                                               WHERE dispositivo_id IN (SELECT id FROM public.dispositivos WHERE paciente_id = {paciente_id}))
-                       AND a.leida = false""",
-                    ttl="5s"
-                )
-                alertas = alertas_query_result.iloc[0]['alertas'] if not alertas_query_result.empty else 0
-                
-            except Exception as e:
-                last_metrics = {}
-                alertas = 0
+            # Últimas métricas y alertas pendientes (cargadas para todos los pacientes antes del bucle)
+            datos = resumen.get(paciente_id, {'alertas': 0, 'ultimas': []})
+            alertas = datos['alertas']
+            last_metrics = {tipo: (valor, unidad, timestamp) for tipo, valor, unidad, timestamp in datos['ultimas']}
             
             # Estado del paciente
             estado = "🟢 Estable"
@@ -170,7 +141,7 @@ if not pacientes_df.empty:
                 with col2:
                     st.write("**Últimas Métricas:**")
                     if last_metrics:
-                        cols = st.columns(len(last_metrics))
+                        cols = st.columns(min(len(last_metrics), 3))
                         for col_idx, (tipo, (valor, unidad, timestamp)) in enumerate(list(last_metrics.items())[:3]):
                             with cols[col_idx]:
                                 st.metric(
@@ -4,7 +4,11 @@ from datetime import datetime, timedelta
 from core.auth import require_auth
 from core.sidebar import render_sidebar
 from core.theme import apply_global_theme
-from utils import breadcrumb_nav
+from core.db import obtener_conexion
+from utils import (
+    breadcrumb_nav, obtener_pagina_alertas, contar_alertas_por_categoria,
+    marcar_alertas_leidas, marcar_alertas_leidas_rango, marcar_notificaciones_leidas,
+)
 
 # --- PROTECCIÓN DE RUTA ---
 require_auth(allowed_roles=['administrador', 'medico', 'paciente'])
@@ -22,7 +26,7 @@ st.markdown("---")
 
 # --- CONEXIÓN A LA BASE DE DATOS ---
 try:
-    conn = st.connection("postgresql", type="sql")
+    conn = obtener_conexion()
 except Exception:
     st.error("No se pudo establecer conexión con la base de datos.")
     st.stop()
@@ -76,170 +80,204 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# --- OBTENER ALERTAS DE LA BD ---
-try:
-    alertas_df = conn.query("""
-        SELECT 
-            a.id,
-            a.timestamp,
-            a.tipo_alerta,
-            a.mensaje,
-            a.leida,
-            d.numero_serie as dispositivo,
-            p.nombre || ' ' || p.apellido_paterno as paciente,
-            m.tipo_medicion,
-            m.valor,
-            m.unidad_medida
-        FROM public.alertas a
-        LEFT JOIN public.mediciones m ON a.medicion_id = m.id
-        LEFT JOIN public.dispositivos d ON m.dispositivo_id = d.id
-        LEFT JOIN public.pacientes p ON d.paciente_id = p.id
-        ORDER BY a.timestamp DESC
-        LIMIT 200
-    """, ttl="10s")
-except Exception as e:
-    st.error(f"Error al cargar alertas: {e}")
-    alertas_df = pd.DataFrame()
+# --- FILTRO ---
+# Una sola categoría a la vez: solo se consulta y renderiza la que se está viendo
+CATEGORIAS = {
+    "📋 Todas": None,
+    "🚨 Críticas": "critica",
+    "⚠️ Advertencias": "advertencia",
+    "ℹ️ Informativas": "informativa",
+    "✅ Resueltas": "resuelta",
+}
+ALERTAS_POR_PAGINA = 50
 
-if alertas_df.empty:
-    st.info("✅ No hay alertas en el sistema")
+col_filtro, col_actualizar = st.columns([0.85, 0.15])
+with col_filtro:
+    vista = st.radio("Categoría", list(CATEGORIAS), horizontal=True,
+                     key="alertas_categoria", label_visibility="collapsed")
+with col_actualizar:
+    if st.button("🔄 Actualizar", use_container_width=True):
+        st.session_state.pop("_alertas_paginadas", None)
+        contar_alertas_por_categoria.clear()
+
+categoria = CATEGORIAS[vista]
+
+# --- OBTENER ALERTAS DE LA BD (paginación por llave) ---
+# La primera página se consulta en cada ejecución (por llave es barata), así
+# que las alertas nuevas aparecen al volver a la página. Solo las páginas de
+# "Cargar más" se conservan en la sesión, con el cursor desde el que continúan
+primera = obtener_pagina_alertas(
+    st.session_state.user_id, st.session_state.rol,
+    limite=ALERTAS_POR_PAGINA, categoria=categoria,
+)
+paginadas = st.session_state.setdefault("_alertas_paginadas", {})
+adicionales = paginadas.get(vista)
+if adicionales is not None and adicionales["desde"] != primera["siguiente"]:
+    # Llegaron alertas nuevas: las páginas cargadas ya no continúan la primera
+    del paginadas[vista]
+    adicionales = None
+
+if adicionales is None:
+    alertas = primera["alertas"]
+    siguiente = primera["siguiente"]
 else:
-    # --- TABS ---
-    tab_todas, tab_criticas, tab_advertencias, tab_informativas, tab_resueltas = st.tabs([
-        "📋 Todas",
-        "🚨 Críticas",
-        "⚠️ Advertencias",
-        "ℹ️ Informativas",
-        "✅ Resueltas"
-    ])
+    alertas = primera["alertas"] + adicionales["alertas"]
+    siguiente = adicionales["siguiente"]
+
+alertas_df = pd.DataFrame(alertas)
+conteos = contar_alertas_por_categoria(st.session_state.user_id, st.session_state.rol)
+
+# --- FUNCIONES AUXILIARES ---
+def renderizar_alerta(row):
+    """Renderiza una tarjeta de alerta con su tipo de color"""
+    timestamp = pd.to_datetime(row['timestamp'])
+    tiempo_relativo = (datetime.now() - timestamp).total_seconds()
     
-    # --- FUNCIONES AUXILIARES ---
-    def renderizar_alerta(row):
-        """Renderiza una tarjeta de alerta con su tipo de color"""
-        timestamp = pd.to_datetime(row['timestamp'])
-        tiempo_relativo = (datetime.now() - timestamp).total_seconds()
-        
-        if tiempo_relativo < 60:
-            tiempo_str = "hace unos segundos"
-        elif tiempo_relativo < 3600:
-            tiempo_str = f"hace {int(tiempo_relativo // 60)} minutos"
-        elif tiempo_relativo < 86400:
-            tiempo_str = f"hace {int(tiempo_relativo // 3600)} horas"
-        else:
-            tiempo_str = timestamp.strftime("%d/%m/%Y %H:%M")
-        
-        tipo_alerta = str(row['tipo_alerta']).lower()
-        
-        # Seleccionar clase CSS y ícono
-        if 'critica' in tipo_alerta or 'paro' in tipo_alerta or 'arritmia' in tipo_alerta:
-            css_class = 'alert-critica'
-            icono = "🚨"
-        elif 'advertencia' in tipo_alerta or 'elevada' in tipo_alerta or 'baja' in tipo_alerta:
-            css_class = 'alert-advertencia'
-            icono = "⚠️"
-        elif 'info' in tipo_alerta or 'normal' in tipo_alerta:
-            css_class = 'alert-info'
-            icono = "ℹ️"
-        else:
-            css_class = 'alert-exito'
-            icono = "✅"
-        
-        # Obtener valor de medición si existe
-        valor_str = ""
-        if pd.notna(row.get('valor')):
-            valor_str = f" • <b>{row['valor']:.1f} {row.get('unidad_medida', '')}</b>"
-        
-        html = f"""
-        <div class="{css_class}">
-            <div class="alert-header">
-                <div>
-                    <b>{icono} {row['tipo_alerta']}</b>
-                    {valor_str}
-                </div>
-                <span class="alert-time">{tiempo_str}</span>
+    if tiempo_relativo < 60:
+        tiempo_str = "hace unos segundos"
+    elif tiempo_relativo < 3600:
+        tiempo_str = f"hace {int(tiempo_relativo // 60)} minutos"
+    elif tiempo_relativo < 86400:
+        tiempo_str = f"hace {int(tiempo_relativo // 3600)} horas"
+    else:
+        tiempo_str = timestamp.strftime("%d/%m/%Y %H:%M")
+    
+    # Seleccionar clase CSS y ícono
+    tipo = row['categoria']
+    if tipo == 'critica':
+        css_class = 'alert-critica'
+        icono = "🚨"
+    elif tipo == 'advertencia':
+        css_class = 'alert-advertencia'
+        icono = "⚠️"
+    elif 'info' in str(row['tipo_alerta']).lower() or 'normal' in str(row['tipo_alerta']).lower():
+        css_class = 'alert-info'
+        icono = "ℹ️"
+    else:
+        css_class = 'alert-exito'
+        icono = "✅"
+    
+    # Obtener valor de medición si existe
+    valor_str = ""
+    if pd.notna(row.get('valor')):
+        valor_str = f" • <b>{float(row['valor']):.1f} {row.get('unidad_medida', '')}</b>"
+    
+    # Episodio: varias lecturas anormales agrupadas en esta alerta
+    if row.get('lecturas', 1) > 1:
+        valor_str += f" • {int(row['lecturas'])} lecturas (pico {float(row['valor_pico']):.1f})"
+    
+    html = f"""
+    <div class="{css_class}">
+        <div class="alert-header">
+            <div>
+                <b>{icono} {row['tipo_alerta']}</b>
+                {valor_str}
             </div>
-            <p style="margin: 8px 0 0 0;">{row['mensaje']}</p>
-            <small style="opacity: 0.7;">
-                📱 {row.get('dispositivo', 'N/A')} • 👤 {row.get('paciente', 'N/A')} • 📊 {row.get('tipo_medicion', 'N/A')}
-            </small>
+            <span class="alert-time">{tiempo_str}</span>
         </div>
-        """
-        return html
+        <p style="margin: 8px 0 0 0;">{row['mensaje']}</p>
+        <small style="opacity: 0.7;">
+            📱 {row.get('dispositivo', 'N/A')} • 👤 {row.get('paciente', 'N/A')} • 📊 {row.get('tipo_medicion', 'N/A')}
+        </small>
+    </div>
+    """
+    return html
+
+
+MENSAJES_VACIO = {
+    None: "✅ No hay alertas en el sistema",
+    "critica": "✅ No hay alertas críticas",
+    "advertencia": "✅ No hay advertencias",
+    "informativa": "No hay alertas informativas",
+    "resuelta": "No hay alertas marcadas como leídas",
+}
+
+if "_alertas_acuse" in st.session_state:
+    st.success(f"✅ {st.session_state.pop('_alertas_acuse')} alertas marcadas como leídas")
+
+if alertas_df.empty:
+    st.info(MENSAJES_VACIO[categoria])
+else:
+    if categoria is None:
+        # Resumen de todas las alertas visibles (un solo GROUP BY por severidad)
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("🚨 Críticas", conteos["critica"])
+        with col2:
+            st.metric("⚠️ Advertencias", conteos["advertencia"])
+        with col3:
+            st.metric("ℹ️ Informativas", conteos["informativa"])
+        with col4:
+            st.metric("✅ Leídas", conteos["resuelta"])
+    elif categoria == "critica":
+        st.warning(f"⚠️ {conteos['critica']} alertas críticas detectadas")
+    elif categoria == "advertencia":
+        st.info(f"ℹ️ {conteos['advertencia']} advertencias en el sistema")
+    elif categoria == "informativa":
+        st.markdown(f"ℹ️ {conteos['informativa']} notificaciones informativas")
+    else:
+        st.success(f"✅ {conteos['resuelta']} alertas leídas")
     
-    # --- TAB 1: TODAS LAS ALERTAS ---
-    with tab_todas:
-        if len(alertas_df) == 0:
-            st.info("No hay alertas")
-        else:
-            # Resumen estadístico
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                criticas = len(alertas_df[alertas_df['tipo_alerta'].str.lower().str.contains('critica|paro|arritmia', na=False)])
-                st.metric("🚨 Críticas", criticas)
-            with col2:
-                advertencias = len(alertas_df[alertas_df['tipo_alerta'].str.lower().str.contains('advertencia|elevada|baja', na=False)])
-                st.metric("⚠️ Advertencias", advertencias)
-            with col3:
-                info = len(alertas_df[~alertas_df['tipo_alerta'].str.lower().str.contains('critica|paro|arritmia|advertencia|elevada|baja', na=False)])
-                st.metric("ℹ️ Informativas", info)
-            with col4:
-                leidas = len(alertas_df[alertas_df['leida'] == True])
-                st.metric("✅ Leídas", leidas)
-            
-            st.markdown("---")
-            
-            # Mostrar todas las alertas
-            for _, row in alertas_df.iterrows():
-                st.markdown(renderizar_alerta(row), unsafe_allow_html=True)
+    st.markdown("---")
     
-    # --- TAB 2: ALERTAS CRÍTICAS ---
-    with tab_criticas:
-        criticas_df = alertas_df[alertas_df['tipo_alerta'].str.lower().str.contains('critica|paro|arritmia', na=False)]
-        
-        if len(criticas_df) == 0:
-            st.success("✅ No hay alertas críticas")
-        else:
-            st.warning(f"⚠️ {len(criticas_df)} alertas críticas detectadas")
-            st.markdown("---")
-            
-            for _, row in criticas_df.iterrows():
-                st.markdown(renderizar_alerta(row), unsafe_allow_html=True)
+    pendientes = alertas_df[~alertas_df['leida']] if categoria != "resuelta" else alertas_df.iloc[0:0]
     
-    # --- TAB 3: ADVERTENCIAS ---
-    with tab_advertencias:
-        advertencias_df = alertas_df[alertas_df['tipo_alerta'].str.lower().str.contains('advertencia|elevada|baja', na=False)]
-        
-        if len(advertencias_df) == 0:
-            st.success("✅ No hay advertencias")
-        else:
-            st.info(f"ℹ️ {len(advertencias_df)} advertencias en el sistema")
-            st.markdown("---")
+    if pendientes.empty:
+        for _, row in alertas_df.iterrows():
+            st.markdown(renderizar_alerta(row), unsafe_allow_html=True)
+    else:
+        # Acuse en lote: las casillas viven en un formulario, así que marcarlas no
+        # provoca reruns; al enviar se ejecuta una sola sentencia y un solo rerun
+        with st.form("acuse_alertas"):
+            seleccion = []
+            for _, row in alertas_df.iterrows():
+                col_check, col_alerta = st.columns([0.04, 0.96])
+                with col_check:
+                    if not row['leida'] and st.checkbox("Seleccionar", key=f"sel_alerta_{row['id']}",
+                                                        label_visibility="collapsed"):
+                        seleccion.append(int(row['id']))
+                with col_alerta:
+                    st.markdown(renderizar_alerta(row), unsafe_allow_html=True)
             
-            for _, row in advertencias_df.iterrows():
-                st.markdown(renderizar_alerta(row), unsafe_allow_html=True)
-    
-    # --- TAB 4: INFORMATIVAS ---
-    with tab_informativas:
-        info_df = alertas_df[~alertas_df['tipo_alerta'].str.lower().str.contains('critica|paro|arritmia|advertencia|elevada|baja', na=False)]
+            col_sel, col_cargadas = st.columns(2)
+            with col_sel:
+                marcar_seleccion = st.form_submit_button("✔️ Marcar seleccionadas", use_container_width=True)
+            with col_cargadas:
+                marcar_cargadas = st.form_submit_button(
+                    f"✔️ Marcar las {len(pendientes)} cargadas", use_container_width=True
+                )
         
-        if len(info_df) == 0:
-            st.info("No hay alertas informativas")
+        # Todo lo visible hasta la alerta más reciente mostrada, incluidas las páginas no cargadas
+        if st.button(f"✔️ Marcar todas como leídas ({vista})", use_container_width=True):
+            ids = marcar_alertas_leidas_rango(
+                st.session_state.user_id, st.session_state.rol,
+                hasta=pd.to_datetime(alertas_df['timestamp']).max().to_pydatetime(), categoria=categoria,
+            )
+            marcadas = len(ids) if ids is not None else -1
+        elif marcar_seleccion or marcar_cargadas:
+            ids = seleccion if marcar_seleccion else [int(i) for i in pendientes['id']]
+            marcadas = marcar_alertas_leidas(ids, st.session_state.user_id, st.session_state.rol)
         else:
-            st.markdown(f"ℹ️ {len(info_df)} notificaciones informativas")
-            st.markdown("---")
-            
-            for _, row in info_df.iterrows():
-                st.markdown(renderizar_alerta(row), unsafe_allow_html=True)
-    
-    # --- TAB 5: RESUELTAS ---
-    with tab_resueltas:
-        resueltas_df = alertas_df[alertas_df['leida'] == True]
+            marcadas = None
         
-        if len(resueltas_df) == 0:
-            st.info("No hay alertas marcadas como leídas")
-        else:
-            st.success(f"✅ {len(resueltas_df)} alertas leídas")
-            st.markdown("---")
-            
-            for _, row in resueltas_df.iterrows():
-                st.markdown(renderizar_alerta(row), unsafe_allow_html=True)
\ No newline at end of file
+        # El acuse también descuenta las notificaciones de esas alertas en la barra lateral
+        if marcadas is not None and marcadas > 0:
+            marcar_notificaciones_leidas(ids, st.session_state.user_id, st.session_state.rol)
+        
+        if marcadas is not None and marcadas >= 0:
+            st.session_state["_alertas_acuse"] = marcadas
+            st.session_state.pop("_alertas_paginadas", None)
+            st.rerun()
+    
+    if siguiente:
+        st.caption(f"Mostrando {len(alertas_df)} alertas")
+        if st.button("⬇️ Cargar más", use_container_width=True, key=f"cargar_mas_{categoria}"):
+            pagina = obtener_pagina_alertas(
+                st.session_state.user_id, st.session_state.rol,
+                cursor=siguiente, limite=ALERTAS_POR_PAGINA, categoria=categoria,
+            )
+            if adicionales is None:
+                adicionales = paginadas[vista] = {"desde": primera["siguiente"], "alertas": []}
+            adicionales["alertas"].extend(pagina["alertas"])
+            adicionales["siguiente"] = pagina["siguiente"]
+            st.rerun()
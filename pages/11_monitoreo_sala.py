@@ -0,0 +1,227 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+from datetime import datetime
+from core.auth import require_auth
+from core.sidebar import render_sidebar
+from core.theme import apply_global_theme
+from utils import (breadcrumb_nav, verificar_rango, obtener_vitales_sala, VITALES_SALA,
+                   pestana_visible, calcular_intervalo, mostrar_diagnostico_refresco)
+
+# --- PROTECCIÓN DE RUTA ---
+require_auth(allowed_roles=['administrador', 'medico'])
+render_sidebar()
+apply_global_theme()
+
+st.set_page_config(page_title="Vista de Sala", page_icon="❤️", layout="wide")
+breadcrumb_nav(["Home", "Análisis", "Vista de Sala"])
+
+st.title("Vista de Sala")
+st.caption("Todos los pacientes con monitoreo activo en una sola pantalla.")
+st.markdown("---")
+
+# --- CONFIGURACIÓN VISUAL ---
+# Rango fijo de dibujo por signo vital para que las curvas sean comparables entre mosaicos
+ESCALAS = {
+    "Ritmo Cardíaco": {"min": 30, "max": 180, "color": "#DC2626", "abrev": "FC"},
+    "Saturación Oxígeno": {"min": 80, "max": 100, "color": "#0891B2", "abrev": "SpO₂"},
+    "Presión Sistólica": {"min": 60, "max": 200, "color": "#1E40AF", "abrev": "PAS"},
+    "Presión Diastólica": {"min": 30, "max": 130, "color": "#7C3AED", "abrev": "PAD"},
+}
+COLORES_ESTADO = {None: "#10B981", "advertencia": "#F59E0B", "crítica": "#EF4444"}
+PRIORIDAD_ESTADO = {None: 0, "advertencia": 1, "crítica": 2}
+ALTO_FILA_PX = 130
+
+# --- CONTROLES ---
+col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+with col1:
+    filtro = st.text_input("Filtrar paciente", placeholder="Nombre o apellido...")
+with col2:
+    columnas = st.selectbox("Columnas", options=[4, 6, 8, 10], index=1)
+with col3:
+    ventana = st.selectbox("Ventana", options=[15, 30, 60], index=1,
+                           format_func=lambda x: f"{x} minutos")
+with col4:
+    intervalo = st.selectbox("Actualizar cada", options=[5, 10, 20],
+                             format_func=lambda x: f"{x} segundos")
+
+
+def _con_cortes(valores: np.ndarray, grupos: np.ndarray) -> np.ndarray:
+    """Inserta NaN entre grupos consecutivos para que una sola traza dibuje curvas separadas."""
+    cortes = np.flatnonzero(grupos[1:] != grupos[:-1]) + 1
+    return np.insert(valores.astype(float), cortes, np.nan)
+
+
+def construir_figura_sala(df: pd.DataFrame, n_columnas: int) -> go.Figure:
+    """
+    Dibuja todos los mosaicos de pacientes en una única figura WebGL.
+
+    Cada paciente ocupa una celda de 1x1 en coordenadas de datos. Todas las
+    curvas de un mismo signo vital se concatenan en una sola traza separada
+    por huecos, así la figura tiene un número constante de trazas sin importar
+    cuántos pacientes haya. Las coordenadas se calculan de forma vectorizada.
+    """
+    pacientes = df.drop_duplicates("paciente_id")[["paciente_id", "nombre", "apellido_paterno", "motivo"]].reset_index(drop=True)
+    posicion = pd.Series(pacientes.index, index=pacientes["paciente_id"])
+    n_filas = max(1, -(-len(pacientes) // n_columnas))
+
+    lecturas = df.dropna(subset=["tipo_medicion"]).copy()
+    lecturas = lecturas[lecturas["tipo_medicion"].isin(VITALES_SALA)]
+    lecturas = lecturas.sort_values(["paciente_id", "tipo_medicion", "timestamp"])
+
+    fig = go.Figure()
+    ultimos = {}
+
+    if not lecturas.empty:
+        idx = lecturas["paciente_id"].map(posicion).to_numpy()
+        x0 = idx % n_columnas
+        y0 = -(idx // n_columnas) - 1
+
+        segundos = lecturas["timestamp"].astype("int64") / 1e9
+        por_paciente = segundos.groupby(lecturas["paciente_id"])
+        t_min = por_paciente.transform("min")
+        t_rango = (por_paciente.transform("max") - t_min).clip(lower=1.0)
+        lecturas["x"] = x0 + 0.05 + 0.9 * ((segundos - t_min) / t_rango).to_numpy()
+
+        esc_min = lecturas["tipo_medicion"].map(lambda t: ESCALAS[t]["min"])
+        esc_max = lecturas["tipo_medicion"].map(lambda t: ESCALAS[t]["max"])
+        norm = ((lecturas["valor"].clip(esc_min, esc_max) - esc_min) / (esc_max - esc_min)).to_numpy()
+        # Zona de la curva: parte inferior del mosaico
+        lecturas["y"] = (y0 + 0.08) + norm * 0.50
+
+        for tipo in VITALES_SALA:
+            serie = lecturas[lecturas["tipo_medicion"] == tipo]
+            if serie.empty:
+                continue
+            grupos = serie["paciente_id"].to_numpy()
+            fig.add_trace(go.Scattergl(
+                x=_con_cortes(serie["x"].to_numpy(), grupos),
+                y=_con_cortes(serie["y"].to_numpy(), grupos),
+                mode="lines", name=ESCALAS[tipo]["abrev"], hoverinfo="skip",
+                line=dict(color=ESCALAS[tipo]["color"], width=1.2),
+            ))
+
+        ultimos = lecturas.groupby(["paciente_id", "tipo_medicion"])["valor"].last().to_dict()
+
+    bordes = {estado: ([], []) for estado in COLORES_ESTADO}
+    nombres_x, nombres_y, nombres_txt = [], [], []
+    valores_x, valores_y, valores_txt = [], [], []
+    hover_x, hover_y, hover_txt = [], [], []
+
+    for i, pac in enumerate(pacientes.itertuples(index=False)):
+        x0 = i % n_columnas
+        y1 = -(i // n_columnas)
+        y0 = y1 - 1
+
+        estado_pac = None
+        resumen = []
+        for tipo in VITALES_SALA:
+            ultimo = ultimos.get((pac.paciente_id, tipo))
+            if ultimo is None:
+                continue
+            estado, _ = verificar_rango(tipo, float(ultimo))
+            if PRIORIDAD_ESTADO[estado] > PRIORIDAD_ESTADO[estado_pac]:
+                estado_pac = estado
+            resumen.append(f"{ESCALAS[tipo]['abrev']} {ultimo:.0f}")
+
+        # Borde del mosaico coloreado según el peor signo vital actual
+        bx, by = bordes[estado_pac]
+        bx.extend([x0 + 0.02, x0 + 0.98, x0 + 0.98, x0 + 0.02, x0 + 0.02, None])
+        by.extend([y0 + 0.02, y0 + 0.02, y1 - 0.02, y1 - 0.02, y0 + 0.02, None])
+
+        nombre = f"{pac.nombre} {pac.apellido_paterno}"
+        nombres_x.append(x0 + 0.06)
+        nombres_y.append(y1 - 0.14)
+        nombres_txt.append(f"<b>{nombre}</b>")
+
+        valores_x.append(x0 + 0.06)
+        valores_y.append(y1 - 0.30)
+        valores_txt.append(" · ".join(resumen) if resumen else "Sin lecturas recientes")
+
+        hover_x.append(x0 + 0.5)
+        hover_y.append(y0 + 0.5)
+        hover_txt.append(
+            f"<b>{nombre}</b><br>{pac.motivo or 'Sin motivo'}<br>"
+            + ("<br>".join(resumen) if resumen else "Sin lecturas recientes")
+        )
+
+    for estado, (bx, by) in bordes.items():
+        if bx:
+            fig.add_trace(go.Scattergl(
+                x=bx, y=by, mode="lines", hoverinfo="skip",
+                line=dict(color=COLORES_ESTADO[estado], width=2 if estado is None else 3),
+            ))
+
+    fig.add_trace(go.Scattergl(
+        x=nombres_x, y=nombres_y, mode="text", text=nombres_txt, hoverinfo="skip",
+        textposition="middle right", textfont=dict(size=11, color="#111827"),
+    ))
+    fig.add_trace(go.Scattergl(
+        x=valores_x, y=valores_y, mode="text", text=valores_txt, hoverinfo="skip",
+        textposition="middle right", textfont=dict(size=10, color="#4B5563"),
+    ))
+    fig.add_trace(go.Scattergl(
+        x=hover_x, y=hover_y, mode="markers", hovertext=hover_txt, hoverinfo="text",
+        marker=dict(size=40, opacity=0),
+    ))
+
+    fig.update_layout(
+        height=n_filas * ALTO_FILA_PX + 20,
+        margin=dict(l=0, r=0, t=10, b=10),
+        showlegend=False,
+        template="simple_white",
+        xaxis=dict(range=[0, n_columnas], visible=False, fixedrange=True),
+        yaxis=dict(range=[-n_filas, 0], visible=False, fixedrange=True),
+        uirevision="sala",
+    )
+    return fig
+
+
+# Intervalo adaptativo: se recalcula en cada refresco del fragmento y, si cambia,
+# se vuelve a ejecutar la página para reprogramar run_every
+visible = pestana_visible(key="visibilidad_sala")
+decision = calcular_intervalo(intervalo, visible=visible)
+st.session_state["sala_intervalo_actual"] = decision['intervalo']
+
+
+@st.fragment(run_every=decision['intervalo'])
+def mostrar_sala():
+    """Refresca solo la figura de la sala, sin volver a ejecutar toda la página."""
+    decision_actual = calcular_intervalo(intervalo, visible=visible)
+    if abs(decision_actual['intervalo'] - st.session_state["sala_intervalo_actual"]) >= 1:
+        st.rerun(scope="app")
+
+    df = obtener_vitales_sala(ventana_minutos=ventana)
+
+    if df.empty:
+        st.info("No hay monitoreos activos en este momento.")
+        return
+
+    if filtro:
+        nombres = df["nombre"] + " " + df["apellido_paterno"]
+        df = df[nombres.str.contains(filtro, case=False, na=False)]
+        if df.empty:
+            st.info("No se encontraron pacientes con ese nombre.")
+            return
+
+    total = df["paciente_id"].nunique()
+    st.caption(f"{total} pacientes en monitoreo — Última actualización: {datetime.now().strftime('%H:%M:%S')}")
+
+    st.plotly_chart(
+        construir_figura_sala(df, columnas),
+        use_container_width=True,
+        key="figura_sala",
+        config={"displayModeBar": False},
+    )
+
+    leyenda = " ".join(
+        f"<span style='color:{e['color']}; font-weight:600;'>■ {e['abrev']}</span>"
+        for e in ESCALAS.values()
+    )
+    st.markdown(f"<div style='font-size:0.8rem;'>{leyenda}</div>", unsafe_allow_html=True)
+
+    mostrar_diagnostico_refresco(decision_actual)
+
+
+mostrar_sala()
@@ -0,0 +1,207 @@
+import streamlit as st
+import pandas as pd
+from datetime import datetime
+from core.auth import require_auth
+from core.sidebar import render_sidebar
+from core.theme import apply_global_theme
+from core.db import obtener_metricas_pool, replica_configurada, retraso_replica, leer_de_replica
+from core.rendimiento import resumir_consultas, obtener_renders, reiniciar_metricas
+from utils import (breadcrumb_nav, obtener_estadisticas_limitador, obtener_estadisticas_escalamiento,
+                   obtener_metricas_entregas, reintentar_entregas_fallidas)
+
+# --- PROTECCIÓN DE RUTA ---
+require_auth(allowed_roles=['administrador'])
+render_sidebar()
+apply_global_theme()
+
+st.set_page_config(page_title="Rendimiento", page_icon="⏱️", layout="wide")
+breadcrumb_nav(["Home", "Administración", "Rendimiento"])
+
+st.title("Rendimiento")
+st.caption("Consultas SQL y renders de página registrados en este proceso del servidor.")
+st.markdown("---")
+
+# --- CONTROLES ---
+col1, col2, col3 = st.columns([1, 1, 1])
+with col1:
+    ventana = st.selectbox(
+        "Ventana", options=[300, 900, 3600, None],
+        format_func=lambda x: f"Últimos {x // 60} minutos" if x else "Todo el buffer",
+        index=1,
+    )
+with col2:
+    top_n = st.selectbox("Mostrar", options=[10, 25, 50], format_func=lambda x: f"Top {x}")
+with col3:
+    st.write("")
+    if st.button("Reiniciar métricas", use_container_width=True):
+        reiniciar_metricas()
+        st.rerun()
+
+consultas = pd.DataFrame(resumir_consultas(ventana))
+renders = pd.DataFrame(obtener_renders(ventana))
+
+# --- RESUMEN ---
+c1, c2, c3, c4 = st.columns(4)
+with c1:
+    st.metric("Sentencias", int(consultas["ejecuciones"].sum()) if not consultas.empty else 0)
+with c2:
+    st.metric("Renders", len(renders))
+with c3:
+    st.metric("Consultas por render", f"{renders['consultas'].mean():.1f}" if not renders.empty else "N/A")
+with c4:
+    if not renders.empty and renders["total"].sum() > 0:
+        # Tiempo de pared: las consultas concurrentes solapadas cuentan una vez
+        sql_pared = (renders['sql'] - renders['solapado']).sum()
+        st.metric("Tiempo en SQL", f"{sql_pared / renders['total'].sum():.0%}")
+    else:
+        st.metric("Tiempo en SQL", "N/A")
+
+# Solo se construye la sección seleccionada (st.tabs ejecuta y envía todas)
+vista = st.radio(
+    "Sección", options=["Más lentas", "Más frecuentes", "Por página", "Pool de conexiones", "Servicios"],
+    horizontal=True, label_visibility="collapsed", key="vista_rendimiento"
+)
+
+
+def tabla_consultas(df: pd.DataFrame, orden: str):
+    """Muestra las N sentencias con mayor valor en la columna indicada."""
+    if df.empty:
+        st.info("No hay consultas registradas en la ventana seleccionada.")
+        return
+    df = df.sort_values(orden, ascending=False).head(top_n).copy()
+    for col in ("total", "promedio", "p95", "maximo"):
+        df[col] = df[col] * 1000
+    df["origenes"] = df["origenes"].apply(lambda o: ", ".join(sorted(o)))
+    st.dataframe(
+        df[["sql", "ejecuciones", "promedio", "p95", "maximo", "total", "filas", "origenes"]],
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "sql": st.column_config.TextColumn("Sentencia", width="large"),
+            "ejecuciones": st.column_config.NumberColumn("Ejecuciones"),
+            "promedio": st.column_config.NumberColumn("Promedio (ms)", format="%.1f"),
+            "p95": st.column_config.NumberColumn("p95 (ms)", format="%.1f"),
+            "maximo": st.column_config.NumberColumn("Máximo (ms)", format="%.1f"),
+            "total": st.column_config.NumberColumn("Total (ms)", format="%.0f"),
+            "filas": st.column_config.NumberColumn("Filas (prom.)", format="%.1f"),
+            "origenes": st.column_config.TextColumn("Origen"),
+        },
+    )
+
+
+# ==================== MÁS LENTAS ====================
+if vista == "Más lentas":
+    st.subheader("Sentencias más lentas (p95)")
+    tabla_consultas(consultas, "p95")
+
+# ==================== MÁS FRECUENTES ====================
+elif vista == "Más frecuentes":
+    st.subheader("Sentencias más frecuentes")
+    tabla_consultas(consultas, "ejecuciones")
+
+# ==================== POR PÁGINA ====================
+elif vista == "Por página":
+    st.subheader("Consultas y tiempo por render de página")
+    if renders.empty:
+        st.info("No hay renders registrados en la ventana seleccionada.")
+    else:
+        por_pagina = renders.groupby("pagina").agg(
+            renders=("total", "size"),
+            consultas=("consultas", "mean"),
+            consultas_max=("consultas", "max"),
+            sql=("sql", "mean"),
+            solapado=("solapado", "mean"),
+            lotes=("lotes", "mean"),
+            python=("python", "mean"),
+            total=("total", "mean"),
+        ).reset_index().sort_values("total", ascending=False)
+        for col in ("sql", "solapado", "python", "total"):
+            por_pagina[col] = por_pagina[col] * 1000
+        st.dataframe(
+            por_pagina,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "pagina": st.column_config.TextColumn("Página"),
+                "renders": st.column_config.NumberColumn("Renders"),
+                "consultas": st.column_config.NumberColumn("Consultas (prom.)", format="%.1f"),
+                "consultas_max": st.column_config.NumberColumn("Consultas (máx.)"),
+                "sql": st.column_config.NumberColumn("SQL (ms)", format="%.0f"),
+                "solapado": st.column_config.NumberColumn("SQL en paralelo (ms)", format="%.0f"),
+                "lotes": st.column_config.NumberColumn("Lotes concurrentes", format="%.1f"),
+                "python": st.column_config.NumberColumn("Python (ms)", format="%.0f"),
+                "total": st.column_config.NumberColumn("Total (ms)", format="%.0f"),
+            },
+        )
+        st.caption("El render termina al finalizar el script de la página; incluye el envío de elementos al navegador. "
+                   "SQL es la suma de duraciones; la parte en paralelo (ejecutar_concurrente) no suma al total de la página.")
+
+# ==================== POOL DE CONEXIONES ====================
+elif vista == "Pool de conexiones":
+    st.subheader("Pools de conexiones")
+    try:
+        pools = obtener_metricas_pool()
+    except Exception as e:
+        st.error(f"Error obteniendo métricas del pool: {str(e)}")
+        pools = {}
+    for nombre, pool in pools.items():
+        st.markdown(f"**{nombre.capitalize()}**")
+        c1, c2, c3, c4, c5 = st.columns(5)
+        with c1:
+            st.metric("En uso", f"{pool['en_uso']} / {pool['capacidad']}")
+        with c2:
+            st.metric("Overflow", pool['overflow'])
+        with c3:
+            st.metric("Espera p50", f"{pool['espera_p50_ms']:.1f} ms" if pool['espera_p50_ms'] is not None else "N/A")
+        with c4:
+            st.metric("Espera p95", f"{pool['espera_p95_ms']:.1f} ms" if pool['espera_p95_ms'] is not None else "N/A")
+        with c5:
+            st.metric("Sin conexión (timeout)", pool['agotados'])
+        st.caption(f"Checkouts: {pool['checkouts']} — Disponibles: {pool['disponibles']} — "
+                   f"Espera máxima: {pool['espera_max_ms'] or 0:.1f} ms")
+    if replica_configurada():
+        retraso = retraso_replica()
+        st.caption(f"Réplica de lectura: {'sin respuesta' if retraso is None else f'{retraso:.1f} s de retraso'} — "
+                   f"las lecturas {'van a la réplica' if leer_de_replica() else 'van a la primaria'} en esta sesión")
+
+# ==================== SERVICIOS ====================
+elif vista == "Servicios":
+    st.subheader("Escalamiento de alertas")
+    escalamiento = obtener_estadisticas_escalamiento()
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        st.metric("Alertas con temporizador", escalamiento['pendientes'])
+    with c2:
+        st.metric("Niveles aplicados", escalamiento['escaladas'])
+    with c3:
+        proximo = escalamiento['proximo']
+        st.metric("Próximo vencimiento", proximo.strftime('%H:%M:%S') if proximo else "N/A")
+
+    st.subheader("Limitador de alertas")
+    limitador = obtener_estadisticas_limitador()
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        st.metric("Permitidas", limitador['permitidos'])
+    with c2:
+        st.metric("Suprimidas", limitador['suprimidos'])
+    with c3:
+        st.metric("Claves activas", limitador['claves'])
+    if limitador['mas_suprimidas']:
+        st.dataframe(
+            pd.DataFrame(limitador['mas_suprimidas'], columns=["Clave", "Suprimidas"]).astype({"Clave": str}),
+            use_container_width=True, hide_index=True,
+        )
+
+    st.subheader("Entregas de notificaciones (últimos 15 minutos)")
+    entregas = obtener_metricas_entregas()
+    if entregas:
+        st.dataframe(pd.DataFrame(entregas), use_container_width=True, hide_index=True)
+        fallidas = sum(fila['fallidas'] for fila in entregas)
+        if fallidas and st.button(f"Reintentar {fallidas} entregas fallidas"):
+            reencoladas = reintentar_entregas_fallidas()
+            if reencoladas:
+                st.success(f"{reencoladas} entregas devueltas a la cola")
+    else:
+        st.caption("Sin datos de entregas.")
+
+st.caption(f"Última actualización: {datetime.now().strftime('%H:%M:%S')}")
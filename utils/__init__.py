@@ -21,8 +21,19 @@ from .alerta_generator import (
     verificar_rango,
     crear_alerta_si_necesario,
     crear_alerta_directa,
+    alerta_permitida,
+    LIMITES_ALERTAS,
     obtener_alertas_no_leidas,
+    obtener_pagina_alertas,
+    contar_alertas_por_categoria,
+    severidad_alerta,
+    SEVERIDAD_CRITICA,
+    SEVERIDAD_ADVERTENCIA,
+    SEVERIDAD_INFORMATIVA,
+    CATEGORIAS_SEVERIDAD,
     marcar_alerta_leida,
+    marcar_alertas_leidas,
+    marcar_alertas_leidas_rango,
     marcar_alertas_leidas_paciente,
 )
 
@@ -36,14 +47,89 @@ from .simulador import (
 
 from .notificaciones import (
     crear_notificacion,
+    distribuir_notificaciones,
+    ROLES_FANOUT_LECTURA,
     obtener_notificaciones_pendientes,
     obtener_historial_notificaciones,
     obtener_estadisticas_notificaciones,
     marcar_notificacion_leida,
+    marcar_notificaciones_leidas,
     marcar_todas_leidas,
     contar_notificaciones_pendientes,
     mostrar_panel_notificaciones,
     mostrar_indicador_notificaciones,
+    obtener_resumen_notificaciones,
+    invalidar_notificaciones,
+)
+
+from .monitoreos import (
+    obtener_vitales_sala,
+    obtener_roster_activo,
+    invalidar_roster,
+    VITALES_SALA,
+)
+
+from .pacientes import (
+    obtener_resumen_pacientes,
+    obtener_mediciones_paciente,
+)
+
+from .detalles import (
+    obtener_detalle_paciente,
+    obtener_detalle_medico,
+    obtener_detalle_dispositivo,
+    obtener_metricas_panel,
+)
+
+from .eventos import (
+    suscribir_cambios,
+    iniciar_escucha_cambios,
+    CANAL_CAMBIOS,
+)
+
+from .acceso import (
+    obtener_pacientes_permitidos,
+    filtro_acceso,
+    invalidar_mapa_acceso,
+)
+
+from .graficas import (
+    crear_traza,
+    usar_webgl,
+    reducir_puntos,
+    obtener_figura,
+    actualizar_trazas,
+    UMBRAL_WEBGL,
+)
+
+from .stream_vitales import mostrar_flujo_vitales
+
+from .visibilidad import pestana_visible
+
+from .escalamiento import (
+    NIVELES_ESCALAMIENTO,
+    iniciar_escalamiento,
+    programar_escalamiento,
+    obtener_estadisticas_escalamiento,
+)
+
+from .entregas import (
+    CANALES_ENTREGA,
+    obtener_metricas_entregas,
+    reintentar_entregas_fallidas,
+)
+
+from .limitador import (
+    consumir,
+    obtener_estadisticas_limitador,
+    reiniciar_limitador,
+)
+
+from .refresco import (
+    calcular_intervalo,
+    obtener_saturacion_pool,
+    contar_alertas_recientes,
+    mostrar_diagnostico_refresco,
 )
 
 __all__ = [
@@ -64,8 +150,19 @@ __all__ = [
     'verificar_rango',
     'crear_alerta_si_necesario',
     'crear_alerta_directa',
+    'alerta_permitida',
+    'LIMITES_ALERTAS',
     'obtener_alertas_no_leidas',
+    'obtener_pagina_alertas',
+    'contar_alertas_por_categoria',
+    'severidad_alerta',
+    'SEVERIDAD_CRITICA',
+    'SEVERIDAD_ADVERTENCIA',
+    'SEVERIDAD_INFORMATIVA',
+    'CATEGORIAS_SEVERIDAD',
     'marcar_alerta_leida',
+    'marcar_alertas_leidas',
+    'marcar_alertas_leidas_rango',
     'marcar_alertas_leidas_paciente',
     # Simulador
     'generar_medicion_anomala',
@@ -75,12 +172,66 @@ __all__ = [
     'TIPOS_EVENTOS',
     # Notificaciones
     'crear_notificacion',
+    'distribuir_notificaciones',
+    'ROLES_FANOUT_LECTURA',
     'obtener_notificaciones_pendientes',
     'obtener_historial_notificaciones',
     'obtener_estadisticas_notificaciones',
     'marcar_notificacion_leida',
+    'marcar_notificaciones_leidas',
     'marcar_todas_leidas',
     'contar_notificaciones_pendientes',
     'mostrar_panel_notificaciones',
     'mostrar_indicador_notificaciones',
+    'obtener_resumen_notificaciones',
+    'invalidar_notificaciones',
+    # Monitoreos
+    'obtener_vitales_sala',
+    'obtener_roster_activo',
+    'invalidar_roster',
+    'VITALES_SALA',
+    # Pacientes
+    'obtener_resumen_pacientes',
+    'obtener_mediciones_paciente',
+    # Detalles
+    'obtener_detalle_paciente',
+    'obtener_detalle_medico',
+    'obtener_detalle_dispositivo',
+    'obtener_metricas_panel',
+    # Eventos
+    'suscribir_cambios',
+    'iniciar_escucha_cambios',
+    'CANAL_CAMBIOS',
+    # Acceso
+    'obtener_pacientes_permitidos',
+    'filtro_acceso',
+    'invalidar_mapa_acceso',
+    # Gráficas
+    'crear_traza',
+    'usar_webgl',
+    'reducir_puntos',
+    'obtener_figura',
+    'actualizar_trazas',
+    'UMBRAL_WEBGL',
+    # Streaming
+    'mostrar_flujo_vitales',
+    'pestana_visible',
+    # Escalamiento
+    'NIVELES_ESCALAMIENTO',
+    'iniciar_escalamiento',
+    'programar_escalamiento',
+    'obtener_estadisticas_escalamiento',
+    # Entregas
+    'CANALES_ENTREGA',
+    'obtener_metricas_entregas',
+    'reintentar_entregas_fallidas',
+    # Limitador
+    'consumir',
+    'obtener_estadisticas_limitador',
+    'reiniciar_limitador',
+    # Refresco adaptativo
+    'calcular_intervalo',
+    'obtener_saturacion_pool',
+    'contar_alertas_recientes',
+    'mostrar_diagnostico_refresco',
 ]
@@ -0,0 +1,98 @@
+"""
+Mapa de acceso por rol: qué pacientes puede ver cada usuario.
+Se carga una vez por proceso y se invalida cuando cambian las asignaciones
+(pacientes_medicos, personal_medico, pacientes), de modo que las consultas
+de alertas y pacientes filtran con paciente_id = ANY(:pacientes) sin unir
+las tablas de asignación en cada lectura.
+"""
+
+import streamlit as st
+from typing import Dict, List, Optional
+from core.db import Consulta, consultar
+from .eventos import suscribir_cambios, iniciar_escucha_cambios
+
+_MAPA_ACCESO = Consulta("acceso_mapa", """
+    SELECT 'medico' AS rol, pmed.usuario_id,
+           COALESCE(array_agg(pm.paciente_id ORDER BY pm.paciente_id)
+                    FILTER (WHERE pm.paciente_id IS NOT NULL), '{}') AS pacientes
+    FROM public.personal_medico pmed
+    LEFT JOIN public.pacientes_medicos pm ON pm.medico_id = pmed.id
+    WHERE pmed.usuario_id IS NOT NULL
+    GROUP BY pmed.usuario_id, pmed.id
+    UNION ALL
+    SELECT 'paciente', p.usuario_id, array_agg(p.id ORDER BY p.id)
+    FROM public.pacientes p
+    WHERE p.usuario_id IS NOT NULL
+    GROUP BY p.usuario_id
+""")
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _cargar_mapa_acceso() -> Dict[str, Dict[int, Dict]]:
+    """Consulta el mapa completo; se comparte entre sesiones hasta invalidarse."""
+    mapa = {"medico": {}, "paciente": {}}
+    for fila in consultar(_MAPA_ACCESO):
+        mapa[fila["rol"]][fila["usuario_id"]] = {"pacientes": tuple(fila["pacientes"])}
+    return mapa
+
+
+def _entrada_acceso(usuario_id: int, rol: str) -> Optional[Dict]:
+    """Entrada del mapa para el usuario (None si no tiene ninguna)."""
+    try:
+        iniciar_escucha_cambios()
+    except Exception:
+        # Sin LISTEN/NOTIFY el mapa se invalida solo con las escrituras locales y el TTL
+        pass
+    return _cargar_mapa_acceso().get(rol, {}).get(usuario_id)
+
+
+def obtener_pacientes_permitidos(usuario_id: int, rol: str) -> Optional[List[int]]:
+    """
+    Obtiene los pacientes que el usuario puede ver.
+
+    Args:
+        usuario_id: ID del usuario
+        rol: Rol del usuario ('administrador', 'medico', 'paciente')
+
+    Returns:
+        None si el rol no tiene restricción (administrador); en otro caso la
+        lista de IDs de pacientes (vacía si no tiene asignados o hay error)
+    """
+    if rol == "administrador":
+        return None
+    try:
+        entrada = _entrada_acceso(usuario_id, rol)
+    except Exception as e:
+        st.error(f"Error obteniendo pacientes asignados: {str(e)}")
+        return []
+    return list(entrada["pacientes"]) if entrada else []
+
+
+# Condición de filtro_acceso para los roles limitados a sus pacientes
+FILTRO_PACIENTES = "{columna} = ANY(:pacientes)"
+
+
+def filtro_acceso(usuario_id: int, rol: str, columna: str = "a.paciente_id") -> tuple:
+    """
+    Condición SQL y parámetros que limitan una consulta a los pacientes visibles.
+
+    Args:
+        usuario_id: ID del usuario
+        rol: Rol del usuario
+        columna: Columna con el ID del paciente en la consulta
+
+    Returns:
+        Tupla (condición, parámetros); la condición usa el parámetro :pacientes
+    """
+    pacientes = obtener_pacientes_permitidos(usuario_id, rol)
+    if pacientes is None:
+        return "true", {}
+    return FILTRO_PACIENTES.format(columna=columna), {"pacientes": pacientes}
+
+
+def invalidar_mapa_acceso():
+    """Descarta el mapa cacheado para que la siguiente lectura consulte la base de datos."""
+    _cargar_mapa_acceso.clear()
+
+
+suscribir_cambios(("pacientes_medicos", "personal_medico", "pacientes"), invalidar_mapa_acceso)
@@ -3,10 +3,33 @@ Generador automático de alertas basado en rangos clínicos.
 Verifica mediciones contra umbrales y crea alertas automáticamente.
 """
 
+import re
+import threading
+import time
 import streamlit as st
-from sqlalchemy import text
-from datetime import datetime
-from typing import Optional, Dict, Tuple
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Tuple, List
+from core.db import Consulta, sesion, consultar, consultar_uno, consultar_valor, ejecutar
+from .notificaciones import distribuir_notificaciones, invalidar_notificaciones
+from .limitador import consumir
+from .acceso import FILTRO_PACIENTES, filtro_acceso
+from .escalamiento import programar_escalamiento
+
+# Severidad de la alerta (alertas.severidad), calculada al crearla
+SEVERIDAD_INFORMATIVA = 1
+SEVERIDAD_ADVERTENCIA = 2
+SEVERIDAD_CRITICA = 3
+
+CATEGORIAS_SEVERIDAD = {
+    SEVERIDAD_CRITICA: "critica",
+    SEVERIDAD_ADVERTENCIA: "advertencia",
+    SEVERIDAD_INFORMATIVA: "informativa",
+}
+
+# Patrones de tipo_alerta (con o sin acento); deben coincidir con el backfill
+# de db/migrations/005_severidad_alertas.sql
+_PATRON_CRITICA = "cr[ií]tica|paro|arritmia"
+_PATRON_ADVERTENCIA = "advertencia|elevada|baja"
 
 # Rangos clínicos normales y críticos
 CLINICAL_RANGES = {
@@ -85,17 +108,384 @@ def verificar_rango(
     return None, None
 
 
-def crear_alerta_si_necesario(medicion_id: int, tipo_medicion: str, valor: float) -> bool:
+def severidad_alerta(tipo_alerta: str) -> int:
+    """
+    Calcula el código de severidad de un tipo de alerta.
+    
+    Args:
+        tipo_alerta: Texto del tipo de alerta (ej: 'crítica', 'advertencia')
+    
+    Returns:
+        SEVERIDAD_CRITICA, SEVERIDAD_ADVERTENCIA o SEVERIDAD_INFORMATIVA
+    """
+    tipo = str(tipo_alerta or "")
+    if re.search(_PATRON_CRITICA, tipo, re.IGNORECASE):
+        return SEVERIDAD_CRITICA
+    if re.search(_PATRON_ADVERTENCIA, tipo, re.IGNORECASE):
+        return SEVERIDAD_ADVERTENCIA
+    return SEVERIDAD_INFORMATIVA
+
+
+# Límite de alertas por (paciente, signo vital, severidad): ráfaga permitida,
+# recarga por minuto y segundos de supresión tras agotar la ráfaga.
+# Solo limita la apertura de episodios nuevos (alerta y notificaciones); las
+# lecturas que extienden un episodio abierto nunca se suprimen (ver utils/limitador.py)
+LIMITES_ALERTAS = {
+    SEVERIDAD_CRITICA: {"rafaga": 6, "por_minuto": 2, "supresion_segundos": 60},
+    SEVERIDAD_ADVERTENCIA: {"rafaga": 3, "por_minuto": 1, "supresion_segundos": 120},
+    SEVERIDAD_INFORMATIVA: {"rafaga": 2, "por_minuto": 0.5, "supresion_segundos": 300},
+}
+
+
+def alerta_permitida(paciente_id: int, tipo_medicion: str, severidad: int) -> bool:
+    """
+    Aplica LIMITES_ALERTAS a una alerta nueva antes de escribirla.
+    
+    Args:
+        paciente_id: ID del paciente
+        tipo_medicion: Signo vital
+        severidad: Código de severidad
+    
+    Returns:
+        True si la alerta puede registrarse, False si se suprime
+    """
+    limite = LIMITES_ALERTAS.get(severidad)
+    if limite is None:
+        return True
+    return consumir(
+        ("alerta", paciente_id, tipo_medicion, severidad),
+        capacidad=limite["rafaga"],
+        recarga_por_segundo=limite["por_minuto"] / 60,
+        ventana_supresion=limite["supresion_segundos"],
+    )
+
+
+# Episodios: las lecturas anormales del mismo paciente y signo vital se agrupan
+# en una sola alerta mientras no pase este tiempo sin lecturas anormales
+EPISODIO_SILENCIO_MINUTOS = 5
+
+# Las lecturas que extienden un episodio abierto conocido por el proceso se
+# cuentan en memoria y se vuelcan a la BD en lotes: al acumular este número
+# de lecturas o al pasar estos segundos desde el último volcado
+_VOLCAR_LECTURAS = 20
+_VOLCAR_SEGUNDOS = 30
+
+# Sentencias de la ingesta (una ejecución de cada una por lectura anormal)
+_LECTURA_MEDICION = Consulta("episodio_lectura_medicion", """
+    SELECT d.paciente_id, m.tipo_medicion, m.valor, COALESCE(m.timestamp, NOW()) AS timestamp
+    FROM public.mediciones m
+    JOIN public.dispositivos d ON m.dispositivo_id = d.id
+    WHERE m.id = :medicion_id
+""", preparada=True)
+
+_BLOQUEAR_EPISODIO = Consulta("episodio_bloquear", """
+    SELECT pg_advisory_xact_lock(:paciente_id, hashtext(:tipo_medicion))
+""")
+
+_CERRAR_EPISODIO = Consulta("episodio_cerrar", """
+    UPDATE public.alertas_episodios
+    SET abierto = false, fecha_cierre = NOW()
+    WHERE paciente_id = :paciente_id
+      AND tipo_medicion = :tipo_medicion
+      AND abierto = true
+      AND (ultima_lectura < :timestamp - make_interval(mins => :silencio)
+           OR severidad < :severidad)
+""")
+
+_EXTENDER_EPISODIO = Consulta("episodio_extender", """
+    UPDATE public.alertas_episodios
+    SET ultima_lectura = GREATEST(ultima_lectura, :timestamp),
+        lecturas = lecturas + 1,
+        valor_pico = CASE
+            WHEN ABS(CAST(:valor AS NUMERIC) - :centro) > ABS(valor_pico - :centro)
+            THEN CAST(:valor AS NUMERIC)
+            ELSE valor_pico
+        END
+    WHERE paciente_id = :paciente_id
+      AND tipo_medicion = :tipo_medicion
+      AND abierto = true
+    RETURNING alerta_id, severidad
+""")
+
+# Lecturas acumuladas en memoria (ver _absorber_lectura)
+_VOLCAR_EPISODIO = Consulta("episodio_volcar", """
+    UPDATE public.alertas_episodios
+    SET ultima_lectura = GREATEST(ultima_lectura, :ultima_lectura),
+        lecturas = lecturas + :lecturas,
+        valor_pico = CASE
+            WHEN ABS(CAST(:valor_pico AS NUMERIC) - :centro) > ABS(valor_pico - :centro)
+            THEN CAST(:valor_pico AS NUMERIC)
+            ELSE valor_pico
+        END
+    WHERE alerta_id = :alerta_id
+    RETURNING abierto
+""")
+
+_CERRAR_EPISODIOS_INACTIVOS = Consulta("episodio_cerrar_inactivos", """
+    UPDATE public.alertas_episodios
+    SET abierto = false, fecha_cierre = NOW()
+    WHERE abierto = true
+      AND ultima_lectura < NOW() - make_interval(mins => :silencio)
+""")
+
+_INSERTAR_ALERTA = Consulta("alerta_insertar", """
+    INSERT INTO public.alertas
+    (medicion_id, paciente_id, tipo_alerta, severidad, mensaje, leida)
+    VALUES (:medicion_id, :paciente_id, :tipo_alerta, :severidad, :mensaje, false)
+    RETURNING id
+""")
+
+_INSERTAR_EPISODIO = Consulta("episodio_insertar", """
+    INSERT INTO public.alertas_episodios
+    (alerta_id, paciente_id, tipo_medicion, severidad, inicio, ultima_lectura, valor_pico)
+    VALUES (:alerta_id, :paciente_id, :tipo_medicion, :severidad, :timestamp, :timestamp, :valor)
+""")
+
+
+def _centro_normal(tipo_medicion: str) -> float:
+    """Centro del rango normal: el valor pico es la lectura más alejada de él."""
+    normal = CLINICAL_RANGES.get(tipo_medicion, {}).get("normal", (0, 0))
+    return (normal[0] + normal[1]) / 2
+
+
+@st.cache_resource(show_spinner=False)
+def _estado_episodios() -> Dict:
+    """Episodios abiertos por (paciente, signo vital), compartidos por todas las sesiones del proceso."""
+    return {'lock': threading.Lock(), 'abiertos': {}}
+
+
+def _absorber_lectura(
+    paciente_id: int, tipo_medicion: str, severidad: int, valor: float, timestamp: datetime
+) -> bool:
+    """
+    Cuenta en memoria una lectura que extiende un episodio abierto conocido
+    por el proceso, sin tocar la BD (se vuelca después con _volcar_episodios).
+
+    Returns:
+        True si la lectura quedó absorbida; False si hay que pasar por la BD
+        (episodio desconocido, silencio superado o severidad mayor)
+    """
+    estado = _estado_episodios()
+    with estado['lock']:
+        episodio = estado['abiertos'].get((paciente_id, tipo_medicion))
+        if (episodio is None or severidad > episodio['severidad']
+                or timestamp - episodio['ultima_lectura'] > timedelta(minutes=EPISODIO_SILENCIO_MINUTOS)):
+            return False
+        episodio['lecturas'] += 1
+        episodio['ultima_lectura'] = max(episodio['ultima_lectura'], timestamp)
+        if abs(valor - episodio['centro']) > abs(episodio['valor_pico'] - episodio['centro']):
+            episodio['valor_pico'] = valor
+        episodio['visto'] = time.monotonic()
+        return True
+
+
+def _recordar_episodio(
+    paciente_id: int, tipo_medicion: str, alerta_id: Optional[int], severidad: int,
+    valor: float, timestamp: datetime,
+):
+    """Registra el episodio al que fue la lectura (o lo olvida si no hay ninguno abierto)."""
+    estado = _estado_episodios()
+    clave = (paciente_id, tipo_medicion)
+    with estado['lock']:
+        if alerta_id is None:
+            estado['abiertos'].pop(clave, None)
+            return
+        ahora = time.monotonic()
+        estado['abiertos'][clave] = {
+            'alerta_id': alerta_id, 'severidad': severidad, 'centro': _centro_normal(tipo_medicion),
+            'lecturas': 0, 'valor_pico': valor, 'ultima_lectura': timestamp,
+            'volcado': ahora, 'visto': ahora,
+        }
+
+
+def _tomar_pendientes(clave: Optional[Tuple[int, str]] = None) -> List[Tuple[Tuple[int, str], Dict]]:
+    """
+    Saca los contadores en memoria que toca volcar: los que llegaron a
+    _VOLCAR_LECTURAS o _VOLCAR_SEGUNDOS, y todos los de 'clave'. Descarta los
+    episodios sin lecturas pendientes que ya superaron el silencio.
+    """
+    estado = _estado_episodios()
+    ahora = time.monotonic()
+    pendientes = []
+    with estado['lock']:
+        abiertos = estado['abiertos']
+        for clave_episodio, episodio in list(abiertos.items()):
+            if episodio['lecturas'] and (clave_episodio == clave
+                                         or episodio['lecturas'] >= _VOLCAR_LECTURAS
+                                         or ahora - episodio['volcado'] >= _VOLCAR_SEGUNDOS):
+                pendientes.append((clave_episodio, {
+                    'alerta_id': episodio['alerta_id'],
+                    'lecturas': episodio['lecturas'],
+                    'valor_pico': episodio['valor_pico'],
+                    'ultima_lectura': episodio['ultima_lectura'],
+                    'centro': episodio['centro'],
+                }))
+                episodio['lecturas'] = 0
+                episodio['volcado'] = ahora
+            elif not episodio['lecturas'] and ahora - episodio['visto'] > EPISODIO_SILENCIO_MINUTOS * 60:
+                del abiertos[clave_episodio]
+    return pendientes
+
+
+def _volcar_episodios(session=None, clave: Optional[Tuple[int, str]] = None):
+    """
+    Escribe en alertas_episodios las lecturas acumuladas en memoria: una
+    sentencia por episodio y lote, no por lectura.
+
+    Args:
+        session: Sesión abierta (el llamador hace commit); None abre una propia
+        clave: (paciente_id, tipo_medicion) que se vuelca aunque no le toque
+    """
+    pendientes = _tomar_pendientes(clave)
+    if not pendientes:
+        return
+    cerrados = []
+    with sesion(session) as s:
+        for clave_episodio, params in pendientes:
+            if not consultar_valor(_VOLCAR_EPISODIO, params, session=s):
+                cerrados.append((clave_episodio, params['alerta_id']))
+    # Cerrado en otro proceso (silencio o escalada): la próxima lectura pasa por la BD
+    estado = _estado_episodios()
+    with estado['lock']:
+        for clave_episodio, alerta_id in cerrados:
+            episodio = estado['abiertos'].get(clave_episodio)
+            if episodio is not None and episodio['alerta_id'] == alerta_id:
+                del estado['abiertos'][clave_episodio]
+
+
+def _registrar_en_episodio(s, medicion_id: int, tipo_alerta: str, mensaje: str) -> Tuple[Optional[int], bool, int]:
     """
-    Verifica si una medición debe generar alerta y la crea en BD.
+    Agrega una lectura anormal al episodio abierto de su paciente y signo vital,
+    o abre uno nuevo (con su alerta) si no hay episodio abierto.
+    
+    Un episodio se cierra cuando su última lectura anormal tiene más de
+    EPISODIO_SILENCIO_MINUTOS, o cuando llega una lectura de mayor severidad
+    (la escalada abre un episodio nuevo para que se vuelva a notificar).
+    
+    El limitador (alerta_permitida) solo se consulta para abrir un episodio:
+    extender uno abierto siempre cuenta la lectura y su valor pico.
+    
+    Args:
+        s: Sesión abierta (el llamador hace commit)
+        medicion_id: ID de la medición anormal
+        tipo_alerta: 'advertencia' | 'crítica'
+        mensaje: Mensaje de la alerta si se abre un episodio
+    
+    Returns:
+        Tupla (alerta_id del episodio, True si se creó la alerta, severidad
+        del episodio); alerta_id None si la medición no existe o la alerta
+        nueva se suprimió por el limitador
+    """
+    severidad = severidad_alerta(tipo_alerta)
+    lectura = consultar_uno(_LECTURA_MEDICION, {"medicion_id": medicion_id}, session=s)
+    if lectura is None:
+        return None, False, severidad
+    
+    params = {
+        **lectura,
+        "centro": _centro_normal(lectura["tipo_medicion"]),
+        "severidad": severidad,
+        "silencio": EPISODIO_SILENCIO_MINUTOS,
+    }
+    
+    # Serializa las lecturas del mismo paciente y signo vital
+    consultar_valor(_BLOQUEAR_EPISODIO, params, session=s)
+    
+    ejecutar(_CERRAR_EPISODIO, params, session=s)
+    
+    extendido = consultar_uno(_EXTENDER_EPISODIO, params, session=s)
+    if extendido:
+        return extendido["alerta_id"], False, extendido["severidad"]
+    
+    if not alerta_permitida(params["paciente_id"], params["tipo_medicion"], severidad):
+        return None, False, severidad  # Ráfaga suprimida
+    
+    # Al abrir un episodio (poco frecuente) se cierran también los inactivos de otros pacientes
+    ejecutar(_CERRAR_EPISODIOS_INACTIVOS, params, session=s)
+    
+    alerta_id = consultar_valor(_INSERTAR_ALERTA, {
+        "medicion_id": medicion_id,
+        "paciente_id": params["paciente_id"],
+        "tipo_alerta": tipo_alerta,
+        "severidad": severidad,
+        "mensaje": mensaje,
+    }, session=s)
+    
+    ejecutar(_INSERTAR_EPISODIO, {**params, "alerta_id": alerta_id}, session=s)
+    
+    return alerta_id, True, severidad
+
+
+def _registrar_lectura_anormal(
+    medicion_id: int,
+    paciente_id: int,
+    tipo_medicion: str,
+    valor: float,
+    tipo_alerta: str,
+    mensaje: str,
+    distribuir: bool,
+    timestamp: Optional[datetime],
+) -> Tuple[Optional[int], bool]:
+    """
+    Registra una lectura anormal: en memoria si extiende un episodio abierto
+    conocido por el proceso, en la BD en otro caso.
+    
+    Durante una ráfaga solo la primera lectura abre una sesión; las demás
+    cuestan una operación en memoria y se vuelcan en lotes.
+    
+    Returns:
+        Tupla (alerta_id del episodio, True si se creó la alerta); alerta_id
+        None si la lectura quedó absorbida en memoria o se suprimió
+    """
+    severidad = severidad_alerta(tipo_alerta)
+    timestamp = timestamp or datetime.now()
+    if _absorber_lectura(paciente_id, tipo_medicion, severidad, valor, timestamp):
+        _volcar_episodios()
+        return None, False
+    
+    with sesion() as s:
+        # Lo pendiente de este episodio se escribe antes de cerrarlo o escalarlo
+        _volcar_episodios(s, (paciente_id, tipo_medicion))
+        alerta_id, nueva, severidad_episodio = _registrar_en_episodio(s, medicion_id, tipo_alerta, mensaje)
+        
+        # Notificar a los médicos asignados en la misma transacción
+        usuarios = []
+        if nueva and distribuir:
+            usuarios = distribuir_notificaciones([alerta_id], session=s)
+        
+        s.commit()
+    
+    _recordar_episodio(paciente_id, tipo_medicion, alerta_id, severidad_episodio, valor, timestamp)
+    if nueva:
+        invalidar_notificaciones(usuarios, nuevas_alertas=True)
+        if severidad == SEVERIDAD_CRITICA:
+            programar_escalamiento(alerta_id)
+    return alerta_id, nueva
+
+
+def crear_alerta_si_necesario(
+    medicion_id: int,
+    tipo_medicion: str,
+    valor: float,
+    paciente_id: int,
+    timestamp: Optional[datetime] = None,
+) -> bool:
+    """
+    Verifica si una medición debe generar alerta y la registra en BD.
+    
+    Si ya hay un episodio abierto para el paciente y signo vital, la lectura
+    solo lo extiende (sin nueva alerta ni notificaciones).
     
     Args:
         medicion_id: ID de la medición
         tipo_medicion: Tipo de medición
         valor: Valor de la medición
+        paciente_id: ID del paciente (agrupa la lectura sin consultar la BD)
+        timestamp: Momento de la medición (default: ahora)
     
     Returns:
-        True si se creó alerta, False si está normal
+        True si se creó alerta (episodio nuevo), False si está normal, se
+        extendió un episodio o se suprimió por el limitador
     """
     try:
         tipo_alerta, mensaje = verificar_rango(tipo_medicion, valor)
@@ -103,31 +493,10 @@ def crear_alerta_si_necesario(medicion_id: int, tipo_medicion: str, valor: float
         if tipo_alerta is None:
             return False  # Está normal
         
-        # Crear alerta en BD
-        conn = st.connection("postgresql", type="sql")
-        with conn.session as s:
-            alerta_query = text("""
-                INSERT INTO public.alertas 
-                (medicion_id, tipo_alerta, mensaje, leida)
-                VALUES (:medicion_id, :tipo_alerta, :mensaje, false)
-                RETURNING id
-            """)
-            
-            alerta_result = s.execute(
-                alerta_query,
-                {
-                    "medicion_id": medicion_id,
-                    "tipo_alerta": tipo_alerta,
-                    "mensaje": mensaje,
-                },
-            ).fetchone()
-            
-            s.commit()
-            
-            if alerta_result:
-                return True
-        
-        return False
+        _, nueva = _registrar_lectura_anormal(
+            medicion_id, paciente_id, tipo_medicion, valor, tipo_alerta, mensaje, True, timestamp
+        )
+        return nueva
     
     except Exception as e:
         st.error(f"Error creando alerta: {str(e)}")
@@ -135,51 +504,70 @@ def crear_alerta_si_necesario(medicion_id: int, tipo_medicion: str, valor: float
 
 
 def crear_alerta_directa(
-    medicion_id: int, tipo_alerta: str, mensaje: str
+    medicion_id: int,
+    tipo_alerta: str,
+    mensaje: str,
+    paciente_id: int,
+    tipo_medicion: str,
+    valor: float,
+    distribuir: bool = True,
+    timestamp: Optional[datetime] = None,
 ) -> Optional[int]:
     """
     Crea una alerta directamente con tipo y mensaje personalizados.
     Útil para simulación de eventos específicos.
     
+    Igual que crear_alerta_si_necesario, agrupa la lectura en el episodio
+    abierto del paciente y signo vital si lo hay.
+    
     Args:
         medicion_id: ID de la medición
         tipo_alerta: 'advertencia' | 'crítica'
         mensaje: Mensaje personalizado
+        paciente_id: ID del paciente
+        tipo_medicion: Tipo de medición
+        valor: Valor de la medición
+        distribuir: Si se crean las notificaciones de inmediato; usar False cuando
+                    el llamador agrupa varias alertas en un solo distribuir_notificaciones
+        timestamp: Momento de la medición (default: ahora)
     
     Returns:
-        ID de alerta creada o None si falla
+        ID de la alerta si se abrió un episodio o la lectura extendió uno en
+        la BD; None si falla, se suprimió por el limitador o la lectura se
+        contó en memoria en un episodio ya registrado
     """
     try:
-        conn = st.connection("postgresql", type="sql")
-        with conn.session as s:
-            alerta_query = text("""
-                INSERT INTO public.alertas 
-                (medicion_id, tipo_alerta, mensaje, leida)
-                VALUES (:medicion_id, :tipo_alerta, :mensaje, false)
-                RETURNING id
-            """)
-            
-            alerta_result = s.execute(
-                alerta_query,
-                {
-                    "medicion_id": medicion_id,
-                    "tipo_alerta": tipo_alerta,
-                    "mensaje": mensaje,
-                },
-            ).fetchone()
-            
-            s.commit()
-            
-            if alerta_result:
-                return alerta_result[0]
-        
-        return None
+        alerta_id, _ = _registrar_lectura_anormal(
+            medicion_id, paciente_id, tipo_medicion, valor, tipo_alerta, mensaje, distribuir, timestamp
+        )
+        return alerta_id
     
     except Exception as e:
         st.error(f"Error creando alerta: {str(e)}")
         return None
 
 
+_QUERY_NO_LEIDAS = """
+    SELECT a.id, a.tipo_alerta, a.mensaje, a.timestamp,
+           m.tipo_medicion, m.valor, a.paciente_id,
+           p.nombre, p.apellido_paterno, a.severidad
+    FROM public.alertas a
+    JOIN public.mediciones m ON a.medicion_id = m.id
+    JOIN public.pacientes p ON a.paciente_id = p.id
+    WHERE a.leida = false
+      AND {filtro}
+    ORDER BY a.severidad DESC, a.timestamp DESC
+    LIMIT 20
+"""
+
+# Una variante por forma de filtro_acceso: sin restricción o limitada a :pacientes
+_NO_LEIDAS = {
+    False: Consulta("alertas_no_leidas", _QUERY_NO_LEIDAS.format(filtro="true")),
+    True: Consulta("alertas_no_leidas_pacientes",
+                   _QUERY_NO_LEIDAS.format(filtro="a.paciente_id = ANY(:pacientes)"), preparada=True),
+}
+
+
 def obtener_alertas_no_leidas(usuario_id: int, rol: str) -> list:
     """
     Obtiene alertas no leídas para un usuario según su rol.
@@ -191,107 +579,283 @@ def obtener_alertas_no_leidas(usuario_id: int, rol: str) -> list:
     Returns:
         Lista de diccionarios con información de alertas
     """
+    _, params = filtro_acceso(usuario_id, rol)
     try:
-        conn = st.connection("postgresql", type="sql")
-        with conn.session as s:
-            if rol == "administrador":
-                # Admin ve todas las alertas no leídas
-                query = text("""
-                    SELECT a.id, a.tipo_alerta, a.mensaje, a.timestamp,
-                           m.tipo_medicion, m.valor, d.paciente_id,
-                           p.nombre, p.apellido_paterno
-                    FROM public.alertas a
-                    JOIN public.mediciones m ON a.medicion_id = m.id
-                    JOIN public.dispositivos d ON m.dispositivo_id = d.id
-                    JOIN public.pacientes p ON d.paciente_id = p.id
-                    WHERE a.leida = false
-                    ORDER BY a.tipo_alerta DESC, a.timestamp DESC
-                    LIMIT 20
-                """)
-            
-            elif rol == "medico":
-                # Médico ve alertas de sus pacientes asignados
-                query = text("""
-                    SELECT a.id, a.tipo_alerta, a.mensaje, a.timestamp,
-                           m.tipo_medicion, m.valor, d.paciente_id,
-                           p.nombre, p.apellido_paterno
-                    FROM public.alertas a
-                    JOIN public.mediciones m ON a.medicion_id = m.id
-                    JOIN public.dispositivos d ON m.dispositivo_id = d.id
-                    JOIN public.pacientes p ON d.paciente_id = p.id
-                    JOIN public.pacientes_medicos pm ON p.id = pm.paciente_id
-                    JOIN public.personal_medico pmed ON pm.medico_id = pmed.id
-                    WHERE a.leida = false
-                      AND pmed.usuario_id = :usuario_id
-                    ORDER BY a.tipo_alerta DESC, a.timestamp DESC
-                    LIMIT 20
-                """)
-            
-            else:  # paciente
-                # Paciente ve solo sus alertas
-                query = text("""
-                    SELECT a.id, a.tipo_alerta, a.mensaje, a.timestamp,
-                           m.tipo_medicion, m.valor, d.paciente_id,
-                           p.nombre, p.apellido_paterno
-                    FROM public.alertas a
-                    JOIN public.mediciones m ON a.medicion_id = m.id
-                    JOIN public.dispositivos d ON m.dispositivo_id = d.id
-                    JOIN public.pacientes p ON d.paciente_id = p.id
-                    WHERE a.leida = false
-                      AND p.usuario_id = :usuario_id
-                    ORDER BY a.tipo_alerta DESC, a.timestamp DESC
-                    LIMIT 20
-                """)
-            
-            result = s.execute(query, {"usuario_id": usuario_id}).fetchall()
-            
-            alertas = []
-            for row in result:
-                alertas.append({
-                    "id": row[0],
-                    "tipo_alerta": row[1],
-                    "mensaje": row[2],
-                    "timestamp": row[3],
-                    "tipo_medicion": row[4],
-                    "valor": row[5],
-                    "paciente_id": row[6],
-                    "nombre_paciente": f"{row[7]} {row[8]}",
-                })
-            
-            return alertas
+        alertas = consultar(_NO_LEIDAS["pacientes" in params], params)
+        for alerta in alertas:
+            alerta["nombre_paciente"] = f"{alerta.pop('nombre')} {alerta.pop('apellido_paterno')}"
+        return alertas
     
     except Exception as e:
         st.error(f"Error obteniendo alertas: {str(e)}")
         return []
 
 
-def marcar_alerta_leida(alerta_id: int) -> bool:
+_FILTROS_CATEGORIA = {
+    "critica": f"a.severidad = {SEVERIDAD_CRITICA}",
+    "advertencia": f"a.severidad = {SEVERIDAD_ADVERTENCIA}",
+    "informativa": f"a.severidad = {SEVERIDAD_INFORMATIVA}",
+    "resuelta": "a.leida = true",
+}
+
+# Condición de filtro_acceso según su forma: sin restricción o limitada a :pacientes
+_FILTROS_ACCESO = {False: "true", True: FILTRO_PACIENTES.format(columna="a.paciente_id")}
+
+_FILTRO_CURSOR_ALERTAS = "(a.timestamp, a.id) < (:cursor_ts, :cursor_id)"
+
+# {condiciones}: filtro_acceso, categoría y cursor unidos con AND
+_QUERY_PAGINA_ALERTAS = """
+    SELECT a.id, a.timestamp, a.tipo_alerta, a.mensaje, a.leida,
+           d.modelo AS dispositivo,
+           CONCAT(p.nombre, ' ', p.apellido_paterno) AS paciente,
+           m.tipo_medicion, m.valor, m.unidad_medida, a.severidad,
+           COALESCE(e.lecturas, 1) AS lecturas,
+           COALESCE(e.valor_pico, m.valor) AS valor_pico,
+           e.ultima_lectura
+    FROM public.alertas a
+    JOIN public.mediciones m ON a.medicion_id = m.id
+    JOIN public.dispositivos d ON m.dispositivo_id = d.id
+    JOIN public.pacientes p ON a.paciente_id = p.id
+    LEFT JOIN public.alertas_episodios e ON e.alerta_id = a.id
+    WHERE {condiciones}
+    ORDER BY a.timestamp DESC, a.id DESC
+    LIMIT :limite
+"""
+
+
+def _variantes_pagina() -> Dict[Tuple[bool, Optional[str], bool], Consulta]:
+    """Una consulta por forma de filtro_acceso, categoría y cursor, cada una con su plan."""
+    variantes = {}
+    for pacientes in (False, True):
+        for categoria in (None, *_FILTROS_CATEGORIA):
+            for con_cursor in (False, True):
+                nombre = ["alertas_pagina"]
+                condiciones = [_FILTROS_ACCESO[pacientes]]
+                if pacientes:
+                    nombre.append("pacientes")
+                if categoria:
+                    nombre.append(categoria)
+                    condiciones.append(_FILTROS_CATEGORIA[categoria])
+                if con_cursor:
+                    nombre.append("cursor")
+                    condiciones.append(_FILTRO_CURSOR_ALERTAS)
+                variantes[(pacientes, categoria, con_cursor)] = Consulta(
+                    "_".join(nombre), _QUERY_PAGINA_ALERTAS.format(condiciones=" AND ".join(condiciones))
+                )
+    return variantes
+
+
+_PAGINA_ALERTAS = _variantes_pagina()
+
+_QUERY_CONTEO_CATEGORIAS = """
+    SELECT a.severidad, COUNT(*) AS total, COUNT(*) FILTER (WHERE a.leida = true) AS leidas
+    FROM public.alertas a
+    WHERE {filtro}
+    GROUP BY a.severidad
+"""
+
+_CONTEO_CATEGORIAS = {
+    False: Consulta("alertas_conteo_categorias", _QUERY_CONTEO_CATEGORIAS.format(filtro=_FILTROS_ACCESO[False])),
+    True: Consulta("alertas_conteo_categorias_pacientes",
+                   _QUERY_CONTEO_CATEGORIAS.format(filtro=_FILTROS_ACCESO[True])),
+}
+
+_QUERY_MARCAR_ALERTAS = """
+    UPDATE public.alertas a
+    SET leida = true, fecha_lectura = CURRENT_TIMESTAMP
+    WHERE a.id = ANY(:alerta_ids)
+      AND a.leida = false
+      AND {filtro}
+"""
+
+_MARCAR_ALERTAS = {
+    False: Consulta("alertas_marcar", _QUERY_MARCAR_ALERTAS.format(filtro=_FILTROS_ACCESO[False])),
+    True: Consulta("alertas_marcar_pacientes", _QUERY_MARCAR_ALERTAS.format(filtro=_FILTROS_ACCESO[True])),
+}
+
+# desde y severidad son opcionales (NULL: sin límite inferior / todas las severidades)
+_QUERY_MARCAR_RANGO = """
+    UPDATE public.alertas a
+    SET leida = true, fecha_lectura = CURRENT_TIMESTAMP
+    WHERE a.leida = false
+      AND {filtro}
+      AND a.timestamp <= :hasta
+      AND a.timestamp >= COALESCE(CAST(:desde AS timestamp), '-infinity')
+      AND (CAST(:severidad AS smallint) IS NULL OR a.severidad = :severidad)
+    RETURNING a.id
+"""
+
+_MARCAR_RANGO = {
+    False: Consulta("alertas_marcar_rango", _QUERY_MARCAR_RANGO.format(filtro=_FILTROS_ACCESO[False])),
+    True: Consulta("alertas_marcar_rango_pacientes", _QUERY_MARCAR_RANGO.format(filtro=_FILTROS_ACCESO[True])),
+}
+
+_MARCAR_PACIENTE = Consulta("alertas_marcar_paciente", """
+    UPDATE public.alertas
+    SET leida = true, fecha_lectura = CURRENT_TIMESTAMP
+    WHERE paciente_id = :paciente_id
+      AND leida = false
+""")
+
+
+def obtener_pagina_alertas(
+    usuario_id: int,
+    rol: str,
+    cursor: Optional[Tuple[datetime, int]] = None,
+    limite: int = 50,
+    categoria: Optional[str] = None,
+) -> Dict:
+    """
+    Obtiene una página de alertas visibles para el usuario, de la más reciente
+    a la más antigua, paginando por llave (timestamp, id).
+
+    A diferencia de OFFSET, el costo de cada página no depende de cuántas
+    se hayan recorrido antes: la consulta continúa desde el cursor usando el
+    índice idx_alertas_timestamp_id (o idx_alertas_severidad_timestamp_id
+    al filtrar por categoría, e idx_alertas_paciente_timestamp_id para los
+    roles limitados a sus pacientes por el mapa de acceso).
+
+    Args:
+        usuario_id: ID del usuario
+        rol: Rol del usuario ('administrador', 'medico', 'paciente')
+        cursor: (timestamp, id) de la última alerta de la página anterior;
+                None para la primera página
+        limite: Alertas por página
+        categoria: 'critica', 'advertencia', 'informativa', 'resuelta' o None (todas)
+
+    Returns:
+        Dict con 'alertas' (lista de diccionarios) y 'siguiente' (cursor de la
+        siguiente página, o None si no hay más)
+    """
+    _, params = filtro_acceso(usuario_id, rol)
+    consulta = _PAGINA_ALERTAS[("pacientes" in params, categoria, cursor is not None)]
+    params["limite"] = limite + 1
+    if cursor is not None:
+        params.update({"cursor_ts": cursor[0], "cursor_id": cursor[1]})
+
+    try:
+        filas = consultar(consulta, params)
+
+        alertas = filas[:limite]
+        for alerta in alertas:
+            alerta["categoria"] = CATEGORIAS_SEVERIDAD.get(alerta["severidad"], "informativa")
+
+        siguiente = None
+        if len(filas) > limite:
+            siguiente = (alertas[-1]["timestamp"], alertas[-1]["id"])
+        return {"alertas": alertas, "siguiente": siguiente}
+
+    except Exception as e:
+        st.error(f"Error obteniendo alertas: {str(e)}")
+        return {"alertas": [], "siguiente": None}
+
+
+@st.cache_data(ttl=10, show_spinner=False)
+def contar_alertas_por_categoria(usuario_id: int, rol: str) -> Dict[str, int]:
+    """
+    Cuenta las alertas visibles para el usuario por categoría con un solo GROUP BY
+    sobre el código de severidad.
+    
+    Args:
+        usuario_id: ID del usuario
+        rol: Rol del usuario ('administrador', 'medico', 'paciente')
+    
+    Returns:
+        Dict con 'critica', 'advertencia', 'informativa', 'resuelta' y 'total'
+    """
+    conteos = {categoria: 0 for categoria in CATEGORIAS_SEVERIDAD.values()}
+    conteos.update({"resuelta": 0, "total": 0})
+    _, params = filtro_acceso(usuario_id, rol)
+    try:
+        for fila in consultar(_CONTEO_CATEGORIAS["pacientes" in params], params):
+            conteos[CATEGORIAS_SEVERIDAD.get(fila["severidad"], "informativa")] += fila["total"]
+            conteos["resuelta"] += fila["leidas"]
+            conteos["total"] += fila["total"]
+        return conteos
+    
+    except Exception as e:
+        st.error(f"Error contando alertas: {str(e)}")
+        return conteos
+
+
+def marcar_alerta_leida(alerta_id: int, usuario_id: int, rol: str) -> bool:
     """
     Marca una alerta como leída.
     
     Args:
         alerta_id: ID de la alerta
+        usuario_id: ID del usuario
+        rol: Rol del usuario ('administrador', 'medico', 'paciente')
     
     Returns:
         True si se actualizó correctamente
     """
+    return marcar_alertas_leidas([alerta_id], usuario_id, rol) >= 0
+
+
+def marcar_alertas_leidas(alerta_ids: List[int], usuario_id: int, rol: str) -> int:
+    """
+    Marca un conjunto de alertas como leídas en una sola sentencia.
+    
+    Solo se marcan las alertas visibles para el usuario (filtro_acceso); los
+    IDs de otros pacientes se ignoran.
+    
+    Args:
+        alerta_ids: IDs de las alertas
+        usuario_id: ID del usuario
+        rol: Rol del usuario ('administrador', 'medico', 'paciente')
+    
+    Returns:
+        Cantidad de alertas marcadas (-1 si hay error)
+    """
+    if not alerta_ids:
+        return 0
+    _, params = filtro_acceso(usuario_id, rol)
+    params["alerta_ids"] = [int(a) for a in alerta_ids]
     try:
-        conn = st.connection("postgresql", type="sql")
-        with conn.session as s:
-            update_query = text("""
-                UPDATE public.alertas
-                SET leida = true, fecha_lectura = CURRENT_TIMESTAMP
-                WHERE id = :alerta_id
-            """)
-            
-            s.execute(update_query, {"alerta_id": alerta_id})
-            s.commit()
-            
-            return True
+        marcadas = ejecutar(_MARCAR_ALERTAS["pacientes" in params], params)
+        contar_alertas_por_categoria.clear()
+        return marcadas
     
     except Exception as e:
-        st.error(f"Error marcando alerta: {str(e)}")
-        return False
+        st.error(f"Error marcando alertas: {str(e)}")
+        return -1
+
+
+def marcar_alertas_leidas_rango(
+    usuario_id: int,
+    rol: str,
+    hasta: datetime,
+    desde: Optional[datetime] = None,
+    categoria: Optional[str] = None,
+) -> Optional[List[int]]:
+    """
+    Marca como leídas todas las alertas visibles para el usuario en un rango
+    de tiempo, en una sola sentencia.
+    
+    Args:
+        usuario_id: ID del usuario
+        rol: Rol del usuario ('administrador', 'medico', 'paciente')
+        hasta: Fin del rango (inclusive); normalmente el momento en que se cargó la lista
+        desde: Inicio del rango; None para todo lo anterior a 'hasta'
+        categoria: Limitar a 'critica', 'advertencia' o 'informativa'
+    
+    Returns:
+        IDs de las alertas marcadas (para descontar sus notificaciones), o
+        None si hay error
+    """
+    _, params = filtro_acceso(usuario_id, rol)
+    severidades = {nombre: codigo for codigo, nombre in CATEGORIAS_SEVERIDAD.items()}
+    params.update({"hasta": hasta, "desde": desde, "severidad": severidades.get(categoria)})
+    
+    try:
+        ids = [fila["id"] for fila in consultar(_MARCAR_RANGO["pacientes" in params], params)]
+        contar_alertas_por_categoria.clear()
+        return ids
+    
+    except Exception as e:
+        st.error(f"Error marcando alertas: {str(e)}")
+        return None
 
 
 def marcar_alertas_leidas_paciente(paciente_id: int) -> int:
@@ -302,23 +866,9 @@ def marcar_alertas_leidas_paciente(paciente_id: int) -> int:
         Cantidad de alertas marcadas
     """
     try:
-        conn = st.connection("postgresql", type="sql")
-        with conn.session as s:
-            update_query = text("""
-                UPDATE public.alertas
-                SET leida = true, fecha_lectura = CURRENT_TIMESTAMP
-                WHERE medicion_id IN (
-                    SELECT m.id FROM public.mediciones m
-                    JOIN public.dispositivos d ON m.dispositivo_id = d.id
-                    WHERE d.paciente_id = :paciente_id
-                )
-                AND leida = false
-            """)
-            
-            result = s.execute(update_query, {"paciente_id": paciente_id})
-            s.commit()
-            
-            return result.rowcount
+        marcadas = ejecutar(_MARCAR_PACIENTE, {"paciente_id": paciente_id})
+        contar_alertas_por_categoria.clear()
+        return marcadas
     
     except Exception as e:
         st.error(f"Error marcando alertas: {str(e)}")
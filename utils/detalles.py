@@ -0,0 +1,216 @@
+"""
+Cargas de detalle para las vistas de administración.
+Cada vista de detalle (paciente, médico, dispositivo) se obtiene en una sola
+consulta: las secciones relacionadas se agregan como JSON en subconsultas, de
+modo que la página cuesta un viaje a la base de datos en lugar de cinco o seis.
+Las métricas del panel de administración (app.py) también son una sola consulta.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from core.db import Consulta, consultar_uno
+
+_DETALLE_PACIENTE = Consulta("detalle_paciente", """
+    SELECT p.id, p.nombre, p.apellido_paterno, p.apellido_materno, p.fecha_nacimiento,
+           p.curp, p.nss, p.sexo, p.estado_civil, p.domicilio, p.email, p.telefono, p.diagnostico,
+           (
+               SELECT row_to_json(x)
+               FROM (
+                   SELECT d.id, d.modelo, d.mac_address, d.activo, d.fecha_asignacion
+                   FROM public.dispositivos d
+                   WHERE d.paciente_id = p.id
+                   ORDER BY d.activo DESC, d.fecha_asignacion DESC
+                   LIMIT 1
+               ) x
+           ) AS dispositivo,
+           COALESCE((
+               SELECT json_agg(x ORDER BY x.nombre)
+               FROM (
+                   SELECT med.nombre, med.apellido_paterno, med.especialidad
+                   FROM public.personal_medico med
+                   JOIN public.pacientes_medicos pm ON pm.medico_id = med.id
+                   WHERE pm.paciente_id = p.id
+               ) x
+           ), '[]') AS medicos,
+           COALESCE((
+               SELECT json_agg(x ORDER BY x.timestamp DESC)
+               FROM (
+                   SELECT a.tipo_alerta, a.mensaje, a.timestamp,
+                          m.tipo_medicion, m.valor, m.unidad_medida
+                   FROM public.alertas a
+                   JOIN public.mediciones m ON a.medicion_id = m.id
+                   WHERE a.paciente_id = p.id AND a.leida = false
+                   ORDER BY a.timestamp DESC
+                   LIMIT 10
+               ) x
+           ), '[]') AS alertas,
+           COALESCE((
+               SELECT json_agg(x ORDER BY x.timestamp DESC)
+               FROM (
+                   SELECT m.tipo_medicion, m.valor, m.unidad_medida, m.timestamp
+                   FROM public.mediciones m
+                   JOIN public.dispositivos d ON m.dispositivo_id = d.id
+                   WHERE d.paciente_id = p.id
+                   ORDER BY m.timestamp DESC
+                   LIMIT 100
+               ) x
+           ), '[]') AS historial
+    FROM public.pacientes p
+    WHERE p.id = :paciente_id
+""")
+
+_DETALLE_MEDICO = Consulta("detalle_medico", """
+    SELECT med.id, med.nombre, med.apellido_paterno, med.apellido_materno, med.especialidad,
+           med.cedula_profesional, med.cedula_especialidad, med.universidad, med.email,
+           (
+               SELECT row_to_json(x)
+               FROM (
+                   SELECT u.id, u.username, u.activo
+                   FROM public.usuarios u
+                   WHERE u.id = med.usuario_id
+               ) x
+           ) AS usuario,
+           COALESCE((
+               SELECT json_agg(x ORDER BY x.nombre)
+               FROM (
+                   SELECT p.id, p.nombre, p.apellido_paterno, p.apellido_materno,
+                          p.diagnostico, p.nss
+                   FROM public.pacientes p
+                   JOIN public.pacientes_medicos pm ON p.id = pm.paciente_id
+                   WHERE pm.medico_id = med.id
+               ) x
+           ), '[]') AS pacientes,
+           COALESCE((
+               SELECT json_agg(x ORDER BY x.timestamp DESC)
+               FROM (
+                   SELECT a.tipo_alerta, a.mensaje, a.timestamp,
+                          p.nombre, p.apellido_paterno,
+                          m.tipo_medicion, m.valor, m.unidad_medida
+                   FROM public.pacientes_medicos pm
+                   JOIN public.alertas a ON a.paciente_id = pm.paciente_id
+                   JOIN public.pacientes p ON p.id = pm.paciente_id
+                   JOIN public.mediciones m ON a.medicion_id = m.id
+                   WHERE pm.medico_id = med.id AND a.leida = false
+                   ORDER BY a.timestamp DESC
+                   LIMIT 10
+               ) x
+           ), '[]') AS alertas
+    FROM public.personal_medico med
+    WHERE med.id = :medico_id
+""")
+
+_DETALLE_DISPOSITIVO = Consulta("detalle_dispositivo", """
+    SELECT d.id, d.modelo, d.mac_address, d.activo, d.fecha_asignacion,
+           (
+               SELECT row_to_json(x)
+               FROM (
+                   SELECT p.id, p.nombre, p.apellido_paterno, p.apellido_materno,
+                          p.diagnostico, p.email, p.telefono
+                   FROM public.pacientes p
+                   WHERE p.id = d.paciente_id
+               ) x
+           ) AS paciente,
+           COALESCE((
+               SELECT json_agg(x ORDER BY x.timestamp DESC)
+               FROM (
+                   SELECT m.tipo_medicion, m.valor, m.unidad_medida, m.timestamp
+                   FROM public.mediciones m
+                   WHERE m.dispositivo_id = d.id
+                   ORDER BY m.timestamp DESC
+                   LIMIT 20
+               ) x
+           ), '[]') AS mediciones
+    FROM public.dispositivos d
+    WHERE d.id = :dispositivo_id
+""")
+
+_METRICAS_PANEL = Consulta("panel_metricas", """
+    SELECT
+        (SELECT COUNT(*) FROM public.pacientes) as total_pacientes,
+        (SELECT COUNT(*) FROM public.personal_medico) as total_medicos,
+        (SELECT COUNT(*) FROM public.dispositivos WHERE activo = true) as dispositivos_activos,
+        (SELECT COUNT(*) FROM public.monitoreos WHERE activo = true) as monitoreos_activos,
+        (SELECT COALESCE(SUM(alertas_no_leidas), 0) FROM public.contadores_paciente) as alertas_pendientes,
+        (SELECT COUNT(*) FROM public.mediciones WHERE timestamp > NOW() - INTERVAL '24 hours') as mediciones_hoy
+""")
+
+
+def _fechas(filas: Iterable[Dict], *campos: str) -> List[Dict]:
+    """Convierte a datetime los campos de fecha de las filas agregadas (JSON los devuelve como texto ISO)."""
+    filas = list(filas)
+    for fila in filas:
+        for campo in campos:
+            if fila.get(campo):
+                fila[campo] = datetime.fromisoformat(fila[campo])
+    return filas
+
+
+def obtener_detalle_paciente(paciente_id: int) -> Optional[Dict]:
+    """
+    Obtiene en una sola consulta todo lo que muestra el detalle de un paciente.
+
+    Args:
+        paciente_id: ID del paciente
+
+    Returns:
+        Dict con los datos personales y las claves 'dispositivo' (dict o None;
+        el activo más reciente primero), 'medicos', 'alertas' (no leídas,
+        10 más recientes) e 'historial' (100 mediciones más recientes), o
+        None si el paciente no existe
+    """
+    detalle = consultar_uno(_DETALLE_PACIENTE, {"paciente_id": paciente_id})
+    if detalle is None:
+        return None
+    if detalle['dispositivo']:
+        detalle['dispositivo'] = _fechas([detalle['dispositivo']], 'fecha_asignacion')[0]
+    detalle['alertas'] = _fechas(detalle['alertas'], 'timestamp')
+    detalle['historial'] = _fechas(detalle['historial'], 'timestamp')
+    return detalle
+
+
+def obtener_detalle_medico(medico_id: int) -> Optional[Dict]:
+    """
+    Obtiene en una sola consulta todo lo que muestra el detalle de un médico.
+
+    Args:
+        medico_id: ID de personal_medico
+
+    Returns:
+        Dict con los datos profesionales y las claves 'usuario' (dict o None),
+        'pacientes' y 'alertas' (no leídas de sus pacientes, 10 más
+        recientes), o None si el médico no existe
+    """
+    detalle = consultar_uno(_DETALLE_MEDICO, {"medico_id": medico_id})
+    if detalle is None:
+        return None
+    detalle['alertas'] = _fechas(detalle['alertas'], 'timestamp')
+    return detalle
+
+
+def obtener_detalle_dispositivo(dispositivo_id: int) -> Optional[Dict]:
+    """
+    Obtiene en una sola consulta todo lo que muestra el detalle de un dispositivo.
+
+    Args:
+        dispositivo_id: ID del dispositivo
+
+    Returns:
+        Dict con los datos del dispositivo y las claves 'paciente' (dict o
+        None) y 'mediciones' (20 más recientes), o None si no existe
+    """
+    detalle = consultar_uno(_DETALLE_DISPOSITIVO, {"dispositivo_id": dispositivo_id})
+    if detalle is None:
+        return None
+    detalle['mediciones'] = _fechas(detalle['mediciones'], 'timestamp')
+    return detalle
+
+
+def obtener_metricas_panel() -> Dict:
+    """
+    Obtiene los totales del panel de administración.
+
+    Returns:
+        Dict con total_pacientes, total_medicos, dispositivos_activos,
+        monitoreos_activos, alertas_pendientes y mediciones_hoy
+    """
+    return consultar_uno(_METRICAS_PANEL)
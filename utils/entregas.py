@@ -0,0 +1,356 @@
+"""
+Entrega externa de notificaciones (email, SMS, webhook).
+Las entregas se encolan por trigger en entregas_notificaciones
+(db/migrations/010_entregas_notificaciones.sql); aquí se consumen en lotes
+con FOR UPDATE SKIP LOCKED, con un límite de concurrencia por canal,
+reintentos con espera exponencial y paso a 'fallida' al agotarlos.
+Los trabajadores se ejecutan con scripts/worker_entregas.py.
+"""
+
+import json
+import logging
+import os
+import smtplib
+import threading
+import urllib.request
+import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from sqlalchemy import text
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from core.db import obtener_conexion
+
+# Concurrencia (envíos simultáneos) y tamaño de lote por canal
+CANALES_ENTREGA = {
+    "email": {"concurrencia": 4, "lote": 20},
+    "sms": {"concurrencia": 2, "lote": 10},
+    "webhook": {"concurrencia": 8, "lote": 50},
+}
+
+# Reintentos: espera base * 2^(intento - 1), con tope, hasta MAX_INTENTOS
+MAX_INTENTOS = 6
+REINTENTO_BASE_SEGUNDOS = 30
+REINTENTO_MAXIMO_SEGUNDOS = 3600
+
+# Tiempo que una entrega reclamada queda bloqueada antes de poder reclamarse de nuevo
+_BLOQUEO_SEGUNDOS = 120
+# Espera de un trabajador cuando su canal no tiene entregas
+_ESPERA_VACIA = 2
+
+_logger = logging.getLogger(__name__)
+
+_QUERY_RECLAMAR = text("""
+    UPDATE public.entregas_notificaciones e
+    SET estado = 'enviando',
+        intentos = e.intentos + 1,
+        proximo_intento = LOCALTIMESTAMP + make_interval(secs => :bloqueo)
+    WHERE e.id IN (
+        SELECT id FROM public.entregas_notificaciones
+        WHERE canal = :canal
+          AND estado IN ('pendiente', 'enviando')
+          AND proximo_intento <= LOCALTIMESTAMP
+        ORDER BY proximo_intento
+        LIMIT :lote
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING e.id, e.destino, e.cuerpo, e.intentos
+""")
+
+_QUERY_ENTREGADAS = text("""
+    UPDATE public.entregas_notificaciones
+    SET estado = 'entregada', fecha_entrega = LOCALTIMESTAMP, ultimo_error = NULL
+    WHERE id = ANY(:ids)
+    RETURNING EXTRACT(EPOCH FROM fecha_entrega - fecha_creacion)
+""")
+
+# Espera exponencial con ±25 % de variación para no reintentar todas a la vez
+_QUERY_FALLIDAS = text("""
+    UPDATE public.entregas_notificaciones e
+    SET estado = CASE WHEN e.intentos >= :max_intentos THEN 'fallida' ELSE 'pendiente' END,
+        proximo_intento = LOCALTIMESTAMP + make_interval(secs =>
+            LEAST(:maximo, :base * power(2, e.intentos - 1)) * (0.75 + random() * 0.5)),
+        ultimo_error = f.error
+    FROM unnest(CAST(:ids AS bigint[]), CAST(:errores AS text[])) AS f(id, error)
+    WHERE e.id = f.id
+    RETURNING e.estado
+""")
+
+
+def _configuracion(nombre: str, defecto: str = "") -> str:
+    """Lee ENTREGAS_<NOMBRE> del entorno."""
+    return os.environ.get(f"ENTREGAS_{nombre}", defecto)
+
+
+def _formatear(datos: Dict) -> Tuple[str, str]:
+    """Asunto y texto de una notificación a partir del cuerpo encolado."""
+    prefijo = "[ESCALAMIENTO] " if datos.get("tipo") == "escalamiento" else ""
+    asunto = f"{prefijo}IHeartCare: {datos.get('tipo_alerta', 'alerta')}"
+    texto = (
+        f"{datos.get('mensaje', '')}\n\n"
+        f"Paciente: {datos.get('paciente_id')}\n"
+        f"Alerta: {datos.get('alerta_id')} ({datos.get('timestamp')})"
+    )
+    return asunto, texto
+
+
+# =============================================================================
+# EMISORES POR CANAL
+# Reciben una parte del lote [(id, destino, datos)] y devuelven {id: error o None}
+# =============================================================================
+
+def _enviar_email(entregas: List[Tuple[int, str, Dict]]) -> Dict[int, Optional[str]]:
+    """Envía los correos de la parte del lote por una sola conexión SMTP."""
+    resultados = {}
+    timeout = float(_configuracion("TIMEOUT", "10"))
+    try:
+        with smtplib.SMTP(_configuracion("SMTP_HOST", "localhost"),
+                          int(_configuracion("SMTP_PUERTO", "1025")), timeout=timeout) as smtp:
+            if _configuracion("SMTP_USUARIO"):
+                smtp.starttls()
+                smtp.login(_configuracion("SMTP_USUARIO"), _configuracion("SMTP_CLAVE"))
+            for entrega_id, destino, datos in entregas:
+                asunto, texto = _formatear(datos)
+                mensaje = EmailMessage()
+                mensaje["From"] = _configuracion("SMTP_REMITENTE", "alertas@iheartcare.local")
+                mensaje["To"] = destino
+                mensaje["Subject"] = asunto
+                mensaje.set_content(texto)
+                try:
+                    smtp.send_message(mensaje)
+                    resultados[entrega_id] = None
+                except smtplib.SMTPException as e:
+                    resultados[entrega_id] = f"SMTP: {e}"
+    except (OSError, smtplib.SMTPException) as e:
+        # Sin conexión fallan todas las que no se alcanzaron a enviar
+        for entrega_id, _, _ in entregas:
+            resultados.setdefault(entrega_id, f"Conexión SMTP: {e}")
+    return resultados
+
+
+def _post_json(url: str, datos: Dict) -> Optional[str]:
+    """POST con cuerpo JSON; None si la respuesta es 2xx."""
+    peticion = urllib.request.Request(
+        url, data=json.dumps(datos).encode("utf-8"),
+        headers={"Content-Type": "application/json"}, method="POST",
+    )
+    try:
+        with urllib.request.urlopen(peticion, timeout=float(_configuracion("TIMEOUT", "10"))) as respuesta:
+            return None if 200 <= respuesta.status < 300 else f"HTTP {respuesta.status}"
+    except Exception as e:
+        return f"HTTP: {e}"
+
+
+def _enviar_webhook(entregas: List[Tuple[int, str, Dict]]) -> Dict[int, Optional[str]]:
+    """Publica cada notificación en la URL del destino."""
+    return {entrega_id: _post_json(destino, datos) for entrega_id, destino, datos in entregas}
+
+
+def _enviar_sms(entregas: List[Tuple[int, str, Dict]]) -> Dict[int, Optional[str]]:
+    """Envía los SMS por la pasarela HTTP de ENTREGAS_SMS_URL."""
+    url = _configuracion("SMS_URL")
+    if not url:
+        return {entrega_id: "ENTREGAS_SMS_URL no configurada" for entrega_id, _, _ in entregas}
+    resultados = {}
+    for entrega_id, destino, datos in entregas:
+        asunto, _ = _formatear(datos)
+        resultados[entrega_id] = _post_json(url, {"destino": destino, "mensaje": f"{asunto}: {datos.get('mensaje', '')}"})
+    return resultados
+
+
+_EMISORES: Dict[str, Callable[[List[Tuple[int, str, Dict]]], Dict[int, Optional[str]]]] = {
+    "email": _enviar_email,
+    "sms": _enviar_sms,
+    "webhook": _enviar_webhook,
+}
+
+
+# =============================================================================
+# TRABAJADORES
+# =============================================================================
+
+def _nuevas_metricas() -> Dict:
+    """Contadores en cero por canal."""
+    return {canal: {'entregadas': 0, 'reintentos': 0, 'fallidas': 0, 'latencia_total': 0.0, 'lotes': 0}
+            for canal in CANALES_ENTREGA}
+
+
+_metricas = _nuevas_metricas()
+_lock_metricas = threading.Lock()
+
+
+def procesar_lote(engine, canal: str, pool: Optional[ThreadPoolExecutor] = None) -> int:
+    """
+    Reclama y envía un lote de entregas de un canal.
+
+    El lote se reparte en tantas partes como la concurrencia del canal; cada
+    parte se envía en un hilo (para email, con una sola conexión SMTP).
+
+    Args:
+        engine: Engine de SQLAlchemy
+        canal: 'email', 'sms' o 'webhook'
+        pool: Pool de hilos del canal; si es None se envía en el hilo actual
+
+    Returns:
+        Cantidad de entregas procesadas (0 si no había pendientes)
+    """
+    config = CANALES_ENTREGA[canal]
+    with engine.begin() as c:
+        filas = c.execute(_QUERY_RECLAMAR, {
+            "canal": canal, "lote": config["lote"], "bloqueo": _BLOQUEO_SEGUNDOS,
+        }).fetchall()
+    if not filas:
+        return 0
+
+    entregas = [(fila[0], fila[1], json.loads(fila[2])) for fila in filas]
+    partes = [entregas[i::config["concurrencia"]] for i in range(min(config["concurrencia"], len(entregas)))]
+    emisor = _EMISORES[canal]
+    resultados = {}
+    for parcial in (pool.map(emisor, partes) if pool else map(emisor, partes)):
+        resultados.update(parcial)
+
+    exitosas = [entrega_id for entrega_id, error in resultados.items() if error is None]
+    errores = [(entrega_id, error) for entrega_id, error in resultados.items() if error is not None]
+    with engine.begin() as c:
+        latencias = [fila[0] for fila in c.execute(_QUERY_ENTREGADAS, {"ids": exitosas})] if exitosas else []
+        estados = [fila[0] for fila in c.execute(_QUERY_FALLIDAS, {
+            "ids": [e[0] for e in errores], "errores": [e[1] for e in errores],
+            "max_intentos": MAX_INTENTOS, "base": REINTENTO_BASE_SEGUNDOS, "maximo": REINTENTO_MAXIMO_SEGUNDOS,
+        })] if errores else []
+
+    with _lock_metricas:
+        metricas = _metricas[canal]
+        metricas['lotes'] += 1
+        metricas['entregadas'] += len(latencias)
+        metricas['latencia_total'] += float(sum(latencias))
+        metricas['fallidas'] += estados.count('fallida')
+        metricas['reintentos'] += estados.count('pendiente')
+    return len(filas)
+
+
+def _trabajador_canal(engine, canal: str, detener: threading.Event):
+    """Bucle de un canal: procesa lotes mientras haya entregas y espera si no."""
+    with ThreadPoolExecutor(max_workers=CANALES_ENTREGA[canal]["concurrencia"],
+                            thread_name_prefix=f"entregas-{canal}") as pool:
+        while not detener.is_set():
+            try:
+                if procesar_lote(engine, canal, pool) == 0:
+                    detener.wait(_ESPERA_VACIA)
+            except Exception as e:
+                _logger.warning("Trabajador de entregas %s interrumpido: %s", canal, e)
+                detener.wait(5)
+
+
+def iniciar_trabajadores(engine, canales: Optional[Iterable[str]] = None) -> Tuple[threading.Event, List[threading.Thread]]:
+    """
+    Inicia un hilo por canal, cada uno con su pool de envío.
+
+    Args:
+        engine: Engine de SQLAlchemy
+        canales: Canales a atender (por defecto todos los de CANALES_ENTREGA)
+
+    Returns:
+        Tupla (evento para detenerlos, lista de hilos)
+    """
+    detener = threading.Event()
+    hilos = []
+    for canal in canales or CANALES_ENTREGA:
+        hilo = threading.Thread(target=_trabajador_canal, args=(engine, canal, detener),
+                                name=f"trabajador-{canal}", daemon=True)
+        hilo.start()
+        hilos.append(hilo)
+    return detener, hilos
+
+
+def obtener_metricas_proceso(reiniciar: bool = False) -> Dict:
+    """
+    Métricas de los trabajadores de este proceso desde el arranque (o el último reinicio).
+
+    Returns:
+        Dict por canal con 'entregadas', 'reintentos', 'fallidas', 'lotes'
+        y 'latencia_promedio' (segundos desde que se encoló)
+    """
+    global _metricas
+    with _lock_metricas:
+        resumen = {canal: {**m, 'latencia_promedio': m['latencia_total'] / m['entregadas'] if m['entregadas'] else None}
+                   for canal, m in _metricas.items()}
+        if reiniciar:
+            _metricas = _nuevas_metricas()
+    return resumen
+
+
+# =============================================================================
+# CONSULTAS PARA LA APLICACIÓN
+# =============================================================================
+
+def obtener_metricas_entregas(minutos: int = 15) -> List[Dict]:
+    """
+    Estado de la cola y rendimiento reciente por canal.
+
+    Args:
+        minutos: Ventana para el rendimiento y la latencia
+
+    Returns:
+        Lista de dicts con 'canal', 'pendientes', 'enviando', 'fallidas',
+        'entregadas', 'por_minuto', 'latencia_p50' y 'latencia_p95' (segundos)
+    """
+    try:
+        conn = obtener_conexion()
+        with conn.session as s:
+            resultado = s.execute(text("""
+                SELECT canal,
+                       COUNT(*) FILTER (WHERE estado = 'pendiente'),
+                       COUNT(*) FILTER (WHERE estado = 'enviando'),
+                       COUNT(*) FILTER (WHERE estado = 'fallida'),
+                       COUNT(*) FILTER (WHERE estado = 'entregada'),
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM fecha_entrega - fecha_creacion))
+                           FILTER (WHERE estado = 'entregada'),
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM fecha_entrega - fecha_creacion))
+                           FILTER (WHERE estado = 'entregada')
+                FROM public.entregas_notificaciones
+                WHERE estado IN ('pendiente', 'enviando', 'fallida')
+                   OR (estado = 'entregada' AND fecha_entrega > LOCALTIMESTAMP - make_interval(mins => :minutos))
+                GROUP BY canal
+                ORDER BY canal
+            """), {"minutos": minutos}).fetchall()
+
+        return [{
+            "canal": fila[0],
+            "pendientes": fila[1],
+            "enviando": fila[2],
+            "fallidas": fila[3],
+            "entregadas": fila[4],
+            "por_minuto": round(fila[4] / minutos, 1),
+            "latencia_p50": fila[5],
+            "latencia_p95": fila[6],
+        } for fila in resultado]
+
+    except Exception as e:
+        st.error(f"Error obteniendo métricas de entregas: {str(e)}")
+        return []
+
+
+def reintentar_entregas_fallidas(entrega_ids: Optional[List[int]] = None) -> int:
+    """
+    Devuelve entregas fallidas (dead letter) a la cola con los intentos en cero.
+
+    Args:
+        entrega_ids: IDs a reintentar; None para todas las fallidas
+
+    Returns:
+        Cantidad de entregas reencoladas
+    """
+    try:
+        conn = obtener_conexion()
+        with conn.session as s:
+            resultado = s.execute(text("""
+                UPDATE public.entregas_notificaciones
+                SET estado = 'pendiente', intentos = 0, proximo_intento = LOCALTIMESTAMP
+                WHERE estado = 'fallida'
+                  AND (CAST(:ids AS bigint[]) IS NULL OR id = ANY(:ids))
+            """), {"ids": entrega_ids})
+            s.commit()
+            return resultado.rowcount
+
+    except Exception as e:
+        st.error(f"Error reintentando entregas: {str(e)}")
+        return 0
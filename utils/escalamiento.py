@@ -0,0 +1,241 @@
+"""
+Escalamiento de alertas críticas no atendidas.
+Un hilo por proceso mantiene en memoria una cola de prioridad (heap) con el
+vencimiento de cada alerta crítica sin leer; al vencer, vuelve a notificar a
+los médicos asignados y después a los administradores. El nivel aplicado se
+guarda en alertas.nivel_escalamiento (db/migrations/009_escalamiento_alertas.sql).
+"""
+
+import heapq
+import logging
+import threading
+import time
+import streamlit as st
+from sqlalchemy import text
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from core.db import obtener_conexion
+from .notificaciones import invalidar_notificaciones
+
+# Minutos desde la creación de la alerta hasta cada nivel, y a quién se notifica
+NIVELES_ESCALAMIENTO = (
+    (5, "medicos"),           # se vuelve a avisar a los médicos asignados
+    (15, "administradores"),
+)
+
+# Cada cuánto se reconstruye la cola desde la BD (alertas leídas o creadas en otros procesos)
+_RESINCRONIZAR_SEGUNDOS = 300
+# Espera máxima del hilo entre revisiones
+_ESPERA_MAXIMA = 30
+
+_logger = logging.getLogger(__name__)
+
+_QUERY_PENDIENTES = text("""
+    SELECT id, timestamp, nivel_escalamiento, LOCALTIMESTAMP
+    FROM public.alertas
+    WHERE leida = false
+      AND severidad = 3
+      AND nivel_escalamiento < :niveles
+""")
+
+# Solo escala quien gana el UPDATE condicional (varios procesos pueden tener la misma alerta)
+_QUERY_MARCAR_NIVEL = text("""
+    UPDATE public.alertas
+    SET nivel_escalamiento = :nivel
+    WHERE id = ANY(:alerta_ids)
+      AND leida = false
+      AND nivel_escalamiento < :nivel
+    RETURNING id, timestamp
+""")
+
+# La notificación existente se vuelve a marcar como no leída con tipo 'escalamiento'
+_QUERY_ESCALAR = {
+    "medicos": text("""
+        INSERT INTO public.notificaciones_alertas (usuario_id, alerta_id, tipo, leida, timestamp, payload)
+        SELECT DISTINCT pmed.usuario_id, a.id, 'escalamiento', false, LOCALTIMESTAMP,
+               json_build_object('nivel', :nivel, 'paciente_id', a.paciente_id)::text
+        FROM public.alertas a
+        JOIN public.pacientes_medicos pm ON pm.paciente_id = a.paciente_id
+        JOIN public.personal_medico pmed ON pmed.id = pm.medico_id
+        JOIN public.usuarios u ON u.id = pmed.usuario_id
+        WHERE a.id = ANY(:alerta_ids)
+          AND u.activo = true
+        ON CONFLICT (usuario_id, alerta_id) DO UPDATE
+            SET tipo = 'escalamiento', leida = false, timestamp = EXCLUDED.timestamp,
+                payload = EXCLUDED.payload
+        RETURNING usuario_id
+    """),
+    "administradores": text("""
+        INSERT INTO public.notificaciones_alertas (usuario_id, alerta_id, tipo, leida, timestamp, payload)
+        SELECT u.id, a.id, 'escalamiento', false, LOCALTIMESTAMP,
+               json_build_object('nivel', :nivel, 'paciente_id', a.paciente_id)::text
+        FROM public.alertas a
+        CROSS JOIN public.usuarios u
+        WHERE a.id = ANY(:alerta_ids)
+          AND u.rol = 'administrador'
+          AND u.activo = true
+        ON CONFLICT (usuario_id, alerta_id) DO UPDATE
+            SET tipo = 'escalamiento', leida = false, timestamp = EXCLUDED.timestamp,
+                payload = EXCLUDED.payload
+        RETURNING usuario_id
+    """),
+}
+
+
+@st.cache_resource(show_spinner=False)
+def _estado_escalamiento() -> Dict:
+    """Cola de vencimientos compartida por todas las sesiones del proceso."""
+    return {
+        'condicion': threading.Condition(),
+        'cola': [],             # heap de (vencimiento, alerta_id, nivel)
+        'niveles': {},          # alerta_id -> siguiente nivel pendiente
+        'desfase': timedelta(0),  # reloj de la BD menos reloj local
+        'ultima_sincronizacion': 0.0,
+        'escaladas': 0,
+    }
+
+
+def _vencimiento(creada: datetime, nivel: int) -> datetime:
+    """Momento en que vence el nivel indicado de una alerta."""
+    return creada + timedelta(minutes=NIVELES_ESCALAMIENTO[nivel][0])
+
+
+def _agregar(estado: Dict, alerta_id: int, creada: datetime, nivel: int):
+    """Agrega el temporizador del nivel indicado (el llamador tiene la condición)."""
+    if nivel >= len(NIVELES_ESCALAMIENTO):
+        estado['niveles'].pop(alerta_id, None)
+        return
+    estado['niveles'][alerta_id] = nivel
+    heapq.heappush(estado['cola'], (_vencimiento(creada, nivel), alerta_id, nivel))
+
+
+def programar_escalamiento(alerta_id: int, creada: Optional[datetime] = None, nivel: int = 0):
+    """
+    Registra una alerta crítica para escalarla si nadie la lee a tiempo.
+
+    Args:
+        alerta_id: ID de la alerta
+        creada: Momento de creación (reloj de la BD); por defecto ahora
+        nivel: Siguiente nivel de NIVELES_ESCALAMIENTO a aplicar
+    """
+    estado = _estado_escalamiento()
+    with estado['condicion']:
+        if creada is None:
+            creada = datetime.now() + estado['desfase']
+        _agregar(estado, alerta_id, creada, nivel)
+        estado['condicion'].notify()
+
+
+def _sincronizar(engine):
+    """Reconstruye la cola con una sola consulta de las alertas críticas pendientes."""
+    with engine.connect() as c:
+        filas = c.execute(_QUERY_PENDIENTES, {"niveles": len(NIVELES_ESCALAMIENTO)}).fetchall()
+
+    estado = _estado_escalamiento()
+    with estado['condicion']:
+        if filas:
+            estado['desfase'] = filas[0][3] - datetime.now()
+        ultimo_id = max((fila[0] for fila in filas), default=0)
+        # Conserva las programadas localmente después de la consulta
+        recientes = [entrada for entrada in estado['cola']
+                     if entrada[1] > ultimo_id and estado['niveles'].get(entrada[1]) == entrada[2]]
+        estado['cola'] = [(_vencimiento(creada, nivel), alerta_id, nivel)
+                          for alerta_id, creada, nivel, _ in filas] + recientes
+        heapq.heapify(estado['cola'])
+        estado['niveles'] = {alerta_id: nivel for _, alerta_id, nivel in estado['cola']}
+        estado['ultima_sincronizacion'] = time.monotonic()
+
+
+def _extraer_vencidas() -> List[Tuple[int, int]]:
+    """Saca de la cola los temporizadores vencidos; descarta los reemplazados."""
+    estado = _estado_escalamiento()
+    vencidas = []
+    with estado['condicion']:
+        ahora = datetime.now() + estado['desfase']
+        cola = estado['cola']
+        while cola and cola[0][0] <= ahora:
+            _, alerta_id, nivel = heapq.heappop(cola)
+            if estado['niveles'].get(alerta_id) == nivel:
+                del estado['niveles'][alerta_id]
+                vencidas.append((alerta_id, nivel))
+    return vencidas
+
+
+def _escalar(engine, vencidas: List[Tuple[int, int]]):
+    """Aplica los niveles vencidos: un UPDATE y un INSERT por nivel para todo el lote."""
+    por_nivel: Dict[int, List[int]] = {}
+    for alerta_id, nivel in vencidas:
+        por_nivel.setdefault(nivel, []).append(alerta_id)
+
+    estado = _estado_escalamiento()
+    for nivel, alerta_ids in por_nivel.items():
+        with engine.begin() as c:
+            escaladas = c.execute(_QUERY_MARCAR_NIVEL, {"alerta_ids": alerta_ids, "nivel": nivel + 1}).fetchall()
+            usuarios = []
+            if escaladas:
+                audiencia = NIVELES_ESCALAMIENTO[nivel][1]
+                usuarios = [fila[0] for fila in c.execute(
+                    _QUERY_ESCALAR[audiencia],
+                    {"alerta_ids": [fila[0] for fila in escaladas], "nivel": nivel + 1},
+                ).fetchall()]
+
+        invalidar_notificaciones(set(usuarios))
+        with estado['condicion']:
+            estado['escaladas'] += len(escaladas)
+            for alerta_id, creada in escaladas:
+                _agregar(estado, alerta_id, creada, nivel + 1)
+
+
+def _ejecutar(engine):
+    """Bucle del hilo de escalamiento."""
+    estado = _estado_escalamiento()
+    while True:
+        try:
+            if time.monotonic() - estado['ultima_sincronizacion'] >= _RESINCRONIZAR_SEGUNDOS:
+                _sincronizar(engine)
+
+            vencidas = _extraer_vencidas()
+            if vencidas:
+                _escalar(engine, vencidas)
+
+            with estado['condicion']:
+                espera = _ESPERA_MAXIMA
+                if estado['cola']:
+                    faltan = estado['cola'][0][0] - (datetime.now() + estado['desfase'])
+                    espera = min(espera, max(0.0, faltan.total_seconds()))
+                estado['condicion'].wait(espera)
+
+        except Exception as e:
+            _logger.warning("Escalamiento de alertas interrumpido: %s", e)
+            time.sleep(5)
+
+
+@st.cache_resource(show_spinner=False)
+def iniciar_escalamiento() -> threading.Thread:
+    """
+    Inicia (una sola vez por proceso) el hilo de escalamiento.
+
+    Returns:
+        Hilo en segundo plano
+    """
+    conn = obtener_conexion()
+    hilo = threading.Thread(target=_ejecutar, args=(conn.engine,), name="escalamiento-alertas", daemon=True)
+    hilo.start()
+    return hilo
+
+
+def obtener_estadisticas_escalamiento() -> Dict:
+    """
+    Estado de la cola de escalamiento del proceso.
+
+    Returns:
+        Dict con 'pendientes' (alertas con temporizador), 'escaladas' (niveles
+        aplicados desde el arranque) y 'proximo' (siguiente vencimiento o None)
+    """
+    estado = _estado_escalamiento()
+    with estado['condicion']:
+        return {
+            'pendientes': len(estado['niveles']),
+            'escaladas': estado['escaladas'],
+            'proximo': estado['cola'][0][0] if estado['cola'] else None,
+        }
@@ -0,0 +1,91 @@
+"""
+Escucha de cambios en la base de datos mediante LISTEN/NOTIFY de PostgreSQL.
+Los triggers de db/migrations/001_notificar_cambios.sql publican el nombre de la
+tabla modificada en el canal CANAL_CAMBIOS; aquí se reparte a los suscriptores
+y se invalidan los resultados cacheados con la etiqueta de la tabla (core/cache.py).
+"""
+
+import logging
+import select
+import threading
+import time
+import streamlit as st
+from typing import Callable, Dict, List, Iterable, Union
+from core.cache import invalidar
+from core.db import obtener_conexion
+
+CANAL_CAMBIOS = "iheartcare_cambios"
+
+_logger = logging.getLogger(__name__)
+_suscriptores: Dict[str, List[Callable[[], None]]] = {}
+_lock = threading.Lock()
+
+
+def suscribir_cambios(tablas: Union[str, Iterable[str]], callback: Callable[[], None]):
+    """
+    Registra una función que se ejecuta cuando cambia alguna de las tablas.
+
+    Args:
+        tablas: Nombre de tabla o lista de nombres (ej: "monitoreos")
+        callback: Función sin argumentos; se ejecuta en el hilo de escucha
+    """
+    if isinstance(tablas, str):
+        tablas = [tablas]
+    with _lock:
+        for tabla in tablas:
+            lista = _suscriptores.setdefault(tabla, [])
+            if callback not in lista:
+                lista.append(callback)
+
+
+def notificar_cambio_local(tabla: str):
+    """Invalida la etiqueta de la tabla y ejecuta sus suscriptores (usado por el hilo de escucha)."""
+    invalidar(tabla)
+    with _lock:
+        callbacks = list(_suscriptores.get(tabla, []))
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception as e:
+            _logger.warning("Error en suscriptor de %s: %s", tabla, e)
+
+
+def _escuchar(engine):
+    """Bucle del hilo de escucha; se reconecta si la conexión se pierde."""
+    while True:
+        try:
+            # Conexión dedicada, separada del pool para no ocupar un lugar permanentemente
+            proxy = engine.raw_connection()
+            proxy.detach()
+            pg = proxy.driver_connection
+            pg.autocommit = True
+            with pg.cursor() as cur:
+                cur.execute(f"LISTEN {CANAL_CAMBIOS}")
+
+            while True:
+                if select.select([pg], [], [], 30) == ([], [], []):
+                    continue
+                pg.poll()
+                tablas = set()
+                while pg.notifies:
+                    tablas.add(pg.notifies.pop(0).payload)
+                for tabla in tablas:
+                    notificar_cambio_local(tabla)
+
+        except Exception as e:
+            _logger.warning("Escucha de cambios interrumpida: %s", e)
+            time.sleep(5)
+
+
+@st.cache_resource(show_spinner=False)
+def iniciar_escucha_cambios() -> threading.Thread:
+    """
+    Inicia (una sola vez por proceso) el hilo que escucha CANAL_CAMBIOS.
+
+    Returns:
+        Hilo de escucha en segundo plano
+    """
+    conn = obtener_conexion()
+    hilo = threading.Thread(target=_escuchar, args=(conn.engine,), name="escucha-cambios", daemon=True)
+    hilo.start()
+    return hilo
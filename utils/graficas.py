@@ -0,0 +1,111 @@
+"""
+Utilidades para gráficas de series de tiempo de alta frecuencia.
+Incluye: selección de trazas WebGL, reducción de puntos y reutilización de figuras.
+"""
+
+import streamlit as st
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from typing import Callable, List, Tuple, Any
+
+# A partir de este número de puntos por traza se dibuja con WebGL (Scattergl)
+UMBRAL_WEBGL = 1000
+
+# Máximo de puntos que se envían al navegador por traza
+MAX_PUNTOS_DIBUJO = 2000
+
+_CLAVE_FIGURAS = "_figuras_graficas"
+
+
+def usar_webgl(n_puntos: int) -> bool:
+    """Indica si una traza con n_puntos debe dibujarse con WebGL."""
+    return n_puntos > UMBRAL_WEBGL
+
+
+def crear_traza(n_puntos: int, **kwargs) -> go.Scatter:
+    """
+    Crea una traza de línea SVG o WebGL según la cantidad de puntos.
+
+    Args:
+        n_puntos: Número de puntos esperados en la traza
+        **kwargs: Argumentos de go.Scatter / go.Scattergl
+
+    Returns:
+        go.Scattergl si se supera UMBRAL_WEBGL, go.Scatter en otro caso
+    """
+    if usar_webgl(n_puntos):
+        return go.Scattergl(**kwargs)
+    return go.Scatter(**kwargs)
+
+
+def reducir_puntos(x: Any, y: Any, max_puntos: int = MAX_PUNTOS_DIBUJO) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reduce una serie a lo sumo max_puntos conservando mínimos y máximos.
+
+    La serie se divide en max_puntos / 2 intervalos consecutivos y de cada uno
+    se conservan el punto mínimo y el máximo, de modo que los picos clínicos
+    siguen visibles aunque la ventana tenga miles de lecturas.
+
+    Args:
+        x: Valores del eje X (timestamps), ordenados
+        y: Valores del eje Y
+        max_puntos: Número máximo de puntos resultantes
+
+    Returns:
+        Tupla (x, y) como arreglos numpy
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= max_puntos or max_puntos < 2:
+        return x, y
+
+    n_intervalos = max_puntos // 2
+    intervalo = np.arange(n) * n_intervalos // n
+    serie = pd.Series(y)
+    minimos = serie.fillna(np.inf).groupby(intervalo).idxmin().to_numpy()
+    maximos = serie.fillna(-np.inf).groupby(intervalo).idxmax().to_numpy()
+    indices = np.union1d(minimos, maximos)
+    return x[indices], y[indices]
+
+
+def obtener_figura(clave: str, construir: Callable[[], go.Figure]) -> go.Figure:
+    """
+    Devuelve una figura guardada en la sesión o la construye una sola vez.
+
+    La estructura (trazas, layout, bandas de rango) se crea en el primer render
+    y en los siguientes solo se reemplazan los datos con actualizar_trazas.
+
+    Args:
+        clave: Identificador de la figura dentro de la sesión
+        construir: Función sin argumentos que crea la figura vacía
+
+    Returns:
+        go.Figure reutilizable
+    """
+    figuras = st.session_state.setdefault(_CLAVE_FIGURAS, {})
+    if clave not in figuras:
+        figuras[clave] = construir()
+    return figuras[clave]
+
+
+def actualizar_trazas(fig: go.Figure, series: List[Tuple[Any, Any]], reducir: bool = True) -> go.Figure:
+    """
+    Reemplaza los datos x/y de las trazas de una figura existente, en orden.
+
+    Args:
+        fig: Figura obtenida con obtener_figura
+        series: Lista de tuplas (x, y), una por traza
+        reducir: Si se aplica reducir_puntos antes de asignar
+
+    Returns:
+        La misma figura, actualizada
+    """
+    with fig.batch_update():
+        for traza, (x, y) in zip(fig.data, series):
+            if reducir:
+                x, y = reducir_puntos(x, y)
+            traza.x = x
+            traza.y = y
+    return fig
@@ -0,0 +1,112 @@
+"""
+Limitador de eventos en memoria: token bucket con ventana de supresión.
+Se usa delante de la creación de alertas para que una ráfaga (por ejemplo,
+un sensor que oscila) cueste operaciones en memoria y no escrituras en la BD.
+"""
+
+import threading
+import time
+import streamlit as st
+from typing import Dict, Hashable, Optional
+
+# Cubetas inactivas que se descartan cuando se supera este número de claves
+_MAX_CLAVES = 10000
+
+
+@st.cache_resource(show_spinner=False)
+def _estado_limitador() -> Dict:
+    """Cubetas por clave, compartidas por todas las sesiones del proceso."""
+    return {'lock': threading.Lock(), 'cubetas': {}, 'permitidos': 0, 'suprimidos': 0}
+
+
+def _podar(cubetas: Dict, ahora: float):
+    """Elimina las cubetas llenas y fuera de supresión (no aportan estado)."""
+    for clave in [c for c, b in cubetas.items()
+                  if b['tokens'] >= b['capacidad'] and b['suprimido_hasta'] <= ahora]:
+        del cubetas[clave]
+
+
+def consumir(
+    clave: Hashable,
+    capacidad: float,
+    recarga_por_segundo: float,
+    ventana_supresion: float = 0.0,
+    ahora: Optional[float] = None,
+) -> bool:
+    """
+    Intenta consumir un evento de la cubeta de una clave.
+
+    La cubeta admite ráfagas de hasta 'capacidad' eventos y se recarga a
+    'recarga_por_segundo'. Al agotarse, la clave queda suprimida durante
+    'ventana_supresion' segundos aunque la cubeta se vaya recargando.
+
+    Args:
+        clave: Identificador del flujo de eventos (ej: (paciente_id, signo, severidad))
+        capacidad: Eventos permitidos en ráfaga
+        recarga_por_segundo: Eventos que se recuperan por segundo
+        ventana_supresion: Segundos de supresión tras agotar la cubeta
+        ahora: Tiempo monotónico actual (para pruebas); por defecto time.monotonic()
+
+    Returns:
+        True si el evento se permite, False si se suprime
+    """
+    ahora = time.monotonic() if ahora is None else ahora
+    estado = _estado_limitador()
+    with estado['lock']:
+        cubetas = estado['cubetas']
+        cubeta = cubetas.get(clave)
+        if cubeta is None:
+            if len(cubetas) >= _MAX_CLAVES:
+                _podar(cubetas, ahora)
+            cubeta = {'tokens': float(capacidad), 'capacidad': float(capacidad), 'actualizado': ahora,
+                      'suprimido_hasta': 0.0, 'permitidos': 0, 'suprimidos': 0}
+            cubetas[clave] = cubeta
+
+        cubeta['tokens'] = min(cubeta['capacidad'],
+                               cubeta['tokens'] + (ahora - cubeta['actualizado']) * recarga_por_segundo)
+        cubeta['actualizado'] = ahora
+
+        if ahora >= cubeta['suprimido_hasta'] and cubeta['tokens'] >= 1:
+            cubeta['tokens'] -= 1
+            cubeta['permitidos'] += 1
+            estado['permitidos'] += 1
+            return True
+
+        if cubeta['tokens'] < 1 and ahora >= cubeta['suprimido_hasta']:
+            cubeta['suprimido_hasta'] = ahora + ventana_supresion
+        cubeta['suprimidos'] += 1
+        estado['suprimidos'] += 1
+        return False
+
+
+def obtener_estadisticas_limitador(top: int = 10) -> Dict:
+    """
+    Resumen de eventos permitidos y suprimidos.
+
+    Args:
+        top: Número de claves con más supresiones a incluir
+
+    Returns:
+        Dict con 'permitidos', 'suprimidos', 'claves' (activas) y 'mas_suprimidas'
+        (lista de tuplas (clave, suprimidos))
+    """
+    estado = _estado_limitador()
+    with estado['lock']:
+        ranking = sorted(((c, b['suprimidos']) for c, b in estado['cubetas'].items() if b['suprimidos']),
+                         key=lambda x: x[1], reverse=True)[:top]
+        return {
+            'permitidos': estado['permitidos'],
+            'suprimidos': estado['suprimidos'],
+            'claves': len(estado['cubetas']),
+            'mas_suprimidas': ranking,
+        }
+
+
+def reiniciar_limitador(clave: Optional[Hashable] = None):
+    """Descarta la cubeta de una clave (o todas si es None)."""
+    estado = _estado_limitador()
+    with estado['lock']:
+        if clave is None:
+            estado['cubetas'].clear()
+        else:
+            estado['cubetas'].pop(clave, None)
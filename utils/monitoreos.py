@@ -0,0 +1,161 @@
+"""
+Servicios de datos para monitoreos activos.
+Cargas agrupadas de signos vitales para vistas con muchos pacientes.
+"""
+
+import streamlit as st
+import pandas as pd
+from datetime import datetime, timedelta
+from core.db import Consulta, consultar_filas
+from .eventos import suscribir_cambios, iniciar_escucha_cambios
+
+# Tipos de medición que se muestran en la vista de sala (mismos nombres que CLINICAL_RANGES)
+VITALES_SALA = [
+    "Ritmo Cardíaco",
+    "Saturación Oxígeno",
+    "Presión Sistólica",
+    "Presión Diastólica",
+]
+
+_VITALES_SALA = Consulta("monitoreos_vitales_sala", """
+    WITH activos AS (
+        SELECT DISTINCT ON (m.paciente_id)
+               m.paciente_id, m.motivo, m.fecha_inicio
+        FROM public.monitoreos m
+        WHERE m.activo = true
+        ORDER BY m.paciente_id, m.fecha_inicio DESC
+    )
+    SELECT a.paciente_id, p.nombre, p.apellido_paterno, a.motivo, a.fecha_inicio,
+           v.tipo_medicion, v.valor, v.timestamp
+    FROM activos a
+    JOIN public.pacientes p ON p.id = a.paciente_id
+    LEFT JOIN LATERAL (
+        -- Límite por tipo: un signo muestreado más seguido no desplaza a los demás
+        SELECT r.tipo_medicion, r.valor, r.timestamp
+        FROM (
+            SELECT med.tipo_medicion, med.valor, med.timestamp,
+                   ROW_NUMBER() OVER (PARTITION BY med.tipo_medicion ORDER BY med.timestamp DESC) AS n
+            FROM public.mediciones med
+            JOIN public.dispositivos d ON d.id = med.dispositivo_id
+            WHERE d.paciente_id = a.paciente_id
+              AND med.timestamp >= :desde
+              AND med.tipo_medicion = ANY(CAST(:vitales AS varchar[]))
+        ) r
+        WHERE r.n <= :puntos_por_vital
+    ) v ON true
+    ORDER BY p.nombre, a.paciente_id, v.timestamp
+""", preparada=True)
+
+
+@st.cache_data(ttl=5, show_spinner=False)
+def obtener_vitales_sala(ventana_minutos: int = 30, puntos_por_vital: int = 60) -> pd.DataFrame:
+    """
+    Obtiene en una sola consulta los signos vitales recientes de todos los
+    pacientes con monitoreo activo.
+
+    El resultado se comparte entre todas las sesiones durante el TTL, de modo
+    que varias pantallas de sala abiertas cuestan una sola consulta.
+
+    Args:
+        ventana_minutos: Minutos hacia atrás que se cargan por paciente
+        puntos_por_vital: Máximo de puntos por tipo de medición
+
+    Returns:
+        DataFrame con columnas paciente_id, nombre, apellido_paterno, motivo,
+        fecha_inicio, tipo_medicion, valor, timestamp (una fila por medición;
+        pacientes sin lecturas recientes aparecen con tipo_medicion nulo)
+    """
+    try:
+        resultado = consultar_filas(
+            _VITALES_SALA,
+            {
+                "desde": datetime.now() - timedelta(minutes=ventana_minutos),
+                "vitales": VITALES_SALA,
+                "puntos_por_vital": puntos_por_vital,
+            },
+        )
+
+        df = pd.DataFrame(
+            resultado,
+            columns=[
+                "paciente_id", "nombre", "apellido_paterno", "motivo", "fecha_inicio",
+                "tipo_medicion", "valor", "timestamp",
+            ],
+        )
+        df["valor"] = pd.to_numeric(df["valor"], errors="coerce")
+        return df
+
+    except Exception as e:
+        st.error(f"Error obteniendo vitales de sala: {str(e)}")
+        return pd.DataFrame()
+
+
+# =============================================================================
+# ROSTER DE MONITOREOS ACTIVOS
+# =============================================================================
+
+# Una fila por monitoreo activo; el dispositivo se elige con LATERAL (activo y más
+# reciente primero) para no multiplicar filas cuando el paciente tiene varios.
+_ROSTER_ACTIVO = Consulta("monitoreos_roster_activo", """
+    SELECT m.id, m.fecha_inicio, m.fecha_fin, m.motivo,
+           p.id AS paciente_id, p.nombre, p.apellido_paterno, p.apellido_materno,
+           p.diagnostico,
+           d.id AS dispositivo_id, d.modelo, d.mac_address, d.activo AS dispositivo_activo
+    FROM public.monitoreos m
+    JOIN public.pacientes p ON p.id = m.paciente_id
+    LEFT JOIN LATERAL (
+        SELECT dd.id, dd.modelo, dd.mac_address, dd.activo
+        FROM public.dispositivos dd
+        WHERE dd.paciente_id = m.paciente_id
+        ORDER BY dd.activo DESC, dd.id DESC
+        LIMIT 1
+    ) d ON true
+    WHERE m.activo = true
+    ORDER BY p.nombre, m.fecha_inicio DESC
+""")
+
+_COLUMNAS_ROSTER = [
+    "id", "fecha_inicio", "fecha_fin", "motivo",
+    "paciente_id", "nombre", "apellido_paterno", "apellido_materno", "diagnostico",
+    "dispositivo_id", "modelo", "mac_address", "dispositivo_activo",
+]
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _cargar_roster_activo() -> pd.DataFrame:
+    """Consulta el roster; el resultado se comparte entre sesiones hasta invalidarse."""
+    resultado = consultar_filas(_ROSTER_ACTIVO)
+    return pd.DataFrame(resultado, columns=_COLUMNAS_ROSTER)
+
+
+def obtener_roster_activo() -> pd.DataFrame:
+    """
+    Obtiene los monitoreos activos con su paciente y dispositivo, sin duplicados.
+
+    El resultado se cachea a nivel de proceso y solo se vuelve a consultar
+    cuando se llama a invalidar_roster (escrituras en monitoreos/dispositivos
+    o un NOTIFY de la base de datos). El TTL de 5 minutos es solo una red de
+    seguridad por si se pierde una invalidación.
+
+    Returns:
+        DataFrame con una fila por monitoreo activo (columnas en _COLUMNAS_ROSTER)
+    """
+    try:
+        iniciar_escucha_cambios()
+    except Exception:
+        # Sin LISTEN/NOTIFY el roster se invalida solo con las escrituras locales y el TTL
+        pass
+
+    try:
+        return _cargar_roster_activo()
+    except Exception as e:
+        st.error(f"Error obteniendo monitoreos activos: {str(e)}")
+        return pd.DataFrame(columns=_COLUMNAS_ROSTER)
+
+
+def invalidar_roster():
+    """Descarta el roster cacheado para que la siguiente lectura consulte la base de datos."""
+    _cargar_roster_activo.clear()
+
+
+suscribir_cambios(("monitoreos", "dispositivos"), invalidar_roster)
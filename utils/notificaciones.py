@@ -4,10 +4,19 @@ Gestiona creación, lectura y visualización de notificaciones.
 """
 
 import streamlit as st
-from sqlalchemy import text
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterable, Tuple
+from core.db import Consulta, sesion, consultar, consultar_valor, ejecutar, ejecutar_concurrente
 import json
+import threading
+
+_CREAR_NOTIFICACION = Consulta("notificacion_crear", """
+    INSERT INTO public.notificaciones_alertas
+    (usuario_id, alerta_id, tipo, leida, payload)
+    VALUES (:usuario_id, :alerta_id, :tipo, false, :payload)
+    RETURNING id
+""")
+
 
 def crear_notificacion(
     usuario_id: int,
@@ -28,211 +37,428 @@ def crear_notificacion(
         ID de notificación creada o None si falla
     """
     try:
-        conn = st.connection("postgresql", type="sql")
-        with conn.session as s:
-            payload_json = json.dumps(payload) if payload else None
-            
-            query = text("""
-                INSERT INTO public.notificaciones_alertas 
-                (usuario_id, alerta_id, tipo, leida, payload)
-                VALUES (:usuario_id, :alerta_id, :tipo, false, :payload)
-                RETURNING id
-            """)
-            
-            resultado = s.execute(
-                query,
-                {
-                    "usuario_id": usuario_id,
-                    "alerta_id": alerta_id,
-                    "tipo": tipo,
-                    "payload": payload_json,
-                },
-            ).fetchone()
-            
-            s.commit()
-            
-            if resultado:
-                return resultado[0]
-        
-        return None
+        return consultar_valor(_CREAR_NOTIFICACION, {
+            "usuario_id": usuario_id,
+            "alerta_id": alerta_id,
+            "tipo": tipo,
+            "payload": json.dumps(payload) if payload else None,
+        })
     
     except Exception as e:
         st.error(f"Error creando notificación: {str(e)}")
         return None
 
 
-def obtener_notificaciones_pendientes(usuario_id: int, limite: int = 10) -> List[Dict]:
+# =============================================================================
+# FAN-OUT DE NOTIFICACIONES
+# =============================================================================
+
+# Roles que ven todas las alertas: no reciben una fila por alerta, sino que sus
+# notificaciones se calculan al leer a partir de un cursor (fan-out en lectura)
+ROLES_FANOUT_LECTURA = ("administrador",)
+
+# Una fila por (médico asignado, alerta) para todo el lote en una sola sentencia
+_FANOUT = Consulta("notificaciones_fanout", """
+    INSERT INTO public.notificaciones_alertas (usuario_id, alerta_id, tipo, leida, payload)
+    SELECT DISTINCT pmed.usuario_id, a.id, :tipo, false,
+           json_build_object(
+               'paciente_id', a.paciente_id,
+               'tipo_medicion', m.tipo_medicion,
+               'valor', m.valor,
+               'tipo_alerta', a.tipo_alerta
+           )::text
+    FROM public.alertas a
+    JOIN public.mediciones m ON a.medicion_id = m.id
+    JOIN public.pacientes_medicos pm ON pm.paciente_id = a.paciente_id
+    JOIN public.personal_medico pmed ON pmed.id = pm.medico_id
+    JOIN public.usuarios u ON u.id = pmed.usuario_id
+    WHERE a.id = ANY(:alerta_ids)
+      AND u.activo = true
+      AND u.rol <> ALL(:roles_lectura)
+    ON CONFLICT (usuario_id, alerta_id) DO NOTHING
+    RETURNING usuario_id
+""")
+
+
+def distribuir_notificaciones(
+    alerta_ids: List[int],
+    tipo: str = "evento_critico",
+    session=None,
+) -> List[int]:
+    """
+    Crea las notificaciones de un lote de alertas con una sola inserción.
+
+    Los destinatarios son los médicos asignados al paciente de cada alerta
+    (pacientes_medicos). Los administradores no reciben filas: ven las alertas
+    mediante fan-out en lectura (ver ROLES_FANOUT_LECTURA), así las escrituras
+    crecen con los médicos asignados y no con el número de administradores.
+
+    Args:
+        alerta_ids: IDs de las alertas recién creadas
+        tipo: Tipo de notificación
+        session: Sesión abierta para participar en la misma transacción
+                 (el llamador hace commit e invalida con invalidar_notificaciones);
+                 si es None se abre una propia
+
+    Returns:
+        Lista de usuario_id que recibieron al menos una notificación
+    """
+    if not alerta_ids:
+        return []
+
+    params = {
+        "alerta_ids": [int(a) for a in alerta_ids],
+        "tipo": tipo,
+        "roles_lectura": list(ROLES_FANOUT_LECTURA),
+    }
+    try:
+        usuarios = sorted({fila["usuario_id"] for fila in consultar(_FANOUT, params, session=session)})
+        if session is None:
+            invalidar_notificaciones(usuarios, nuevas_alertas=True)
+        return usuarios
+
+    except Exception as e:
+        st.error(f"Error distribuyendo notificaciones: {str(e)}")
+        return []
+
+
+def _usa_fanout_lectura(rol: Optional[str]) -> bool:
+    """Indica si el rol lee sus notificaciones directamente de las alertas."""
+    return rol in ROLES_FANOUT_LECTURA
+
+
+# Notificaciones "virtuales" de un usuario con fan-out en lectura: todas las alertas,
+# leídas si están por debajo de su cursor o marcadas individualmente. Los
+# escalamientos (utils/escalamiento.py) siguen pendientes aunque el cursor los haya pasado.
+# El id devuelto es el de la alerta.
+_SELECT_NOTIFICACIONES_LECTURA = """
+    SELECT a.id, COALESCE(na.tipo, 'evento_critico') AS tipo, a.timestamp, a.mensaje, a.tipo_alerta,
+           CONCAT(p.nombre, ' ', p.apellido_paterno) AS nombre_paciente,
+           m.tipo_medicion, m.valor, m.unidad_medida,
+           ((a.id <= c.cursor AND na.tipo IS DISTINCT FROM 'escalamiento')
+            OR COALESCE(na.leida, false)) AS leida
+    FROM public.alertas a
+    JOIN public.mediciones m ON a.medicion_id = m.id
+    JOIN public.pacientes p ON a.paciente_id = p.id
+    CROSS JOIN (
+        SELECT COALESCE(MAX(ultima_alerta_id), 0) AS cursor
+        FROM public.notificaciones_lectura
+        WHERE usuario_id = :usuario_id
+    ) c
+    LEFT JOIN public.notificaciones_alertas na
+           ON na.usuario_id = :usuario_id AND na.alerta_id = a.id
+"""
+
+# Escalamientos pendientes del usuario, para incluirlos aunque estén por debajo del cursor
+_ESCALAMIENTOS_PENDIENTES = """
+    SELECT alerta_id FROM public.notificaciones_alertas
+    WHERE usuario_id = :usuario_id AND tipo = 'escalamiento' AND leida = false
+"""
+
+_FILTRO_NO_LEIDAS_LECTURA = f"""
+    WHERE (a.id > c.cursor OR a.id IN ({_ESCALAMIENTOS_PENDIENTES}))
+      AND COALESCE(na.leida, false) = false
+"""
+
+# Columnas de una notificación pendiente; payload es el JSON del fan-out (texto)
+_PENDIENTES = {
+    True: Consulta("notificaciones_pendientes_lectura", f"""
+        SELECT id, tipo, timestamp, mensaje, tipo_alerta, nombre_paciente,
+               tipo_medicion, valor, unidad_medida, NULL AS payload
+        FROM ({_SELECT_NOTIFICACIONES_LECTURA} {_FILTRO_NO_LEIDAS_LECTURA}
+              ORDER BY a.timestamp DESC LIMIT :limite) t
+        ORDER BY timestamp DESC
+    """),
+    False: Consulta("notificaciones_pendientes", """
+        SELECT na.id, na.tipo, na.timestamp, a.mensaje, a.tipo_alerta,
+               CONCAT(p.nombre, ' ', p.apellido_paterno) AS nombre_paciente,
+               m.tipo_medicion, m.valor, m.unidad_medida,
+               na.payload
+        FROM public.notificaciones_alertas na
+        JOIN public.alertas a ON na.alerta_id = a.id
+        JOIN public.mediciones m ON a.medicion_id = m.id
+        JOIN public.pacientes p ON a.paciente_id = p.id
+        WHERE na.usuario_id = :usuario_id
+          AND na.leida = false
+        ORDER BY na.timestamp DESC
+        LIMIT :limite
+    """),
+}
+
+# {filtro_cursor}: vacío en la primera página (ver obtener_historial_notificaciones)
+_QUERY_HISTORIAL_LECTURA = f"""
+    {_SELECT_NOTIFICACIONES_LECTURA}
+    {{filtro_cursor}}
+    ORDER BY a.timestamp DESC, a.id DESC
+    LIMIT :limite
+"""
+
+_QUERY_HISTORIAL = """
+    SELECT na.id, na.tipo, na.timestamp, a.mensaje, a.tipo_alerta,
+           CONCAT(p.nombre, ' ', p.apellido_paterno) AS nombre_paciente,
+           m.tipo_medicion, m.valor, m.unidad_medida,
+           na.leida
+    FROM public.notificaciones_alertas na
+    JOIN public.alertas a ON na.alerta_id = a.id
+    JOIN public.mediciones m ON a.medicion_id = m.id
+    JOIN public.pacientes p ON a.paciente_id = p.id
+    WHERE na.usuario_id = :usuario_id
+      {filtro_cursor}
+    ORDER BY na.timestamp DESC, na.id DESC
+    LIMIT :limite
+"""
+
+# Por (fan-out en lectura, con cursor)
+_HISTORIAL = {
+    (True, False): Consulta("notificaciones_historial_lectura",
+                            _QUERY_HISTORIAL_LECTURA.format(filtro_cursor="")),
+    (True, True): Consulta("notificaciones_historial_lectura_cursor", _QUERY_HISTORIAL_LECTURA.format(
+        filtro_cursor="WHERE (a.timestamp, a.id) < (:cursor_ts, :cursor_id)")),
+    (False, False): Consulta("notificaciones_historial", _QUERY_HISTORIAL.format(filtro_cursor="")),
+    (False, True): Consulta("notificaciones_historial_cursor", _QUERY_HISTORIAL.format(
+        filtro_cursor="AND (na.timestamp, na.id) < (:cursor_ts, :cursor_id)")),
+}
+
+_CONTAR = {
+    True: Consulta("notificaciones_contar_lectura", f"""
+        SELECT COUNT(*)
+        FROM public.alertas a
+        WHERE (a.id > COALESCE((
+                    SELECT ultima_alerta_id FROM public.notificaciones_lectura
+                    WHERE usuario_id = :usuario_id
+                  ), 0)
+               OR a.id IN ({_ESCALAMIENTOS_PENDIENTES}))
+          AND NOT EXISTS (
+                SELECT 1 FROM public.notificaciones_alertas na
+                WHERE na.usuario_id = :usuario_id
+                  AND na.alerta_id = a.id
+                  AND na.leida = true
+              )
+    """),
+    # Contador mantenido por triggers (db/migrations/003_contadores.sql)
+    False: Consulta("notificaciones_contar", """
+        SELECT notificaciones_no_leidas FROM public.contadores_usuario
+        WHERE usuario_id = :usuario_id
+    """),
+}
+
+# Fan-out en lectura: solo se escribe una fila cuando el usuario marca una alerta concreta
+_MARCAR_LEIDA = {
+    True: Consulta("notificacion_marcar_leida_lectura", """
+        INSERT INTO public.notificaciones_alertas (usuario_id, alerta_id, tipo, leida)
+        VALUES (:usuario_id, :notificacion_id, 'evento_critico', true)
+        ON CONFLICT (usuario_id, alerta_id) DO UPDATE SET leida = true
+        RETURNING usuario_id
+    """),
+    False: Consulta("notificacion_marcar_leida", """
+        UPDATE public.notificaciones_alertas
+        SET leida = true
+        WHERE id = :notificacion_id
+        RETURNING usuario_id
+    """),
+}
+
+_MARCAR_LEIDAS_ALERTAS = {
+    True: Consulta("notificaciones_marcar_alertas_lectura", """
+        INSERT INTO public.notificaciones_alertas (usuario_id, alerta_id, tipo, leida)
+        SELECT :usuario_id, ids.alerta_id, 'evento_critico', true
+        FROM unnest(CAST(:ids AS int[])) AS ids(alerta_id)
+        ON CONFLICT (usuario_id, alerta_id) DO UPDATE SET leida = true
+    """),
+    False: Consulta("notificaciones_marcar_alertas", """
+        UPDATE public.notificaciones_alertas
+        SET leida = true
+        WHERE alerta_id = ANY(:ids)
+          AND usuario_id = :usuario_id
+          AND leida = false
+    """),
+}
+
+_AVANZAR_CURSOR_LECTURA = Consulta("notificaciones_avanzar_cursor", """
+    INSERT INTO public.notificaciones_lectura (usuario_id, ultima_alerta_id, fecha_actualizacion)
+    SELECT :usuario_id, COALESCE(MAX(id), 0), CURRENT_TIMESTAMP FROM public.alertas
+    ON CONFLICT (usuario_id) DO UPDATE
+        SET ultima_alerta_id = GREATEST(public.notificaciones_lectura.ultima_alerta_id,
+                                        EXCLUDED.ultima_alerta_id),
+            fecha_actualizacion = CURRENT_TIMESTAMP
+    RETURNING ultima_alerta_id
+""")
+
+_BORRAR_MARCAS_LECTURA = Consulta("notificaciones_borrar_marcas", """
+    DELETE FROM public.notificaciones_alertas
+    WHERE usuario_id = :usuario_id AND alerta_id <= :cursor
+""")
+
+_MARCAR_TODAS = Consulta("notificaciones_marcar_todas", """
+    UPDATE public.notificaciones_alertas
+    SET leida = true
+    WHERE usuario_id = :usuario_id
+      AND leida = false
+""")
+
+_TOTAL_ALERTAS = Consulta("notificaciones_total_alertas", """
+    SELECT COUNT(*) FROM public.alertas
+""")
+
+_ESTADISTICAS = Consulta("notificaciones_estadisticas", """
+    SELECT COUNT(*) AS total,
+           COUNT(*) FILTER (WHERE leida = true) AS leidas,
+           COUNT(*) FILTER (WHERE leida = false) AS no_leidas
+    FROM public.notificaciones_alertas
+    WHERE usuario_id = :usuario_id
+""")
+
+
+def _leer_pendientes(usuario_id: int, limite: int, rol: Optional[str]) -> List[Dict]:
+    """Notificaciones no leídas; los errores se propagan al llamador."""
+    notificaciones = consultar(_PENDIENTES[_usa_fanout_lectura(rol)],
+                               {"usuario_id": usuario_id, "limite": limite})
+    for notificacion in notificaciones:
+        notificacion["payload"] = json.loads(notificacion["payload"]) if notificacion["payload"] else {}
+    return notificaciones
+
+
+def obtener_notificaciones_pendientes(
+    usuario_id: int, limite: int = 10, rol: Optional[str] = None
+) -> List[Dict]:
     """
     Obtiene las notificaciones no leídas de un usuario.
     
     Args:
         usuario_id: ID del usuario
         limite: Máximo de resultados
+        rol: Rol del usuario; los roles con fan-out en lectura consultan las alertas
     
     Returns:
         Lista de diccionarios con información de notificaciones
     """
     try:
-        conn = st.connection("postgresql", type="sql")
-        with conn.session as s:
-            query = text("""
-                SELECT na.id, na.tipo, na.timestamp, a.mensaje, a.tipo_alerta,
-                       p.nombre, p.apellido_paterno,
-                       m.tipo_medicion, m.valor, m.unidad_medida,
-                       na.payload
-                FROM public.notificaciones_alertas na
-                JOIN public.alertas a ON na.alerta_id = a.id
-                JOIN public.mediciones m ON a.medicion_id = m.id
-                JOIN public.dispositivos d ON m.dispositivo_id = d.id
-                JOIN public.pacientes p ON d.paciente_id = p.id
-                WHERE na.usuario_id = :usuario_id
-                  AND na.leida = false
-                ORDER BY na.timestamp DESC
-                LIMIT :limite
-            """)
-            
-            resultado = s.execute(
-                query, 
-                {"usuario_id": usuario_id, "limite": limite}
-            ).fetchall()
-            
-            notificaciones = []
-            for row in resultado:
-                payload = json.loads(row[10]) if row[10] else {}
-                
-                notificaciones.append({
-                    "id": row[0],
-                    "tipo": row[1],
-                    "timestamp": row[2],
-                    "mensaje": row[3],
-                    "tipo_alerta": row[4],
-                    "nombre_paciente": f"{row[5]} {row[6]}",
-                    "tipo_medicion": row[7],
-                    "valor": row[8],
-                    "unidad_medida": row[9],
-                    "payload": payload,
-                })
-            
-            return notificaciones
+        return _leer_pendientes(usuario_id, limite, rol)
     
     except Exception as e:
         st.error(f"Error obteniendo notificaciones: {str(e)}")
         return []
 
 
-def obtener_historial_notificaciones(usuario_id: int, limite: int = 20) -> List[Dict]:
+def obtener_historial_notificaciones(
+    usuario_id: int,
+    limite: int = 20,
+    rol: Optional[str] = None,
+    cursor: Optional[Tuple[datetime, int]] = None,
+) -> List[Dict]:
     """
     Obtiene el historial completo de notificaciones (leídas y no leídas).
     
+    Se pagina por llave (timestamp, id): para la siguiente página se pasa como
+    cursor el timestamp e id de la última notificación recibida.
+    
     Args:
         usuario_id: ID del usuario
         limite: Máximo de resultados
+        rol: Rol del usuario; los roles con fan-out en lectura consultan las alertas
+        cursor: (timestamp, id) de la última notificación de la página anterior
     
     Returns:
         Lista de diccionarios con información de notificaciones
     """
+    params = {"usuario_id": usuario_id, "limite": limite}
+    if cursor is not None:
+        params.update({"cursor_ts": cursor[0], "cursor_id": cursor[1]})
     try:
-        conn = st.connection("postgresql", type="sql")
-        with conn.session as s:
-            query = text("""
-                SELECT na.id, na.tipo, na.timestamp, a.mensaje, a.tipo_alerta,
-                       p.nombre, p.apellido_paterno,
-                       m.tipo_medicion, m.valor, m.unidad_medida,
-                       na.leida
-                FROM public.notificaciones_alertas na
-                JOIN public.alertas a ON na.alerta_id = a.id
-                JOIN public.mediciones m ON a.medicion_id = m.id
-                JOIN public.dispositivos d ON m.dispositivo_id = d.id
-                JOIN public.pacientes p ON d.paciente_id = p.id
-                WHERE na.usuario_id = :usuario_id
-                ORDER BY na.timestamp DESC
-                LIMIT :limite
-            """)
-            
-            resultado = s.execute(
-                query,
-                {"usuario_id": usuario_id, "limite": limite}
-            ).fetchall()
-            
-            notificaciones = []
-            for row in resultado:
-                notificaciones.append({
-                    "id": row[0],
-                    "tipo": row[1],
-                    "timestamp": row[2],
-                    "mensaje": row[3],
-                    "tipo_alerta": row[4],
-                    "nombre_paciente": f"{row[5]} {row[6]}",
-                    "tipo_medicion": row[7],
-                    "valor": row[8],
-                    "unidad_medida": row[9],
-                    "leida": row[10],
-                })
-            
-            return notificaciones
+        return consultar(_HISTORIAL[(_usa_fanout_lectura(rol), cursor is not None)], params)
     
     except Exception as e:
         st.error(f"Error obteniendo historial: {str(e)}")
         return []
 
 
-def marcar_notificacion_leida(notificacion_id: int) -> bool:
+def marcar_notificacion_leida(
+    notificacion_id: int, usuario_id: Optional[int] = None, rol: Optional[str] = None
+) -> bool:
     """
     Marca una notificación como leída.
     
     Args:
-        notificacion_id: ID de la notificación
+        notificacion_id: ID de la notificación (ID de la alerta para roles con fan-out en lectura)
+        usuario_id: ID del usuario; requerido para roles con fan-out en lectura
+        rol: Rol del usuario
     
     Returns:
         True si se actualizó correctamente
     """
     try:
-        conn = st.connection("postgresql", type="sql")
-        with conn.session as s:
-            query = text("""
-                UPDATE public.notificaciones_alertas
-                SET leida = true
-                WHERE id = :notificacion_id
-            """)
-            
-            s.execute(query, {"notificacion_id": notificacion_id})
-            s.commit()
-            
-            return True
+        filas = consultar(_MARCAR_LEIDA[_usa_fanout_lectura(rol)],
+                          {"notificacion_id": notificacion_id, "usuario_id": usuario_id})
+        invalidar_notificaciones([fila["usuario_id"] for fila in filas])
+        return True
     
     except Exception as e:
         st.error(f"Error marcando notificación: {str(e)}")
         return False
 
 
-def marcar_todas_leidas(usuario_id: int) -> int:
+def marcar_notificaciones_leidas(
+    alerta_ids: List[int], usuario_id: int, rol: Optional[str] = None
+) -> int:
+    """
+    Marca como leídas, en una sola sentencia, las notificaciones de un usuario
+    sobre un conjunto de alertas (al dar acuse de las alertas en "Mis Alertas").
+    
+    Args:
+        alerta_ids: IDs de las alertas
+        usuario_id: ID del usuario
+        rol: Rol del usuario
+    
+    Returns:
+        Cantidad de notificaciones marcadas
+    """
+    if not alerta_ids:
+        return 0
+    try:
+        marcadas = ejecutar(_MARCAR_LEIDAS_ALERTAS[_usa_fanout_lectura(rol)],
+                            {"ids": [int(a) for a in alerta_ids], "usuario_id": usuario_id})
+        invalidar_notificaciones([usuario_id])
+        return marcadas
+    
+    except Exception as e:
+        st.error(f"Error marcando notificaciones: {str(e)}")
+        return 0
+
+
+def marcar_todas_leidas(usuario_id: int, rol: Optional[str] = None) -> int:
     """
     Marca todas las notificaciones de un usuario como leídas.
     
+    Para roles con fan-out en lectura se avanza el cursor hasta la última
+    alerta y se eliminan las marcas individuales que quedan por debajo.
+    
     Returns:
         Cantidad de notificaciones actualizadas
     """
     try:
-        conn = st.connection("postgresql", type="sql")
-        with conn.session as s:
-            query = text("""
-                UPDATE public.notificaciones_alertas
-                SET leida = true
-                WHERE usuario_id = :usuario_id
-                  AND leida = false
-            """)
-            
-            result = s.execute(query, {"usuario_id": usuario_id})
-            s.commit()
-            
-            return result.rowcount
+        if _usa_fanout_lectura(rol):
+            pendientes = _contar_pendientes(usuario_id, rol)
+            with sesion() as s:
+                cursor = consultar_valor(_AVANZAR_CURSOR_LECTURA, {"usuario_id": usuario_id}, session=s)
+                ejecutar(_BORRAR_MARCAS_LECTURA, {"usuario_id": usuario_id, "cursor": cursor}, session=s)
+            invalidar_notificaciones([usuario_id])
+            return pendientes
+        
+        marcadas = ejecutar(_MARCAR_TODAS, {"usuario_id": usuario_id})
+        invalidar_notificaciones([usuario_id])
+        return marcadas
     
     except Exception as e:
         st.error(f"Error marcando notificaciones: {str(e)}")
         return 0
 
 
-def contar_notificaciones_pendientes(usuario_id: int) -> int:
+def _contar_pendientes(usuario_id: int, rol: Optional[str]) -> int:
+    """Notificaciones no leídas del usuario; los errores se propagan al llamador."""
+    return consultar_valor(_CONTAR[_usa_fanout_lectura(rol)], {"usuario_id": usuario_id}) or 0
+
+
+def contar_notificaciones_pendientes(usuario_id: int, rol: Optional[str] = None) -> int:
     """
     Cuenta cuántas notificaciones no leídas tiene un usuario.
     
@@ -240,17 +466,7 @@ def contar_notificaciones_pendientes(usuario_id: int) -> int:
         Cantidad de notificaciones pendientes
     """
     try:
-        conn = st.connection("postgresql", type="sql")
-        with conn.session as s:
-            query = text("""
-                SELECT COUNT(*) FROM public.notificaciones_alertas
-                WHERE usuario_id = :usuario_id
-                  AND leida = false
-            """)
-            
-            resultado = s.execute(query, {"usuario_id": usuario_id}).fetchone()
-            
-            return resultado[0] if resultado else 0
+        return _contar_pendientes(usuario_id, rol)
     
     except Exception as e:
         st.error(f"Error contando notificaciones: {str(e)}")
@@ -267,8 +483,14 @@ def mostrar_panel_notificaciones(usuario_id: int, rol: str):
     """
     from .ui_components import section_divider, status_indicator, toast_notification
     
-    # Obtener notificaciones
-    notificaciones = obtener_historial_notificaciones(usuario_id, limite=15)
+    # Obtener notificaciones; "Cargar más" agrega la siguiente página desde el cursor
+    pagina = 15
+    estado = st.session_state.get("_panel_notificaciones")
+    if estado is None or estado["usuario_id"] != usuario_id:
+        primeras = obtener_historial_notificaciones(usuario_id, limite=pagina, rol=rol)
+        estado = {"usuario_id": usuario_id, "items": primeras, "hay_mas": len(primeras) == pagina}
+        st.session_state["_panel_notificaciones"] = estado
+    notificaciones = estado["items"]
     
     if not notificaciones:
         st.info("📭 No hay notificaciones aún.")
@@ -285,7 +507,8 @@ def mostrar_panel_notificaciones(usuario_id: int, rol: str):
     with col2:
         if pendientes > 0:
             if st.button("✓ Marcar todas como leídas", key="mark_all_read"):
-                marcar_todas_leidas(usuario_id)
+                marcar_todas_leidas(usuario_id, rol)
+                st.session_state.pop("_panel_notificaciones", None)
                 st.rerun()
     
     # Mostrar notificaciones
@@ -320,13 +543,32 @@ def mostrar_panel_notificaciones(usuario_id: int, rol: str):
             with col3:
                 if not notificacion["leida"]:
                     if st.button("✓", key=f"read_{notificacion['id']}", help="Marcar como leída"):
-                        marcar_notificacion_leida(notificacion["id"])
+                        marcar_notificacion_leida(notificacion["id"], usuario_id, rol)
+                        notificacion["leida"] = True
                         st.rerun()
                 else:
                     st.caption("✓ Leída")
+    
+    if estado["hay_mas"] and st.button("Cargar más", key="notificaciones_cargar_mas"):
+        ultima = notificaciones[-1]
+        siguientes = obtener_historial_notificaciones(
+            usuario_id, limite=pagina, rol=rol, cursor=(ultima["timestamp"], ultima["id"])
+        )
+        estado["items"].extend(siguientes)
+        estado["hay_mas"] = len(siguientes) == pagina
+        st.rerun()
 
 
-def obtener_estadisticas_notificaciones(usuario_id: int) -> Dict:
+def _contar_estadisticas(usuario_id: int, rol: Optional[str]) -> Dict:
+    """Totales de notificaciones ('total', 'leidas', 'no_leidas'); los errores se propagan al llamador."""
+    if _usa_fanout_lectura(rol):
+        total = consultar_valor(_TOTAL_ALERTAS) or 0
+        no_leidas = _contar_pendientes(usuario_id, rol)
+        return {"total": total, "leidas": total - no_leidas, "no_leidas": no_leidas}
+    return consultar(_ESTADISTICAS, {"usuario_id": usuario_id})[0]
+
+
+def obtener_estadisticas_notificaciones(usuario_id: int, rol: Optional[str] = None) -> Dict:
     """
     Obtiene estadísticas completas de notificaciones para el usuario.
     
@@ -334,66 +576,14 @@ def obtener_estadisticas_notificaciones(usuario_id: int) -> Dict:
         Diccionario con: total, leidas, no_leidas, ultimas_3
     """
     try:
-        conn = st.connection("postgresql", type="sql")
-        with conn.session as s:
-            # Contar leídas y no leídas
-            query_stats = text("""
-                SELECT 
-                    COUNT(*) as total,
-                    COUNT(CASE WHEN leida = true THEN 1 END) as leidas,
-                    COUNT(CASE WHEN leida = false THEN 1 END) as no_leidas
-                FROM public.notificaciones_alertas
-                WHERE usuario_id = :usuario_id
-            """)
-            
-            stats = s.execute(query_stats, {"usuario_id": usuario_id}).fetchone()
-            total, leidas, no_leidas = stats if stats else (0, 0, 0)
-            
-            # Obtener últimas 3 no leídas
-            query_recientes = text("""
-                SELECT na.id, na.tipo, na.timestamp, a.mensaje, a.tipo_alerta,
-                       p.nombre, p.apellido_paterno,
-                       m.tipo_medicion, m.valor, m.unidad_medida
-                FROM public.notificaciones_alertas na
-                JOIN public.alertas a ON na.alerta_id = a.id
-                JOIN public.mediciones m ON a.medicion_id = m.id
-                JOIN public.dispositivos d ON m.dispositivo_id = d.id
-                JOIN public.pacientes p ON d.paciente_id = p.id
-                WHERE na.usuario_id = :usuario_id
-                  AND na.leida = false
-                ORDER BY na.timestamp DESC
-                LIMIT 3
-            """)
-            
-            recientes = s.execute(query_recientes, {"usuario_id": usuario_id}).fetchall()
-            
-            ultimas_3 = []
-            for row in recientes:
-                ultimas_3.append({
-                    "id": row[0],
-                    "tipo": row[1],
-                    "timestamp": row[2],
-                    "mensaje": row[3],
-                    "tipo_alerta": row[4],
-                    "nombre_paciente": f"{row[5]} {row[6]}",
-                    "tipo_medicion": row[7],
-                    "valor": row[8],
-                    "unidad_medida": row[9],
-                })
-            
-            return {
-                "total": total,
-                "leidas": leidas,
-                "no_leidas": no_leidas,
-                "ultimas_3": ultimas_3
-            }
+        return {**_contar_estadisticas(usuario_id, rol), "ultimas_3": _leer_pendientes(usuario_id, 3, rol)}
     
     except Exception as e:
         st.error(f"Error obteniendo estadísticas: {str(e)}")
         return {"total": 0, "leidas": 0, "no_leidas": 0, "ultimas_3": []}
 
 
-def mostrar_indicador_notificaciones(usuario_id: int) -> int:
+def mostrar_indicador_notificaciones(usuario_id: int, rol: Optional[str] = None) -> int:
     """
     Retorna un badge con el número de notificaciones pendientes.
     Útil para mostrar en el sidebar.
@@ -401,4 +591,80 @@ def mostrar_indicador_notificaciones(usuario_id: int) -> int:
     Returns:
         Cantidad de notificaciones pendientes
     """
-    return contar_notificaciones_pendientes(usuario_id)
+    return contar_notificaciones_pendientes(usuario_id, rol)
+
+
+# =============================================================================
+# CACHÉ DE CONTADORES PARA EL SIDEBAR
+# =============================================================================
+
+@st.cache_resource(show_spinner=False)
+def _versiones_notificaciones() -> Dict:
+    """Versiones por usuario (y global para fan-out en lectura), compartidas en el proceso."""
+    return {"lock": threading.Lock(), "usuarios": {}, "global": 0}
+
+
+def invalidar_notificaciones(usuario_ids: Iterable[int] = (), nuevas_alertas: bool = False):
+    """
+    Invalida el resumen cacheado de notificaciones de los usuarios indicados.
+
+    Args:
+        usuario_ids: Usuarios cuyas notificaciones cambiaron (lectura o fan-out)
+        nuevas_alertas: Si hay alertas nuevas; invalida a todos los roles con
+                        fan-out en lectura (administradores)
+    """
+    versiones = _versiones_notificaciones()
+    with versiones["lock"]:
+        for usuario_id in usuario_ids:
+            versiones["usuarios"][usuario_id] = versiones["usuarios"].get(usuario_id, 0) + 1
+        if nuevas_alertas:
+            versiones["global"] += 1
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _cargar_resumen_notificaciones(usuario_id: int, rol: Optional[str], version: tuple) -> Dict:
+    """
+    Consulta contadores y vista previa; 'version' solo forma parte de la llave de caché.
+
+    Usa las funciones internas, que propagan los errores: una excepción no se
+    cachea, así que el siguiente rerun vuelve a consultar.
+    """
+    # Lecturas independientes: en paralelo, cada una con su conexión
+    resultados, errores = ejecutar_concurrente({
+        "conteos": lambda: _contar_estadisticas(usuario_id, rol),
+        "ultimas_3": lambda: _leer_pendientes(usuario_id, 3, rol),
+    })
+    if errores:
+        raise next(iter(errores.values()))
+    estadisticas = {**resultados["conteos"], "ultimas_3": resultados["ultimas_3"]}
+    return {"pendientes": estadisticas["no_leidas"], "estadisticas": estadisticas}
+
+
+def obtener_resumen_notificaciones(usuario_id: int, rol: Optional[str] = None) -> Dict:
+    """
+    Obtiene el contador de pendientes y las estadísticas del sidebar desde caché.
+
+    El resultado se reutiliza durante 30 segundos por usuario y se descarta al
+    momento cuando el usuario marca notificaciones como leídas o recibe nuevas
+    por fan-out, así que en el caso común el sidebar no consulta la base de datos.
+
+    Args:
+        usuario_id: ID del usuario
+        rol: Rol del usuario
+
+    Returns:
+        Diccionario con 'pendientes' (int) y 'estadisticas' (ver obtener_estadisticas_notificaciones)
+    """
+    versiones = _versiones_notificaciones()
+    version = (
+        versiones["usuarios"].get(usuario_id, 0),
+        versiones["global"] if _usa_fanout_lectura(rol) else 0,
+    )
+    try:
+        return _cargar_resumen_notificaciones(usuario_id, rol, version)
+    except Exception as e:
+        st.error(f"Error obteniendo resumen de notificaciones: {str(e)}")
+        return {
+            "pendientes": 0,
+            "estadisticas": {"total": 0, "leidas": 0, "no_leidas": 0, "ultimas_3": []},
+        }
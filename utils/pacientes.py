@@ -0,0 +1,112 @@
+"""
+Servicios de datos de pacientes.
+Carga agrupada del resumen que muestra "Mis Pacientes" (últimos signos vitales
+y alertas no leídas) para todos los pacientes de un médico en una sola consulta,
+e historial de mediciones para el análisis clínico.
+"""
+
+import streamlit as st
+import pandas as pd
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from core.db import Consulta, consultar_filas
+
+# ultimas_mediciones y contadores_paciente los mantienen triggers
+# (migraciones 003 y 011): la consulta no toca el historial de mediciones.
+_RESUMEN_PACIENTES = Consulta("pacientes_resumen", """
+    SELECT p.id AS paciente_id,
+           COALESCE(c.alertas_no_leidas, 0) AS alertas,
+           u.tipo_medicion, u.valor, u.unidad_medida, u.timestamp
+    FROM unnest(CAST(:pacientes AS integer[])) AS p(id)
+    LEFT JOIN public.contadores_paciente c ON c.paciente_id = p.id
+    LEFT JOIN public.ultimas_mediciones u ON u.paciente_id = p.id
+    ORDER BY p.id, u.timestamp DESC
+""", preparada=True)
+
+
+@st.cache_data(ttl=10, show_spinner=False)
+def _cargar_resumen(pacientes: tuple) -> Dict[int, Dict]:
+    """Consulta el resumen; se comparte entre sesiones durante el TTL."""
+    filas = consultar_filas(_RESUMEN_PACIENTES, {"pacientes": list(pacientes)})
+
+    resumen = {paciente_id: {'alertas': 0, 'ultimas': []} for paciente_id in pacientes}
+    for paciente_id, alertas, tipo, valor, unidad, timestamp in filas:
+        entrada = resumen[paciente_id]
+        entrada['alertas'] = int(alertas)
+        if tipo is not None:
+            entrada['ultimas'].append((tipo, valor, unidad, timestamp))
+    return resumen
+
+
+def obtener_resumen_pacientes(pacientes: Iterable[int]) -> Dict[int, Dict]:
+    """
+    Obtiene el último valor de cada signo vital y las alertas no leídas de
+    varios pacientes en una sola consulta.
+
+    El resultado se cachea a nivel de proceso durante 10 segundos. No se
+    invalida por NOTIFY: contadores_paciente cambia con cada medición
+    ingerida y vaciaría la caché de todos los médicos en cada lectura.
+
+    Args:
+        pacientes: IDs de los pacientes
+
+    Returns:
+        Dict {paciente_id: {'alertas': int, 'ultimas': [(tipo, valor, unidad, timestamp), ...]}}
+        con las mediciones de la más reciente a la más antigua
+    """
+    pacientes = tuple(sorted(set(pacientes)))
+    if not pacientes:
+        return {}
+
+    try:
+        return _cargar_resumen(pacientes)
+    except Exception as e:
+        st.error(f"Error obteniendo resumen de pacientes: {str(e)}")
+        return {paciente_id: {'alertas': 0, 'ultimas': []} for paciente_id in pacientes}
+
+
+# =============================================================================
+# HISTORIAL DE MEDICIONES (ANÁLISIS CLÍNICO)
+# =============================================================================
+
+# Rangos largos: pool analítico (y réplica cuando está al día)
+_MEDICIONES_RANGO = Consulta("pacientes_mediciones_rango", """
+    SELECT m.timestamp, m.tipo_medicion, m.valor, m.unidad_medida
+    FROM public.mediciones m
+    JOIN public.dispositivos d ON m.dispositivo_id = d.id
+    WHERE d.paciente_id = :paciente_id
+      AND m.timestamp >= :desde AND m.timestamp <= :hasta
+    ORDER BY m.timestamp
+""", analitica=True)
+
+_MEDICIONES_TODAS = Consulta("pacientes_mediciones_todas", """
+    SELECT m.timestamp, m.tipo_medicion, m.valor, m.unidad_medida
+    FROM public.mediciones m
+    JOIN public.dispositivos d ON m.dispositivo_id = d.id
+    WHERE d.paciente_id = :paciente_id
+    ORDER BY m.timestamp
+""", analitica=True)
+
+
+@st.cache_data(ttl=5, show_spinner=False)
+def obtener_mediciones_paciente(
+    paciente_id: int, desde: Optional[datetime] = None, hasta: Optional[datetime] = None
+) -> pd.DataFrame:
+    """
+    Obtiene las mediciones de un paciente en orden cronológico.
+
+    Args:
+        paciente_id: ID del paciente
+        desde: Inicio del rango; None para todo el historial
+        hasta: Fin del rango (se ignora si desde es None)
+
+    Returns:
+        DataFrame con columnas timestamp, tipo_medicion, valor, unidad_medida
+    """
+    if desde is not None:
+        filas = consultar_filas(_MEDICIONES_RANGO, {"paciente_id": int(paciente_id), "desde": desde, "hasta": hasta})
+    else:
+        filas = consultar_filas(_MEDICIONES_TODAS, {"paciente_id": int(paciente_id)})
+    df = pd.DataFrame(filas, columns=["timestamp", "tipo_medicion", "valor", "unidad_medida"])
+    df["valor"] = pd.to_numeric(df["valor"], errors="coerce")
+    return df
@@ -0,0 +1,192 @@
+"""
+Planificador adaptativo de auto-refresco.
+Ajusta el intervalo de cada sesión según la latencia de la base de datos,
+la saturación del pool de conexiones, la visibilidad de la pestaña y el
+estado clínico del paciente.
+"""
+
+import threading
+import time
+import streamlit as st
+from sqlalchemy import text
+from typing import Dict, Optional
+from core.db import Consulta, consultar_valor, obtener_conexion, obtener_metricas_pool
+
+# Límites del intervalo resultante (segundos)
+INTERVALO_MIN = 2
+INTERVALO_MAX = 120
+
+# Umbrales de carga
+LATENCIA_OBJETIVO = 0.15    # segundos; por encima se empieza a espaciar
+SATURACION_ALTA = 0.8       # fracción de conexiones del pool en uso
+INTERVALO_OCULTA = 60       # intervalo mínimo con la pestaña en segundo plano
+
+# Suavizado exponencial de la latencia y periodicidad de la sonda
+_ALFA_EWMA = 0.3
+_PERIODO_SONDA = 5
+
+
+@st.cache_resource(show_spinner=False)
+def _estado_carga() -> Dict:
+    """Estado compartido por todas las sesiones del proceso."""
+    return {'lock': threading.Lock(), 'latencia': None, 'muestras': 0, 'ultima_muestra': 0.0}
+
+
+def _registrar_latencia(segundos: float):
+    """
+    Incorpora una medición de la sonda al promedio exponencial.
+
+    Solo se alimenta con SELECT 1: las cargas pesadas (sala, roster, resúmenes)
+    tardan más por su tamaño, no por carga del servidor, y mantendrían el
+    promedio por encima de LATENCIA_OBJETIVO de forma permanente.
+
+    Args:
+        segundos: Duración de la sonda
+    """
+    estado = _estado_carga()
+    with estado['lock']:
+        if estado['latencia'] is None:
+            estado['latencia'] = segundos
+        else:
+            estado['latencia'] = _ALFA_EWMA * segundos + (1 - _ALFA_EWMA) * estado['latencia']
+        estado['muestras'] += 1
+        estado['ultima_muestra'] = time.monotonic()
+
+
+def _sondear_latencia():
+    """Mide SELECT 1 como mucho cada _PERIODO_SONDA s."""
+    estado = _estado_carga()
+    if time.monotonic() - estado['ultima_muestra'] < _PERIODO_SONDA:
+        return
+    try:
+        conn = obtener_conexion()
+        inicio = time.perf_counter()
+        with conn.session as s:
+            s.execute(text("SELECT 1"))
+        _registrar_latencia(time.perf_counter() - inicio)
+    except Exception:
+        # No reintentar en cada llamada si la base de datos no responde
+        estado['ultima_muestra'] = time.monotonic()
+
+
+def obtener_saturacion_pool() -> Optional[float]:
+    """
+    Fracción de conexiones del pool en uso (0-1).
+
+    Returns:
+        Saturación, o None si el pool no expone estas métricas
+    """
+    try:
+        pool = obtener_metricas_pool()["aplicacion"]
+        return pool['en_uso'] / pool['capacidad'] if pool['capacidad'] else None
+    except Exception:
+        return None
+
+
+def calcular_intervalo(
+    base: float,
+    visible: bool = True,
+    alertas_recientes: int = 0,
+    ciclos_estables: int = 0,
+) -> Dict:
+    """
+    Calcula el intervalo de refresco de una sesión.
+
+    Args:
+        base: Intervalo elegido por el usuario (segundos)
+        visible: Si la pestaña del navegador está visible
+        alertas_recientes: Alertas del paciente en los últimos minutos
+        ciclos_estables: Refrescos consecutivos con todos los signos en rango normal
+
+    Returns:
+        Dict con 'intervalo', 'base', 'motivos' (lista de textos), 'latencia' y 'saturacion'
+    """
+    _sondear_latencia()
+    latencia = _estado_carga()['latencia']
+    saturacion = obtener_saturacion_pool()
+
+    intervalo = float(base)
+    motivos = []
+
+    if alertas_recientes > 0:
+        intervalo = max(INTERVALO_MIN, base / 2)
+        motivos.append(f"{alertas_recientes} alertas recientes: refresco acelerado")
+    elif ciclos_estables > 0:
+        factor = min(2.0, 1 + ciclos_estables / 10)
+        if factor > 1:
+            intervalo *= factor
+            motivos.append(f"Paciente estable ({ciclos_estables} ciclos): ×{factor:.1f}")
+
+    # La carga del servidor se respeta incluso con alertas: como mínimo se vuelve al intervalo base
+    factor_carga = 1.0
+    if latencia is not None and latencia > LATENCIA_OBJETIVO:
+        factor_carga *= min(4.0, latencia / LATENCIA_OBJETIVO)
+        motivos.append(f"Latencia BD {latencia * 1000:.0f} ms: ×{min(4.0, latencia / LATENCIA_OBJETIVO):.1f}")
+    if saturacion is not None and saturacion >= SATURACION_ALTA:
+        factor_carga *= 2
+        motivos.append(f"Pool al {saturacion:.0%}: ×2")
+    if factor_carga > 1:
+        intervalo = max(intervalo * factor_carga, base)
+
+    if not visible:
+        intervalo = max(intervalo, INTERVALO_OCULTA)
+        motivos.append("Pestaña en segundo plano")
+
+    intervalo = round(min(INTERVALO_MAX, max(INTERVALO_MIN, intervalo)), 1)
+    if not motivos:
+        motivos.append("Sin ajustes: intervalo elegido")
+
+    return {
+        'intervalo': intervalo,
+        'base': base,
+        'motivos': motivos,
+        'latencia': latencia,
+        'saturacion': saturacion,
+    }
+
+
+_ALERTAS_RECIENTES = Consulta("refresco_alertas_recientes", """
+    SELECT COUNT(*)
+    FROM public.alertas a
+    WHERE a.paciente_id = :paciente_id
+      AND a.timestamp > NOW() - make_interval(mins => :minutos)
+""", preparada=True)
+
+
+@st.cache_data(ttl=10, show_spinner=False)
+def contar_alertas_recientes(paciente_id: int, minutos: int = 10) -> int:
+    """
+    Cuenta las alertas de un paciente en los últimos minutos.
+
+    Args:
+        paciente_id: ID del paciente
+        minutos: Ventana hacia atrás
+
+    Returns:
+        Número de alertas (0 si hay error)
+    """
+    try:
+        resultado = consultar_valor(
+            _ALERTAS_RECIENTES, {"paciente_id": int(paciente_id), "minutos": minutos}
+        )
+        return int(resultado or 0)
+    except Exception:
+        return 0
+
+
+def mostrar_diagnostico_refresco(decision: Dict):
+    """Muestra en un expander las decisiones del planificador."""
+    with st.expander("Diagnóstico de actualización", expanded=False):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Intervalo aplicado", f"{decision['intervalo']} s",
+                      delta=f"{decision['intervalo'] - decision['base']:+.1f} s vs elegido",
+                      delta_color="off")
+        with col2:
+            latencia = decision['latencia']
+            st.metric("Latencia BD (EWMA)", f"{latencia * 1000:.0f} ms" if latencia is not None else "N/A")
+        with col3:
+            saturacion = decision['saturacion']
+            st.metric("Uso del pool", f"{saturacion:.0%}" if saturacion is not None else "N/A")
+        for motivo in decision['motivos']:
+            st.caption(f"• {motivo}")
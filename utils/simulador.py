@@ -4,11 +4,12 @@ Genera mediciones anómalas para testing y demostración del sistema.
 """
 
 import streamlit as st
-from sqlalchemy import text
 from datetime import datetime, timedelta
 import random
 from typing import Optional
-from .alerta_generator import crear_alerta_directa
+from core.db import Consulta, sesion, consultar, consultar_valor
+from .alerta_generator import crear_alerta_directa, verificar_rango
+from .notificaciones import distribuir_notificaciones
 
 # Perfiles de eventos peligrosos con rangos de valores anómalos
 TIPOS_EVENTOS = {
@@ -69,6 +70,36 @@ TIPOS_EVENTOS = {
     },
 }
 
+_PACIENTE_DISPOSITIVO = Consulta("simulador_paciente_dispositivo", """
+    SELECT paciente_id FROM public.dispositivos WHERE id = :id
+""")
+
+_INSERTAR_MEDICION = Consulta("simulador_insertar_medicion", """
+    INSERT INTO public.mediciones
+    (dispositivo_id, tipo_medicion, valor, unidad_medida, timestamp)
+    VALUES (:dispositivo_id, :tipo_medicion, :valor, :unidad_medida, :timestamp)
+    RETURNING id
+""")
+
+_DISPOSITIVOS_ACTIVOS = Consulta("simulador_dispositivos_activos", """
+    SELECT d.id, d.paciente_id, d.modelo, p.nombre, p.apellido_paterno,
+           COALESCE(c.total_mediciones, 0) as total_mediciones
+    FROM public.dispositivos d
+    JOIN public.pacientes p ON d.paciente_id = p.id
+    LEFT JOIN public.contadores_dispositivo c ON c.dispositivo_id = d.id
+    WHERE d.activo = true
+    ORDER BY p.nombre ASC
+""")
+
+_ULTIMAS_MEDICIONES = Consulta("simulador_ultimas_mediciones", """
+    SELECT m.id, m.tipo_medicion, m.valor, m.unidad_medida, m.timestamp
+    FROM public.mediciones m
+    JOIN public.dispositivos d ON m.dispositivo_id = d.id
+    WHERE d.paciente_id = :paciente_id
+    ORDER BY m.timestamp DESC
+    LIMIT :limite
+""", preparada=True)
+
 
 def generar_medicion_anomala(
     dispositivo_id: int,
@@ -97,11 +128,14 @@ def generar_medicion_anomala(
             timestamp = datetime.now()
         
         evento = TIPOS_EVENTOS[tipo_evento]
-        conn = st.connection("postgresql", type="sql")
         
         medicion_ids = []
+        alerta_ids = []
         
-        with conn.session as s:
+        with sesion() as s:
+            # El paciente permite agrupar las lecturas del episodio en memoria
+            paciente_id = consultar_valor(_PACIENTE_DISPOSITIVO, {"id": dispositivo_id}, session=s)
+            
             # Generar medición para cada tipo incluido en el evento
             for tipo_medicion, (min_val, max_val, unidad) in evento["mediciones"].items():
                 # Ajustar rango según intensidad
@@ -119,15 +153,8 @@ def generar_medicion_anomala(
                 valor = round(random.uniform(min_val, max_val), 1)
                 
                 # Insertar medición
-                medicion_query = text("""
-                    INSERT INTO public.mediciones 
-                    (dispositivo_id, tipo_medicion, valor, unidad_medida, timestamp)
-                    VALUES (:dispositivo_id, :tipo_medicion, :valor, :unidad_medida, :timestamp)
-                    RETURNING id
-                """)
-                
-                resultado = s.execute(
-                    medicion_query,
+                medicion_id = consultar_valor(
+                    _INSERTAR_MEDICION,
                     {
                         "dispositivo_id": dispositivo_id,
                         "tipo_medicion": tipo_medicion,
@@ -135,21 +162,32 @@ def generar_medicion_anomala(
                         "unidad_medida": unidad,
                         "timestamp": timestamp,
                     },
-                ).fetchone()
+                    session=s,
+                )
                 
                 s.commit()
                 
-                if resultado:
-                    medicion_id = resultado[0]
+                if medicion_id:
                     medicion_ids.append(medicion_id)
                     
                     # Crear alerta automáticamente
                     mensaje = f"⚠️ Evento simulado: {tipo_evento} - {tipo_medicion}: {valor} {unidad}"
-                    crear_alerta_directa(
+                    alerta_id = crear_alerta_directa(
                         medicion_id,
                         evento["severidad"],
                         mensaje,
+                        paciente_id,
+                        tipo_medicion,
+                        valor,
+                        distribuir=False,
+                        timestamp=timestamp,
                     )
+                    if alerta_id and alerta_id not in alerta_ids:
+                        alerta_ids.append(alerta_id)
+        
+        # Notificaciones de todas las alertas del evento en una sola inserción
+        # (las de episodios ya notificados no generan filas nuevas)
+        distribuir_notificaciones(alerta_ids)
         
         return medicion_ids[0] if medicion_ids else None
     
@@ -224,32 +262,16 @@ def obtener_dispositivos_pacientes() -> list:
         Lista de diccionarios con id, paciente_id, nombre_paciente, estado
     """
     try:
-        conn = st.connection("postgresql", type="sql")
-        with conn.session as s:
-            query = text("""
-                SELECT d.id, d.paciente_id, d.modelo, p.nombre, p.apellido_paterno, 
-                       COUNT(m.id) as total_mediciones
-                FROM public.dispositivos d
-                JOIN public.pacientes p ON d.paciente_id = p.id
-                LEFT JOIN public.mediciones m ON d.id = m.dispositivo_id
-                WHERE d.activo = true
-                GROUP BY d.id, p.id, p.nombre, p.apellido_paterno
-                ORDER BY p.nombre ASC
-            """)
-            
-            resultado = s.execute(query).fetchall()
-            
-            dispositivos = []
-            for row in resultado:
-                dispositivos.append({
-                    "id": row[0],
-                    "paciente_id": row[1],
-                    "modelo": row[2],
-                    "nombre_paciente": f"{row[3]} {row[4]}",
-                    "total_mediciones": row[5],
-                })
-            
-            return dispositivos
+        return [
+            {
+                "id": fila["id"],
+                "paciente_id": fila["paciente_id"],
+                "modelo": fila["modelo"],
+                "nombre_paciente": f"{fila['nombre']} {fila['apellido_paterno']}",
+                "total_mediciones": fila["total_mediciones"],
+            }
+            for fila in consultar(_DISPOSITIVOS_ACTIVOS)
+        ]
     
     except Exception as e:
         st.error(f"Error obteniendo dispositivos: {str(e)}")
@@ -264,36 +286,11 @@ def obtener_ultimas_mediciones_paciente(paciente_id: int, limite: int = 10) -> l
         Lista de diccionarios con información de mediciones
     """
     try:
-        conn = st.connection("postgresql", type="sql")
-        with conn.session as s:
-            query = text("""
-                SELECT m.id, m.tipo_medicion, m.valor, m.unidad_medida, m.timestamp,
-                       CASE 
-                           WHEN a.id IS NOT NULL THEN a.tipo_alerta
-                           ELSE 'normal'
-                       END as estado
-                FROM public.mediciones m
-                JOIN public.dispositivos d ON m.dispositivo_id = d.id
-                LEFT JOIN public.alertas a ON m.id = a.medicion_id
-                WHERE d.paciente_id = :paciente_id
-                ORDER BY m.timestamp DESC
-                LIMIT :limite
-            """)
-            
-            resultado = s.execute(query, {"paciente_id": paciente_id, "limite": limite}).fetchall()
-            
-            mediciones = []
-            for row in resultado:
-                mediciones.append({
-                    "id": row[0],
-                    "tipo_medicion": row[1],
-                    "valor": row[2],
-                    "unidad_medida": row[3],
-                    "timestamp": row[4],
-                    "estado": row[5],
-                })
-            
-            return mediciones
+        mediciones = consultar(_ULTIMAS_MEDICIONES, {"paciente_id": paciente_id, "limite": limite})
+        for medicion in mediciones:
+            # Con episodios no todas las lecturas anormales tienen alerta propia
+            medicion["estado"] = verificar_rango(medicion["tipo_medicion"], float(medicion["valor"]))[0] or "normal"
+        return mediciones
     
     except Exception as e:
         st.error(f"Error obteniendo mediciones: {str(e)}")
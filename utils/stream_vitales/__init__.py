@@ -0,0 +1,97 @@
+"""
+Componente de gráfica en streaming para signos vitales.
+
+El navegador mantiene su propio búfer de puntos y dibuja en un canvas; en cada
+refresco el servidor envía solo los puntos nuevos desde el último enviado.
+Si el componente detecta un hueco (por ejemplo, tras volver a montarse) pide
+una resincronización indicando hasta qué punto tiene datos.
+"""
+
+import os
+import streamlit as st
+import streamlit.components.v1 as components
+from typing import List, Dict, Optional
+
+_componente = components.declare_component(
+    "stream_vitales",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend"),
+)
+
+
+def _marca_ms(ts) -> float:
+    """Convierte un datetime/Timestamp a milisegundos epoch para el navegador."""
+    return ts.timestamp() * 1000.0
+
+
+def mostrar_flujo_vitales(
+    flujo_id: str,
+    puntos: List[Dict],
+    series: List[Dict],
+    banda: Optional[tuple] = None,
+    rango_y: Optional[list] = None,
+    titulo: str = "",
+    unidad: str = "",
+    alto: int = 380,
+    max_puntos: int = 3000,
+    key: Optional[str] = None,
+):
+    """
+    Dibuja una gráfica en streaming enviando solo los puntos nuevos.
+
+    Args:
+        flujo_id: Identificador del flujo (ej: paciente + vista); al cambiar se reinicia el búfer
+        puntos: Historial del servidor; cada punto es un dict con 'seq' (creciente),
+                'timestamp' y una llave por cada serie
+        series: Lista de dicts con 'columna', 'nombre' y 'color'
+        banda: Tupla (min, max) del rango normal a sombrear
+        rango_y: Rango fijo del eje Y [min, max]; automático si es None
+        titulo: Título de la gráfica
+        unidad: Unidad del eje Y
+        alto: Alto del componente en píxeles
+        max_puntos: Tamaño máximo del búfer en el navegador
+        key: Llave del componente (debe ser estable entre refrescos)
+    """
+    key = key or f"flujo_{flujo_id}"
+    estado_key = f"_estado_{key}"
+    estado = st.session_state.get(estado_key)
+    if estado is None or estado['flujo'] != flujo_id:
+        estado = {'flujo': flujo_id, 'enviado': None, 'solicitud': None}
+        st.session_state[estado_key] = estado
+
+    # Solicitud de resincronización enviada por el navegador
+    respuesta = st.session_state.get(key)
+    if isinstance(respuesta, dict) and respuesta.get('flujo') == flujo_id \
+            and respuesta.get('solicitud') != estado['solicitud']:
+        estado['solicitud'] = respuesta.get('solicitud')
+        estado['enviado'] = respuesta.get('cursor') or None
+
+    primero = puntos[0]['seq'] if puntos else 0
+    ultimo = puntos[-1]['seq'] if puntos else 0
+    # Se reenvía todo si nunca se envió, si el navegador quedó antes del historial
+    # disponible o si el historial se reinició (secuencia menor a lo ya enviado)
+    enviado = estado['enviado']
+    reinicio = enviado is None or enviado < primero - 1 or enviado > ultimo
+    desde = 0 if reinicio else estado['enviado']
+    nuevos = [p for p in puntos if p['seq'] > desde]
+    hasta = nuevos[-1]['seq'] if nuevos else desde
+
+    _componente(
+        flujo=flujo_id,
+        reinicio=reinicio,
+        desde=desde,
+        hasta=hasta,
+        t=[_marca_ms(p['timestamp']) for p in nuevos],
+        valores={s['columna']: [p[s['columna']] for p in nuevos] for s in series},
+        config={
+            'series': series,
+            'banda': list(banda) if banda else None,
+            'rango_y': rango_y,
+            'titulo': titulo,
+            'unidad': unidad,
+            'alto': alto,
+            'max_puntos': max_puntos,
+        },
+        key=key,
+        default=None,
+    )
+    estado['enviado'] = hasta
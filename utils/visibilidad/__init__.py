@@ -0,0 +1,28 @@
+"""
+Componente invisible que reporta si la pestaña del navegador está visible.
+"""
+
+import os
+import streamlit.components.v1 as components
+
+_componente = components.declare_component(
+    "visibilidad_pestana",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend"),
+)
+
+
+def pestana_visible(key: str = "visibilidad_pestana") -> bool:
+    """
+    Indica si la pestaña del navegador está visible.
+
+    El componente solo envía un valor cuando la visibilidad cambia, por lo que
+    no provoca reruns adicionales mientras el usuario tiene la pestaña abierta.
+
+    Args:
+        key: Llave del componente (una por página)
+
+    Returns:
+        True si la pestaña está visible o aún no se ha reportado
+    """
+    valor = _componente(key=key, default=True)
+    return valor is not False